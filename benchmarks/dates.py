@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+"""
+    benchmarks.dates
+    ~~~~~~~~~~~~~~~~
+
+    RFC-1123 date formatting and parsing, `eve.dates` codec against
+    strftime/strptime. Before timing, the codec is checked against
+    strftime/strptime on random dates between 1900 and 2100. Run from the
+    repository root:
+
+        $ python benchmarks/dates.py
+
+    :copyright: (c) 2013 by Nicola Iarocci.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import sys
+import random
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, '.')
+
+from eve.dates import RFC1123_FORMAT, format_date, format_rfc1123, \
+    parse_date  # noqa
+
+CHECKS = 200000
+NUMBER = 200000
+REPEAT = 5
+
+
+def check():
+    rnd = random.Random(1)
+    start = datetime(1900, 1, 1)
+    for i in range(CHECKS):
+        date = start + timedelta(seconds=rnd.randint(0, 200 * 365 * 86400))
+        string = date.strftime(RFC1123_FORMAT)
+        assert format_rfc1123(date) == string, date
+        assert format_date(date) == string, date
+        assert parse_date(string) == date, string
+
+
+def timed(label, f):
+    best = min(timeit.repeat(f, number=NUMBER, repeat=REPEAT))
+    print('%-16s %.2f us' % (label, best / NUMBER * 1e6))
+
+
+def main():
+    check()
+    date = datetime(2013, 11, 6, 10, 33, 31)
+    string = date.strftime(RFC1123_FORMAT)
+    timed('strftime', lambda: date.strftime(RFC1123_FORMAT))
+    timed('format_rfc1123', lambda: format_rfc1123(date))
+    timed('format (cached)', lambda: format_date(date))
+    timed('strptime', lambda: datetime.strptime(string, RFC1123_FORMAT))
+    timed('parse_date', lambda: parse_date(string))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+"""
+    benchmarks.hooks
+    ~~~~~~~~~~~~~~~~
+
+    Per-request event hooks overhead of a GET (`on_fetch_resource` and
+    `on_GET` events) with zero, one and many subscribers. With many
+    subscribers, only one of them listens to `on_GET`. Run from the
+    repository root:
+
+        $ python benchmarks/hooks.py
+
+    :copyright: (c) 2013 by Nicola Iarocci.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, '.')
+
+from eve import Eve  # noqa
+from eve.io.base import DataLayer  # noqa
+
+SETTINGS = os.path.abspath(os.path.join('eve', 'tests', 'test_settings.py'))
+NUMBER = 200000
+REPEAT = 5
+
+
+class NoData(DataLayer):
+    """ No database is involved. """
+    def init_app(self, app):
+        pass
+
+
+def callback(*args):
+    pass
+
+
+def app_with(subscribers):
+    app = Eve(settings=SETTINGS, data=NoData)
+    for i in range(subscribers):
+        if i == 0:
+            app.on_GET += callback
+        else:
+            name = 'on_insert_resource%d' % i
+            event = getattr(app, name)
+            event += callback
+            setattr(app, name, event)
+    return app
+
+
+def request(app, documents=[]):
+    app.raise_hooks('on_fetch_resource', 'contacts', (documents,))
+    app.raise_hooks('on_GET', 'contacts', (None, None))
+
+
+def main():
+    for label, subscribers in (('zero', 0), ('one', 1), ('many', 20)):
+        app = app_with(subscribers)
+        best = min(timeit.repeat(lambda: request(app), number=NUMBER,
+                                 repeat=REPEAT))
+        print('%-5s subscribers: %.2f us' % (label, best / NUMBER * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+"""
+    benchmarks.ratelimit
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Cost per check of the in-memory rate limiter, with a growing number of
+    clients and with several threads contending for the same client. Run
+    from the repository root:
+
+        $ python benchmarks/ratelimit.py
+
+    :copyright: (c) 2013 by Nicola Iarocci.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import sys
+import threading
+from timeit import default_timer
+
+sys.path.insert(0, '.')
+
+from eve.ratelimit import MemoryRateLimiter  # noqa
+
+CHECKS = 200000
+THREADS = 8
+LIMIT = 10 ** 9
+PERIOD = 60
+
+
+def clients(count):
+    limiter = MemoryRateLimiter()
+    keys = ['client%d' % i for i in range(count)]
+    start = default_timer()
+    for i in range(CHECKS):
+        limiter.hit(keys[i % count], LIMIT, PERIOD)
+    elapsed = default_timer() - start
+    print('%6d clients: %.2f us' % (count, elapsed / CHECKS * 1e6))
+
+
+def contended():
+    limiter = MemoryRateLimiter()
+    checks = CHECKS // THREADS
+
+    def run():
+        for i in range(checks):
+            limiter.hit('client', LIMIT, PERIOD)
+
+    threads = [threading.Thread(target=run) for i in range(THREADS)]
+    start = default_timer()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = default_timer() - start
+    print('%d threads, one client: %.2f us' %
+          (THREADS, elapsed / (checks * THREADS) * 1e6))
+
+
+def main():
+    for count in (1, 1000, 100000):
+        clients(count)
+    contended()
+
+
+if __name__ == '__main__':
+    main()
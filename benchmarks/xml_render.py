@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+"""
+    benchmarks.xml_render
+    ~~~~~~~~~~~~~~~~~~~~~
+
+    Time spent rendering collection pages as XML, for pages of growing size.
+    Run from the repository root:
+
+        $ python benchmarks/xml_render.py
+
+    :copyright: (c) 2013 by Nicola Iarocci.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import sys
+import datetime
+import timeit
+
+sys.path.insert(0, '.')
+
+from eve.render import render_xml  # noqa
+
+SIZES = (1000, 2000, 4000, 8000)
+REPEAT = 10
+
+
+def page(size):
+    items = []
+    for i in range(size):
+        items.append({
+            '_id': 'item%d' % i,
+            'ref': 'ref %d' % i,
+            'title': 'Fish & Chips <%d>' % i if i % 10 == 0 else 'title',
+            'count': i,
+            'tags': ['a', 'b'],
+            'location': {'city': 'Rome', 'address': 'Via %d' % i},
+            'updated': datetime.datetime(2013, 1, 1),
+            '_links': {'self': {'title': 'item', 'href': '/items/%d' % i}},
+        })
+    return {'_items': items,
+            '_links': {'self': {'title': 'items', 'href': '/items?page=1'},
+                       'parent': {'title': 'home', 'href': '/'}}}
+
+
+def main():
+    for size in SIZES:
+        data = page(size)
+        best = min(timeit.repeat(lambda: render_xml(data), number=1,
+                                 repeat=REPEAT))
+        print('%5d items: %7.2f ms' % (size, best * 1000))
+
+
+if __name__ == '__main__':
+    main()
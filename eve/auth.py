@@ -1,5 +1,36 @@
-from flask import request, Response, current_app as app
+import hashlib
+import hmac
+import os
+import threading
+import time
+from io import BytesIO
+from bson import BSON
+from flask import request, Response, g, abort, has_request_context, \
+    current_app as app
 from functools import wraps
+from eve.timing import phase
+from eve.batch import BATCH_ENVIRON_KEY
+from eve.utils import config, LRUCache
+
+# returned by AuthCache.get() on cache misses.
+_MISS = object()
+
+# size of the body chunks read by StreamingHMACAuth.
+_CHUNK_SIZE = 64 * 1024
+
+try:
+    from hmac import compare_digest
+except ImportError:
+    def compare_digest(a, b):
+        """ Constant time comparison, for Python versions missing
+        `hmac.compare_digest`.
+        """
+        if len(a) != len(b):
+            return False
+        result = 0
+        for x, y in zip(a, b):
+            result |= ord(x) ^ ord(y)
+        return result == 0
 
 
 def requires_auth(endpoint_class):
@@ -9,6 +40,11 @@ def requires_auth(endpoint_class):
                            to.  Can be 'resource' (resource endpoint), 'item'
                            (item endpoint) and 'home' for the API entry point.
 
+    .. versionchanged:: 0.1.1
+       Credentials check is accounted to the 'auth' phase when
+       'SERVER_TIMING' is enabled.
+       Successful checks are recorded (see :func:`authenticated`).
+
     .. versionchanged:: 0.0.7
        Passing the 'resource' argument when inoking auth.authenticate()
 
@@ -37,20 +73,36 @@ def requires_auth(endpoint_class):
                 public = app.config['PUBLIC_METHODS'] + ['OPTIONS']
                 roles = app.config['ALLOWED_ROLES']
             if app.auth and request.method not in public:
-                if not app.auth.authorized(roles, resource_name,
-                                           request.method):
+                with phase('auth'):
+                    authorized = app.auth.authorized(roles, resource_name,
+                                                     request.method)
+                if not authorized:
                     return app.auth.authenticate()
+                g._authenticated = True
             return f(*args, **kwargs)
         return decorated
     return fdec
 
 
+def authenticated():
+    """ Returns True if the credentials sent with the current request have
+    been checked, successfully. Requests to public methods are never
+    authenticated, as credentials are not checked at all.
+
+    .. versionadded:: 0.1.1
+    """
+    return getattr(g, '_authenticated', False)
+
+
 class BasicAuth(object):
     """ Implements Basic AUTH logic. Should be subclassed to implement custom
     authorization checking.
 
     .. versionchanged:: 0.1.1
         auth.request_auth_value is now used to store the auth_field value.
+        Successful credentials checks can be cached (see 'AUTH_CACHE_SIZE').
+        auth.request_auth_value is stored in the request context, making the
+        auth instance safe to share among threads and greenlets.
 
     .. versionchanged:: 0.0.9
        Support for user_id property.
@@ -63,6 +115,28 @@ class BasicAuth(object):
     def __init__(self):
         self.request_auth_value = None
 
+    def _get_request_auth_value(self):
+        if has_request_context():
+            try:
+                return g._request_auth_value
+            except AttributeError:
+                pass
+        return self._default_auth_value
+
+    def _set_request_auth_value(self, value):
+        if has_request_context():
+            g._request_auth_value = value
+        else:
+            self._default_auth_value = value
+
+    # the auth_field value of the current request, usually set by
+    # check_auth(). Since the auth instance is shared by all the requests
+    # being served, the value is stored in the request context. Values set
+    # outside of a request context are the default of all requests.
+    request_auth_value = property(_get_request_auth_value,
+                                  _set_request_auth_value)
+    _default_auth_value = None
+
     def check_auth(self, username, password, allowed_roles, resource, method):
         """ This function is called to check if a username / password
         combination is valid. Must be overridden with custom logic.
@@ -85,16 +159,85 @@ class BasicAuth(object):
         :param allowed_roles: allowed roles for the current request, can be a
                               string or a list of roles.
         :param resource: resource being requested.
+
+        .. versionchanged:: 0.1.1
+           Goes through the credentials cache, if enabled.
         """
         auth = request.authorization
-        return auth and self.check_auth(auth.username, auth.password,
-                                        allowed_roles, resource, method)
+        return auth and self.cached_check_auth(auth.username, auth.username,
+                                               auth.password, allowed_roles,
+                                               resource, method)
+
+    def cached_check_auth(self, identity, *args):
+        """ Calls :meth:`check_auth` with `args`, unless a successful outcome
+        of the same check is found in the credentials cache. On cache hits,
+        `request_auth_value` is restored from the cache.
+
+        Within a batch request (see :mod:`eve.batch`) the outcome of each
+        distinct check, failures included, is also reused by the following
+        sub-requests.
+
+        :param identity: the identity claimed by the client (username, token
+                         or user id). Allows to invalidate its cached
+                         outcomes (see :meth:`invalidate_cache`).
+        :param args: the :meth:`check_auth` arguments.
+
+        .. versionadded:: 0.1.1
+        """
+        outcomes = request.environ.get(BATCH_ENVIRON_KEY)
+        if outcomes is not None:
+            key = (self.__class__.__name__, repr(args))
+            outcome = outcomes.get(key)
+            if outcome is None:
+                authorized = self._cached_check_auth(identity, args)
+                outcome = outcomes[key] = (authorized,
+                                           self.request_auth_value)
+            else:
+                self.request_auth_value = outcome[1]
+            return outcome[0]
+        return self._cached_check_auth(identity, args)
+
+    def _cached_check_auth(self, identity, args):
+        cache = auth_cache()
+        if cache is None:
+            return self.check_auth(*args)
+
+        key = cache.key(self.__class__.__name__, args)
+        value = cache.get(key, identity)
+        if value is not _MISS:
+            self.request_auth_value = value
+            return True
+
+        authorized = self.check_auth(*args)
+        if authorized:
+            cache.set(key, identity, self.request_auth_value)
+        return authorized
+
+    def invalidate_cache(self, identity=None):
+        """ Discards the cached outcomes of the credentials checks of an
+        identity (username, token or user id), or of all identities. Should
+        be called whenever credentials or roles of an account change. Must
+        be called within the application context.
+
+        :param identity: the identity whose cached outcomes are discarded.
+                         Defaults to None (all identities).
+
+        .. versionadded:: 0.1.1
+        """
+        cache = auth_cache()
+        if cache is not None:
+            cache.invalidate(identity)
 
 
 class HMACAuth(BasicAuth):
     """ Hash Message Authentication Code (HMAC) authentication logic. Must be
     subclassed to implement custom authorization checking.
 
+    .. versionchanged:: 0.1.1
+       Successful credentials checks can be cached (see 'AUTH_CACHE_SIZE').
+       Since the whole request is part of the check, only the outcome of
+       identical requests can be reused.
+
     .. versionchanged:: 0.0.9
        Replaced the now deprecated request.data with request.get_data().
 
@@ -135,15 +278,112 @@ class HMACAuth(BasicAuth):
             userid, hmac_hash = auth.split(':')
         except:
             auth = None
-        return auth and self.check_auth(userid, hmac_hash, request.headers,
-                                        request.get_data(), allowed_roles,
-                                        resource, method)
+        return auth and self.cached_check_auth(userid, userid, hmac_hash,
+                                               request.headers,
+                                               request.get_data(),
+                                               allowed_roles, resource,
+                                               method)
+
+
+class StreamingHMACAuth(HMACAuth):
+    """ HMAC authentication logic where the hash is computed by Eve itself,
+    while the request body is being read. Must be subclassed to implement
+    :meth:`secret_key`.
+
+    Unlike with :class:`HMACAuth`, the secret key of the user is looked up
+    first, so that requests from unknown users are rejected without reading
+    their body at all. So are bodies exceeding `MAX_CONTENT_LENGTH`, if set
+    (with a 413). Once verified, the body is handed to the payload parser,
+    which won't read it again.
+
+    The hash is the hex digest of the HMAC (`digestmod`, SHA-1 by default) of
+    the bytes returned by :meth:`signed_headers` followed by the body.
+
+    .. versionadded:: 0.1.1
+    """
+    digestmod = hashlib.sha1
+
+    def secret_key(self, userid, allowed_roles, resource, method):
+        """ Returns the secret key of a user, or None if the user is unknown
+        or not allowed to perform the request. Must be overridden with custom
+        logic, which can also set `request_auth_value`.
+
+        :param userid: user id included with the request.
+        :param allowed_roles: allowed user roles.
+        :param resource: resource being requested.
+        :param method: method being requested.
+        """
+        raise NotImplementedError
+
+    def signed_headers(self, headers):
+        """ Returns the bytes signed along with the body, if any. Override if
+        your clients also sign some of the request headers.
+
+        :param headers: request headers.
+        """
+        return b''
+
+    def authorized(self, allowed_roles, resource, method):
+        """ Validates the the current request is allowed to pass through.
+
+        :param allowed_roles: allowed roles for the current request, can be a
+                              string or a list of roles.
+        :param resource: resource being requested.
+        """
+        auth = request.headers.get('Authorization')
+        try:
+            userid, hmac_hash = auth.split(':')
+        except (AttributeError, ValueError):
+            # no Authorization header, or not a userid:hash one.
+            return False
+
+        max_length = app.config.get('MAX_CONTENT_LENGTH')
+        if max_length and (request.content_length or 0) > max_length:
+            abort(413)
+
+        key = self.secret_key(userid, allowed_roles, resource, method)
+        if key is None:
+            return False
+        if not isinstance(key, bytes):
+            key = key.encode('utf-8')
+
+        digest = hmac.new(key, self.signed_headers(request.headers),
+                          self.digestmod)
+        body = BytesIO()
+        length = 0
+        stream = request.stream
+        while True:
+            chunk = stream.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            length += len(chunk)
+            if max_length and length > max_length:
+                # the client didn't tell, or lied about, the body size.
+                abort(413)
+            digest.update(chunk)
+            body.write(chunk)
+
+        # the body can't be read twice from the stream: make it available to
+        # request.get_data() and the form parser, as if they read it. Both
+        # use the body cached by get_data() in `_cached_data` since werkzeug
+        # 0.9, and still do as of werkzeug 3.x. On CPython 3, getvalue()
+        # hands over the buffer instead of copying it.
+        request._cached_data = body.getvalue()
+        body.close()
+
+        try:
+            return compare_digest(digest.hexdigest(), str(hmac_hash))
+        except (TypeError, UnicodeError):
+            return False
 
 
 class TokenAuth(BasicAuth):
     """ Implements Token AUTH logic. Should be subclassed to implement custom
     authorization checking.
 
+    .. versionchanged:: 0.1.1
+       Successful credentials checks can be cached (see 'AUTH_CACHE_SIZE').
+
     .. versionchanged:: 0.0.7
        Support for 'resource' argument.
 
@@ -175,5 +415,153 @@ class TokenAuth(BasicAuth):
         :param resource: resource being requested.
         """
         auth = request.authorization
-        return auth and self.check_auth(auth.username, allowed_roles, resource,
-                                        method)
+        return auth and self.cached_check_auth(auth.username, auth.username,
+                                               allowed_roles, resource,
+                                               method)
+
+
+class AuthCache(object):
+    """ Cache of the successful credentials checks. Entries are identified
+    by a keyed hash (HMAC-SHA256) of the credentials and of the other check
+    arguments, so that credentials are never stored in clear, and map to the
+    `request_auth_value` set by the check.
+
+    Entries are kept in process, in a LRU cache of `size` entries, unless
+    a `redis` instance is provided, in which case they are shared among all
+    the processes using the same Redis server and `secret`.
+
+    :param size: max number of entries kept in process.
+    :param ttl: seconds after which entries expire.
+    :param secret: the key of the entries hash.
+    :param redis: the redis (pyredis) instance used to share entries, if any.
+
+    .. versionadded:: 0.1.1
+    """
+    prefix = 'auth-cache/'
+
+    def __init__(self, size, ttl, secret, redis=None):
+        self.size = size
+        self.ttl = ttl
+        self.secret = secret
+        self.redis = redis
+        self._entries = LRUCache(size)
+        self._invalidated = {}
+        self._lock = threading.Lock()
+
+    def key(self, scheme, args):
+        """ Returns the cache key of a credentials check.
+
+        :param scheme: the authentication scheme (auth class name).
+        :param args: the check arguments.
+        """
+        parts = [scheme]
+        for arg in args:
+            if hasattr(arg, 'items'):
+                # request headers.
+                arg = sorted(arg.items())
+            elif isinstance(arg, bytes) and len(arg) > 64:
+                # request body.
+                arg = hashlib.sha256(arg).hexdigest()
+            parts.append(repr(arg))
+        return hmac.new(self.secret, '\0'.join(parts).encode('utf-8'),
+                        hashlib.sha256).hexdigest()
+
+    def get(self, key, identity):
+        """ Returns the `request_auth_value` cached under `key`, or `_MISS`
+        if the entry is missing, expired or invalidated.
+
+        :param key: the entry key.
+        :param identity: the identity claimed by the client.
+        """
+        identity = self._identity(identity)
+        now = time.time()
+        if self.redis:
+            raw, invalidated, cleared = self.redis.mget(
+                self.prefix + key, self.prefix + 'invalidated/' + identity,
+                self.prefix + 'invalidated/*')
+            if raw is None:
+                return _MISS
+            entry = BSON(raw).decode()
+            created, value = entry['t'], entry['v']
+            invalidated = max(float(invalidated or 0), float(cleared or 0))
+        else:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISS
+            created, value = entry
+            invalidated = self._invalidated.get(identity, 0)
+            if created + self.ttl <= now:
+                return _MISS
+        if created <= invalidated:
+            return _MISS
+        return value
+
+    def set(self, key, identity, value):
+        """ Caches a successful check outcome.
+
+        :param key: the entry key.
+        :param identity: the identity claimed by the client.
+        :param value: the `request_auth_value` set by the check.
+        """
+        now = time.time()
+        if self.redis:
+            self.redis.set(self.prefix + key,
+                           BSON.encode({'t': now, 'v': value}),
+                           ex=max(int(self.ttl), 1))
+        else:
+            self._entries.set(key, (now, value))
+
+    def invalidate(self, identity=None):
+        """ Discards the entries of an identity, or all of them if `identity`
+        is None.
+
+        :param identity: the identity whose entries are discarded.
+        """
+        now = time.time()
+        if self.redis:
+            identity = self._identity(identity) if identity is not None \
+                else '*'
+            self.redis.set(self.prefix + 'invalidated/' + identity, now,
+                           ex=max(int(self.ttl), 1))
+        elif identity is None:
+            self._entries.clear()
+        else:
+            with self._lock:
+                # records older than the ttl are useless, as are the entries
+                # they invalidate.
+                for key, when in list(self._invalidated.items()):
+                    if when + self.ttl <= now:
+                        del self._invalidated[key]
+                self._invalidated[self._identity(identity)] = now
+
+    def _identity(self, identity):
+        return hmac.new(self.secret, repr(identity).encode('utf-8'),
+                        hashlib.sha256).hexdigest()
+
+
+def auth_cache():
+    """ Returns the credentials cache of the current application, or None if
+    caching is disabled. The cache is (re)built whenever its settings change.
+
+    The cache is shared through Redis when `AUTH_CACHE_SHARED` is enabled
+    (and a Redis instance is available). Entries are keyed with
+    `AUTH_CACHE_SECRET` or, if missing, the application `SECRET_KEY`. Without
+    either, a random key is generated, and shared entries can't be used by
+    other processes.
+
+    .. versionadded:: 0.1.1
+    """
+    size = config.AUTH_CACHE_SIZE
+    if not size:
+        return None
+    ttl = config.AUTH_CACHE_TTL
+    redis = app.redis if config.AUTH_CACHE_SHARED else None
+    cache = getattr(app, '_auth_cache', None)
+    if cache is None or cache.size != size or cache.ttl != ttl or \
+            cache.redis is not redis:
+        secret = config.AUTH_CACHE_SECRET or app.secret_key or \
+            os.urandom(32)
+        if not isinstance(secret, bytes):
+            secret = secret.encode('utf-8')
+        cache = app._auth_cache = AuthCache(size, ttl, secret, redis)
+    return cache
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+
+"""
+    eve.batch
+    ~~~~~~~~~
+
+    Batch requests. A single request to the batch endpoint carries a list of
+    sub-requests, which are dispatched internally through the standard
+    endpoints. Sub-responses are then sent back to the client, in the same
+    order, within a single response.
+
+    Consecutive reads (GET, HEAD) are independent of each other and are
+    dispatched concurrently, on a pool of `BATCH_WORKERS` threads shared by
+    all the batches. Writes are dispatched one at a time, in order, after the
+    preceding reads have completed.
+
+    Sub-requests are rate limited as any other request, against the limits
+    of their own method and resource.
+
+    :copyright: (c) 2013 by Nicola Iarocci.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import os
+import threading
+import simplejson as json
+from flask import request, current_app as app
+from werkzeug.test import EnvironBuilder
+
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue  # noqa
+
+# WSGI environ key flagging sub-requests of a batch. Holds the outcomes of
+# the credentials checks performed within the batch.
+BATCH_ENVIRON_KEY = 'eve.batch'
+
+_READ_METHODS = ('GET', 'HEAD')
+
+# response headers which make no sense within a batch response.
+_DROPPED_HEADERS = ('Content-Length', 'Content-Type', 'Content-Encoding')
+
+_executor_lock = threading.Lock()
+
+
+def dispatch_batch(subrequests):
+    """ Dispatches the sub-requests of a batch, returning the list of the
+    resulting response objects, in the same order. Sub-requests inherit the
+    `Authorization` header of the batch, unless they provide their own, and
+    always accept JSON.
+
+    :param subrequests: the list of sub-requests (dicts with 'method',
+                        'path', and optional 'headers' and 'body' keys).
+
+    .. versionadded:: 0.1.1
+    """
+    auth_outcomes = {}
+    environs = [_environ(subrequest, auth_outcomes)
+                for subrequest in subrequests]
+
+    application = app._get_current_object()
+    responses = [None] * len(environs)
+    reads = []
+    for i, environ in enumerate(environs):
+        if environ['REQUEST_METHOD'] in _READ_METHODS:
+            reads.append(i)
+            continue
+        _dispatch_reads(application, environs, responses, reads)
+        reads = []
+        responses[i] = dispatch(application, environ)
+    _dispatch_reads(application, environs, responses, reads)
+    return responses
+
+
+def dispatch(application, environ):
+    """ Dispatches a sub-request through the application, within its own
+    application and request contexts, and returns the response object. The
+    response body is read before the request context is gone, since
+    streamed responses need it.
+
+    :param application: the application.
+    :param environ: the WSGI environ of the sub-request.
+
+    .. versionadded:: 0.1.1
+    """
+    with application.app_context():
+        with application.request_context(environ):
+            try:
+                response = application.full_dispatch_request()
+            except Exception as e:
+                response = application.make_response(
+                    application.handle_exception(e))
+            response.get_data()
+    return response
+
+
+def render_batch(responses):
+    """ Renders the sub-responses of a batch as a JSON list. Each item
+    carries the `status` code, the `headers` and the `body` of the
+    sub-response. JSON bodies are embedded as they are, without being
+    decoded and encoded again; other bodies are embedded as strings.
+
+    :param responses: the sub-response objects.
+
+    .. versionadded:: 0.1.1
+    """
+    items = []
+    for response in responses:
+        headers = dict((key, value) for key, value in response.headers
+                       if key not in _DROPPED_HEADERS)
+        data = response.get_data(as_text=True)
+        if not data:
+            body = 'null'
+        elif response.mimetype == 'application/json':
+            body = data
+        else:
+            body = json.dumps(data)
+        items.append('{"status": %d, "headers": %s, "body": %s}' %
+                     (response.status_code, json.dumps(headers), body))
+    return '[%s]' % ', '.join(items)
+
+
+def _environ(subrequest, auth_outcomes):
+    """ Builds the WSGI environ of a sub-request. """
+    headers = dict(subrequest.get('headers') or {})
+    authorization = request.headers.get('Authorization')
+    if authorization and 'Authorization' not in headers:
+        headers['Authorization'] = authorization
+    headers['Accept'] = 'application/json'
+    headers.pop('Accept-Encoding', None)
+
+    body = subrequest.get('body')
+    if body is not None and not isinstance(body, (bytes, type(u''))):
+        body = json.dumps(body)
+        headers.setdefault('Content-Type', 'application/json')
+
+    builder = EnvironBuilder(path=subrequest['path'],
+                             base_url=request.url_root,
+                             method=subrequest['method'].upper(),
+                             headers=list(headers.items()), data=body)
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+    if request.remote_addr:
+        environ['REMOTE_ADDR'] = request.remote_addr
+    environ[BATCH_ENVIRON_KEY] = auth_outcomes
+    return environ
+
+
+def _dispatch_reads(application, environs, responses, indexes):
+    """ Dispatches the sub-requests at `indexes`, concurrently when there is
+    more than one, storing the response objects in `responses`.
+    """
+    if len(indexes) > 1 and application.config['BATCH_WORKERS'] > 1:
+        results = batch_executor().dispatch([environs[i] for i in indexes])
+        for i, response in zip(indexes, results):
+            responses[i] = response
+    else:
+        for i in indexes:
+            responses[i] = dispatch(application, environs[i])
+
+
+class BatchExecutor(object):
+    """ Pool of threads dispatching the concurrent sub-requests of batches.
+    Threads are started on first use, and then shared by all the batches.
+
+    :param app: the application.
+    :param workers: number of worker threads.
+
+    .. versionadded:: 0.1.1
+    """
+    def __init__(self, app, workers):
+        self.app = app
+        self.workers = workers
+        self._queue = None
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def dispatch(self, environs):
+        """ Dispatches sub-requests concurrently and returns the list of the
+        response objects, in the same order, once they have all completed.
+        Exceptions propagated by the sub-requests (see
+        `PROPAGATE_EXCEPTIONS`) are raised again.
+
+        :param environs: the WSGI environs of the sub-requests.
+        """
+        queue = self._ensure_workers()
+        responses = [None] * len(environs)
+        completed = Queue()
+        for i, environ in enumerate(environs):
+            queue.put((environ, responses, i, completed))
+        errors = []
+        for environ in environs:
+            error = completed.get()
+            if error is not None:
+                errors.append(error)
+        if errors:
+            raise errors[0]
+        return responses
+
+    def stop(self):
+        """ Stops the workers once the sub-requests queued so far have been
+        dispatched.
+        """
+        if self._pid == os.getpid():
+            for i in range(self.workers):
+                self._queue.put(None)
+
+    def _ensure_workers(self):
+        """ Starts the worker threads, if not running already, and returns
+        the queue. Threads don't survive a fork, so new ones (and a new
+        queue) are started in each worker process.
+        """
+        pid = os.getpid()
+        if self._pid == pid:
+            return self._queue
+        with self._lock:
+            if self._pid != pid:
+                self._queue = Queue()
+                for i in range(self.workers):
+                    worker = threading.Thread(target=self._run,
+                                              args=(self._queue,))
+                    worker.daemon = True
+                    worker.start()
+                self._pid = pid
+        return self._queue
+
+    def _run(self, queue):
+        while True:
+            task = queue.get()
+            if task is None:
+                break
+            environ, responses, i, completed = task
+            error = None
+            try:
+                responses[i] = dispatch(self.app, environ)
+            except Exception as e:
+                error = e
+            finally:
+                completed.put(error)
+
+
+def batch_executor():
+    """ Returns the batch executor of the current application. The executor
+    is (re)built whenever `BATCH_WORKERS` changes.
+
+    .. versionadded:: 0.1.1
+    """
+    workers = app.config['BATCH_WORKERS']
+    with _executor_lock:
+        executor = getattr(app, '_batch_executor', None)
+        if executor is None or executor.workers != workers:
+            if executor is not None:
+                executor.stop()
+            executor = app._batch_executor = BatchExecutor(
+                app._get_current_object(), workers)
+    return executor
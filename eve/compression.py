@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+"""
+    eve.compression
+    ~~~~~~~~~~~~~~~
+
+    Negotiated compression (gzip, deflate) of the response bodies, streamed
+    ones included. Compressed bodies can optionally be cached so that the
+    same payload is not compressed over and over again.
+
+    :copyright: (c) 2013 by Nicola Iarocci.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import hashlib
+import zlib
+from flask import request, current_app as app
+from eve.utils import config, LRUCache, CONTENT_CODINGS
+from eve.timing import phase
+
+# wbits values producing the zlib container of each content coding.
+_WBITS = {'gzip': 16 + zlib.MAX_WBITS, 'deflate': zlib.MAX_WBITS}
+
+
+def compress_response(resp, resource=None):
+    """ Compresses the response body with the best content coding accepted by
+    the client, if `COMPRESSION` is enabled. Bodies smaller than the resource
+    `compression_min_size` are sent as-is, while streamed bodies are always
+    compressed as their size is unknown.
+
+    Since the representation depends on the `Accept-Encoding` header, `Vary`
+    is updated accordingly. The ETag of a compressed representation is
+    suffixed with the content coding (see
+    :func:`eve.utils.strip_etag_encoding`).
+
+    :param resp: the response object.
+    :param resource: the resource involved, if any.
+
+    .. versionadded:: 0.1.1
+    """
+    if not config.COMPRESSION or request.method == 'OPTIONS' or \
+            resp.status_code in (204, 304) or \
+            'Content-Encoding' in resp.headers:
+        return resp
+
+    resp.vary.add('Accept-Encoding')
+
+    encoding = request.accept_encodings.best_match(CONTENT_CODINGS)
+    if not encoding:
+        return resp
+
+    if resource:
+        settings = config.DOMAIN[resource]
+        min_size = settings['compression_min_size']
+        level = settings['compression_level']
+    else:
+        min_size = config.COMPRESSION_MIN_SIZE
+        level = config.COMPRESSION_LEVEL
+
+    with phase('compress'):
+        if resp.is_streamed:
+            body = resp.response
+            resp.response = _compress_stream(body, resp.charset, encoding,
+                                             level)
+            if hasattr(body, 'close'):
+                resp.call_on_close(body.close)
+            resp.headers.pop('Content-Length', None)
+        else:
+            body = resp.get_data()
+            if len(body) < min_size:
+                return resp
+            resp.set_data(_compress_cached(body, encoding, level))
+
+    resp.headers['Content-Encoding'] = encoding
+    etag = resp.headers.get('ETag')
+    if etag:
+        resp.headers['ETag'] = '%s-%s' % (etag, encoding)
+    return resp
+
+
+def compress(data, encoding, level):
+    """ Compresses `data` with the given content coding.
+
+    :param data: the bytes to compress.
+    :param encoding: either 'gzip' or 'deflate'.
+    :param level: the compression level, from 0 (none) to 9 (best).
+
+    .. versionadded:: 0.1.1
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, _WBITS[encoding])
+    return compressor.compress(data) + compressor.flush()
+
+
+def _compress_cached(data, encoding, level):
+    """ Same as :func:`compress`, but looks up the compressed body in the
+    cache first, when `COMPRESSION_CACHE_SIZE` is set. Bodies are identified
+    by their SHA-1 digest, which is way cheaper to compute than the actual
+    compression.
+    """
+    cache = _cache()
+    if cache is None:
+        return compress(data, encoding, level)
+
+    key = (encoding, level, hashlib.sha1(data).digest())
+    compressed = cache.get(key)
+    if compressed is None:
+        compressed = compress(data, encoding, level)
+        cache.set(key, compressed)
+    return compressed
+
+
+def _cache():
+    """ Returns the application cache of compressed bodies, or None if
+    caching is disabled. The cache is (re)built whenever its size setting
+    changes.
+    """
+    size = config.COMPRESSION_CACHE_SIZE
+    if not size:
+        return None
+    cache = getattr(app, '_compression_cache', None)
+    if cache is None or cache.capacity != size:
+        cache = app._compression_cache = LRUCache(size)
+    return cache
+
+
+def _compress_stream(chunks, charset, encoding, level):
+    """ Generator compressing a streamed body on the fly. Compressed data is
+    yielded as soon as zlib makes it available.
+
+    :param chunks: iterable of body chunks.
+    :param charset: the charset used to encode text chunks.
+    :param encoding: either 'gzip' or 'deflate'.
+    :param level: the compression level.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, _WBITS[encoding])
+    for chunk in chunks:
+        if not isinstance(chunk, bytes):
+            chunk = chunk.encode(charset)
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+
+"""
+    eve.dates
+    ~~~~~~~~~
+
+    Fast conversion of datetime values from and to strings. The default
+    RFC-1123 format is handled by a dedicated formatter and parser, which are
+    way faster than `strftime` and `strptime`. Any other format is delegated
+    to the standard library.
+
+    Also implements the schema-directed conversion of date strings found in
+    documents and query specs: only the fields which are defined as
+    `datetime` by the schema, however nested, are ever converted.
+
+    :copyright: (c) 2013 by Nicola Iarocci.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import sys
+from datetime import datetime
+
+if sys.version_info[0] == 3:
+    _str_type = str
+else:
+    _str_type = basestring  # noqa
+
+RFC1123_FORMAT = '%a, %d %b %Y %H:%M:%S GMT'
+
+_DAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+_MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep',
+           'Oct', 'Nov', 'Dec')
+_MONTH_NUMBERS = dict((month, i + 1) for i, month in enumerate(_MONTHS))
+
+# recently formatted values. Documents in a page, and their own date fields,
+# often share the same timestamps. As entries are unique to a second, the
+# cache is simply emptied when full.
+_formatted = {}
+_FORMATTED_CACHE_SIZE = 1024
+
+# query operators whose operand is a list of values.
+_LIST_OPERATORS = ('$in', '$nin', '$all')
+# query operators whose operand is a list of query specs.
+_LOGICAL_OPERATORS = ('$and', '$or', '$nor')
+
+
+def format_date(date, fmt=RFC1123_FORMAT):
+    """ Converts a datetime value to a string.
+
+    :param date: the datetime value to convert.
+    :param fmt: the format of the string. Defaults to RFC-1123.
+
+    .. versionadded:: 0.1.1
+    """
+    if fmt != RFC1123_FORMAT:
+        return datetime.strftime(date, fmt)
+
+    try:
+        return _formatted[date]
+    except KeyError:
+        pass
+    string = format_rfc1123(date)
+    if date.microsecond == 0:
+        if len(_formatted) >= _FORMATTED_CACHE_SIZE:
+            _formatted.clear()
+        _formatted[date] = string
+    return string
+
+
+def parse_date(string, fmt=RFC1123_FORMAT):
+    """ Converts a string to the corresponding datetime value. Raises
+    `ValueError` if the string does not match the format.
+
+    :param string: the string to convert.
+    :param fmt: the format of the string. Defaults to RFC-1123.
+
+    .. versionadded:: 0.1.1
+    """
+    if fmt == RFC1123_FORMAT:
+        date = parse_rfc1123(string)
+        if date is not None:
+            return date
+    return datetime.strptime(string, fmt)
+
+
+def format_rfc1123(date):
+    """ Returns the RFC-1123 representation of a datetime value, as in
+    'Tue, 06 Nov 2012 10:33:31 GMT'. Equivalent to ``strftime`` with
+    :data:`RFC1123_FORMAT`, without the locale and format string handling
+    overhead.
+
+    :param date: the datetime value to convert.
+
+    .. versionadded:: 0.1.1
+    """
+    return '%s, %02d %s %04d %02d:%02d:%02d GMT' % (
+        _DAYS[date.weekday()], date.day, _MONTHS[date.month - 1], date.year,
+        date.hour, date.minute, date.second)
+
+
+def parse_rfc1123(string):
+    """ Parses the canonical RFC-1123 representation of a datetime value.
+    Returns None if the string is not in the canonical form (in which case
+    ``strptime`` should be given a chance, as it is more lenient), or
+    doesn't represent a valid date.
+
+    :param string: the string to convert.
+
+    .. versionadded:: 0.1.1
+    """
+    if len(string) != 29 or string[25:] != ' GMT' or \
+            string[3:5] != ', ' or string[7] != ' ' or string[11] != ' ' or \
+            string[16] != ' ' or string[19] != ':' or string[22] != ':' or \
+            string[:3] not in _DAYS:
+        return None
+
+    month = _MONTH_NUMBERS.get(string[8:11])
+    digits = string[5:7] + string[12:16] + string[17:19] + string[20:22] + \
+        string[23:25]
+    if month is None or not digits.isdigit():
+        return None
+
+    try:
+        return datetime(int(string[12:16]), month, int(string[5:7]),
+                        int(string[17:19]), int(string[20:22]),
+                        int(string[23:25]))
+    except ValueError:
+        return None
+
+
+def datetime_paths(schema, prefix=''):
+    """ Returns the dotted paths of the `datetime` fields defined by a
+    schema, including the ones of embedded documents (`dict` fields) and of
+    lists, either of documents (as in 'rows.when') or of datetimes. Members
+    of fixed-position lists (`items`) are referenced by their index, as in
+    'coordinates.1'.
+
+    :param schema: the schema (or sub-schema) definition.
+    :param prefix: the path of the field owning the sub-schema, if any.
+
+    .. versionadded:: 0.1.1
+    """
+    paths = []
+    for field, definition in schema.items():
+        path = prefix + field
+        field_type = definition.get('type')
+        if field_type == 'datetime':
+            paths.append(path)
+        elif field_type == 'dict' and 'schema' in definition:
+            paths.extend(datetime_paths(definition['schema'], path + '.'))
+        elif field_type == 'list':
+            items = definition.get('schema')
+            if items and items.get('type') == 'datetime':
+                paths.append(path)
+            elif items and items.get('type') == 'dict' and 'schema' in items:
+                paths.extend(datetime_paths(items['schema'], path + '.'))
+            for i, item in enumerate(definition.get('items', [])):
+                if item.get('type') == 'datetime':
+                    paths.append('%s.%d' % (path, i))
+    return paths
+
+
+def dates_tree(paths):
+    """ Compiles a set of dotted datetime paths into a tree of nested dicts,
+    leaves being `True`. For example, 'born' and 'rows.when' become
+    ``{'born': True, 'rows': {'when': True}}``.
+
+    :param paths: the datetime paths.
+
+    .. versionadded:: 0.1.1
+    """
+    tree = {}
+    for path in paths:
+        parts = path.split('.')
+        node = tree
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = True
+    return tree
+
+
+def coerce_document(document, tree, convert):
+    """ Converts the date strings of a document to datetime values, as
+    directed by a dates tree (see :func:`dates_tree`). The document is
+    updated in place and returned. Other fields are never touched. Errors
+    raised by `convert` are propagated.
+
+    :param document: the document.
+    :param tree: the dates tree.
+    :param convert: the function converting a string to datetime.
+
+    .. versionadded:: 0.1.1
+    """
+    for key, value in document.items():
+        node = _node(tree, key)
+        if node is not None:
+            document[key] = _coerce_value(value, node, convert)
+    return document
+
+
+def coerce_query(spec, tree, convert):
+    """ Converts the date strings of a MongoDB query spec to datetime
+    values, as directed by a dates tree (see :func:`dates_tree`). Logical
+    operators, dotted field names, list (`$in`, `$nin`, `$all`) and
+    comparison operators are supported, as well as `$not` and `$elemMatch`.
+    Strings which can't be converted are left untouched. The spec is updated
+    in place and returned.
+
+    :param spec: the query spec.
+    :param tree: the dates tree.
+    :param convert: the function converting a string to datetime.
+
+    .. versionadded:: 0.1.1
+    """
+    for key, value in spec.items():
+        if key in _LOGICAL_OPERATORS:
+            for clause in value:
+                coerce_query(clause, tree, convert)
+        else:
+            node = _node(tree, key)
+            if node is not None:
+                spec[key] = _coerce_condition(value, node, convert)
+    return spec
+
+
+def _node(tree, key):
+    """ Returns the node of the dates tree matching a (possibly dotted) key,
+    or None if no datetime field lies at, or below, the key. Array indexes
+    in the key are skipped unless the tree references them.
+    """
+    node = tree
+    for part in key.split('.'):
+        if node is True:
+            return None
+        if part in node:
+            node = node[part]
+        elif not part.isdigit():
+            return None
+    return node
+
+
+def _coerce_value(value, node, convert):
+    if node is True:
+        if isinstance(value, _str_type):
+            return convert(value)
+        if isinstance(value, list):
+            return [_coerce_value(v, node, convert) for v in value]
+    elif isinstance(value, dict):
+        return coerce_document(value, node, convert)
+    elif isinstance(value, list):
+        return [_coerce_value(v, node[str(i)] if str(i) in node else node,
+                              convert)
+                for i, v in enumerate(value)]
+    return value
+
+
+def _coerce_condition(condition, node, convert):
+    if isinstance(condition, dict) and condition and \
+            all(k.startswith('$') for k in condition):
+        for operator, operand in condition.items():
+            if operator == '$elemMatch' and node is not True:
+                coerce_query(operand, node, convert)
+            elif operator in ('$not', '$elemMatch'):
+                condition[operator] = _coerce_condition(operand, node,
+                                                        convert)
+            elif operator in _LIST_OPERATORS and isinstance(operand, list):
+                condition[operator] = [_coerce_condition(v, node, convert)
+                                       for v in operand]
+            else:
+                condition[operator] = _coerce_condition(operand, node,
+                                                        convert)
+        return condition
+    try:
+        return _coerce_value(condition, node, convert)
+    except ValueError:
+        return condition
@@ -13,6 +13,45 @@
 
     .. versionchanged:: 0.1.1
        'SERVER_NAME' defaults to None.
+       'SERVER_TIMING' added and set to False.
+       'PROFILING' added and set to False.
+       'PROFILING_ALLOWED' added and set to [].
+       'PROFILING_DIR' added and set to None.
+       'PROFILING_RESTRICTIONS' added and set to 30.
+       'QUERY_EXPLAIN' added and set to False.
+       'RESPONSE_STREAMING' added and set to False.
+       'COMPRESSION' added and set to False.
+       'COMPRESSION_MIN_SIZE' added and set to 1024.
+       'COMPRESSION_LEVEL' added and set to 6.
+       'COMPRESSION_CACHE_SIZE' added and set to 0.
+       'SPARSE' added and set to False.
+       'RATE_LIMIT_SYNC_INTERVAL' added and set to None.
+       'RATE_LIMIT_SYNC_BATCH' added and set to 10.
+       'RATE_LIMIT_COST' added and set to None.
+       'AUTH_CACHE_SIZE' added and set to 0.
+       'AUTH_CACHE_TTL' added and set to 60.
+       'AUTH_CACHE_SHARED' added and set to False.
+       'AUTH_CACHE_SECRET' added and set to None.
+       'DEFERRED_HOOKS_WORKERS' added and set to 4.
+       'DEFERRED_HOOKS_QUEUE_SIZE' added and set to 1000.
+       'DEFERRED_HOOKS_TIMEOUT' added and set to 5.
+       'BATCH' added and set to False.
+       'BATCH_URL' added and set to '_batch'.
+       'BATCH_LIMIT' added and set to 50.
+       'BATCH_WORKERS' added and set to 4.
+       'SYNC' added and set to False.
+       'SYNC_RETENTION' added and set to 2592000.
+       'SYNC_WRITE_TIMEOUT' added and set to 60.
+       'NOTIFICATIONS' added and set to False.
+       'NOTIFICATIONS_URL' added and set to '_notifications'.
+       'NOTIFICATIONS_QUEUE_SIZE' added and set to 100.
+       'NOTIFICATIONS_HEARTBEAT' added and set to 15.
+       'NOTIFICATIONS_CHANNEL' added and set to 'eve-notifications'.
+       'LONG_POLLING' added and set to False.
+       'LONG_POLLING_MAX_WAIT' added and set to 30.
+       'EXPORT' added and set to False.
+       'EXPORT_URL' added and set to '_export'.
+       'EXPORT_BATCH_SIZE' added and set to 1000.
 
     .. versionchanged:: 0.1.0
        'EMBEDDING' added and set to True.
@@ -54,11 +93,34 @@ ITEM_CACHE_CONTROL = ''
 X_DOMAINS = None                # CORS disabled by default.
 X_HEADERS = None                # CORS disabled by default.
 HATEOAS = True                  # HATEOAS enabled by default.
+SERVER_TIMING = False           # Server-Timing header disabled by default.
+RESPONSE_STREAMING = False      # streamed rendering disabled by default.
+
+# on-demand request profiling (?_profile=1). Only available in debug mode.
+PROFILING = False
+# authenticated client identities allowed to profile.
+PROFILING_ALLOWED = []
+# when set, .prof files are saved here instead of returning a report.
+PROFILING_DIR = None
+PROFILING_RESTRICTIONS = 30     # number of functions listed in the report.
+
+# query plans for collection endpoints (?_explain=1). Debug mode only.
+QUERY_EXPLAIN = False
+
+# gzip/deflate compression of response bodies, as accepted by the client.
+COMPRESSION = False
+COMPRESSION_MIN_SIZE = 1024     # smaller bodies are sent uncompressed.
+COMPRESSION_LEVEL = 6           # zlib level, 1 (fastest) to 9 (smallest).
+COMPRESSION_CACHE_SIZE = 0      # number of compressed bodies kept in memory.
 
 ALLOWED_FILTERS = ['*']         # filtering enabled by default
 SORTING = True                  # sorting enabled by default.
 EMBEDDING = True                # embedding enabled by default
 PROJECTION = True               # projection enabled by default
+SPARSE = False                  # sparse responses disabled by default.
+SYNC = False                    # sync feed (?since) disabled by default.
+SYNC_RETENTION = 2592000        # seconds tombstones are kept (30 days).
+SYNC_WRITE_TIMEOUT = 60         # seconds before a write is deemed failed.
 PAGINATION = True               # pagination enabled by default.
 PAGINATION_LIMIT = 50
 PAGINATION_DEFAULT = 25
@@ -82,6 +144,12 @@ EXTRA_RESPONSE_FIELDS = []
 AUTH_FIELD = None               # user-restricted resource access is disabled
                                 # by default.
 
+# cache of successful credentials checks.
+AUTH_CACHE_SIZE = 0             # max entries kept in process. 0 disables.
+AUTH_CACHE_TTL = 60             # seconds before entries expire.
+AUTH_CACHE_SHARED = False       # share entries through Redis.
+AUTH_CACHE_SECRET = None        # key of the entries hash (SECRET_KEY).
+
 ALLOW_UNKNOWN = False           # don't allow unknown key/value pairs for
                                 # POST/PATCH payloads.
 STATUS_OK = "OK"
@@ -92,6 +160,44 @@ RATE_LIMIT_GET = None
 RATE_LIMIT_POST = None
 RATE_LIMIT_PATCH = None
 RATE_LIMIT_DELETE = None
+RATE_LIMIT_COST = None          # requests cost a single unit by default.
+
+# when set, rate limits are kept in process and synced with Redis every
+# RATE_LIMIT_SYNC_INTERVAL seconds, instead of hitting Redis on every request.
+RATE_LIMIT_SYNC_INTERVAL = None
+RATE_LIMIT_SYNC_BATCH = 10      # max units a process consumes between syncs.
+
+# deferred event hooks (see eve.hooks.deferred) run on DEFERRED_HOOKS_WORKERS
+# threads. At most DEFERRED_HOOKS_QUEUE_SIZE hooks wait to run: when the queue
+# is full, hooks are dropped after DEFERRED_HOOKS_TIMEOUT seconds.
+DEFERRED_HOOKS_WORKERS = 4
+DEFERRED_HOOKS_QUEUE_SIZE = 1000
+DEFERRED_HOOKS_TIMEOUT = 5
+
+# batch requests.
+BATCH = False                   # batch endpoint is disabled by default.
+BATCH_URL = '_batch'
+BATCH_LIMIT = 50                # max sub-requests per batch.
+BATCH_WORKERS = 4               # threads dispatching consecutive reads.
+
+# change notifications (text/event-stream). Subscribers falling behind by
+# more than NOTIFICATIONS_QUEUE_SIZE notifications are disconnected.
+NOTIFICATIONS = False           # notifications are disabled by default.
+NOTIFICATIONS_URL = '_notifications'
+NOTIFICATIONS_QUEUE_SIZE = 100
+NOTIFICATIONS_HEARTBEAT = 15    # seconds between heartbeats.
+NOTIFICATIONS_CHANNEL = 'eve-notifications'     # Redis pub/sub channel.
+
+# long-polling conditional GETs (If-None-Match and 'Prefer: wait=N'). Clients
+# are never kept waiting more than LONG_POLLING_MAX_WAIT seconds.
+LONG_POLLING = False            # long polling is disabled by default.
+LONG_POLLING_MAX_WAIT = 30
+
+# resource exports (NDJSON, CSV), read from the database EXPORT_BATCH_SIZE
+# documents at a time.
+EXPORT = False                  # exports are disabled by default.
+EXPORT_URL = '_export'
+EXPORT_BATCH_SIZE = 1000
 
 # MONGO defaults
 MONGO_HOST = 'localhost'
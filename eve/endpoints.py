@@ -16,9 +16,15 @@ from eve.methods import get, getitem, post, patch, delete, delete_resource, put
 from eve.methods.common import ratelimit
 from eve.render import send_response
 from eve.auth import requires_auth
+from eve.batch import BATCH_ENVIRON_KEY, dispatch_batch, render_batch
+from eve.compression import compress_response
+from eve.notifications import notification_bus, DELETE
+from eve.export import export_ndjson, export_csv, export_columns, \
+    EXPORT_MIMETYPES, CSV
+from eve.render import render_json
 from eve.utils import resource_uri, config, request_method, \
-    debug_error_message
-from flask import abort
+    debug_error_message, parse_request, client_projection
+from flask import abort, request, current_app as app, stream_with_context
 
 
 def collections_endpoint(url):
@@ -104,3 +110,159 @@ def home_endpoint():
     else:
         abort(404, debug_error_message("HATEOAS is disabled so we have no data"
                                        " to display at the API homepage."))
+
+
+def batch_endpoint():
+    """ Batch endpoint handler. The request payload is a JSON list of
+    sub-requests, each one with a `method`, a `path` and, optionally,
+    `headers` and a `body`. Sub-requests are dispatched through the standard
+    endpoints (see :mod:`eve.batch`), and the response is the ordered list
+    of the sub-responses.
+
+    Each sub-request is rate limited against the limits of its own method
+    and resource, the batch itself not being charged. Authorization is
+    checked for each sub-request, but each distinct credentials check is
+    performed only once.
+
+    .. versionadded:: 0.1.1
+    """
+    if BATCH_ENVIRON_KEY in request.environ:
+        abort(400, description=debug_error_message(
+            'Batch requests can not be nested'))
+
+    subrequests = request.get_json(silent=True)
+    if not isinstance(subrequests, list) or \
+            not all(isinstance(subrequest, dict) and 'method' in subrequest
+                    and 'path' in subrequest for subrequest in subrequests):
+        abort(400, description=debug_error_message(
+            'A list of sub-requests, each one with a method and a path, is '
+            'expected'))
+    if len(subrequests) > config.BATCH_LIMIT:
+        abort(400, description=debug_error_message(
+            'Batch requests are limited to %d sub-requests' %
+            config.BATCH_LIMIT))
+
+    responses = dispatch_batch(subrequests)
+    resp = app.response_class(render_batch(responses),
+                              mimetype='application/json')
+    for response in responses:
+        # runs the deferred hooks of the sub-requests, if any.
+        resp.call_on_close(response.close)
+    return compress_response(resp)
+
+
+def notifications_endpoint(url):
+    """ Notifications endpoint handler (see :func:`notifications`).
+
+    :param url: the url that led here
+
+    .. versionadded:: 0.1.1
+    """
+    return notifications(config.RESOURCES[url])
+
+
+@ratelimit()
+@requires_auth('resource')
+def notifications(resource):
+    """ Streams the changes made to the documents of a resource, as
+    Server-Sent Events (`text/event-stream`). Each event carries the kind of
+    change ('insert', 'update', 'replace' or 'delete') and the document, or
+    just its id when deleted. Clients can narrow the stream down with a
+    `where` clause. Comment lines are sent every `NOTIFICATIONS_HEARTBEAT`
+    seconds, so that proxies keep the connection open and disconnected
+    clients are detected. A 'reset' event asks the client to reload the
+    resource, as some changes could not be notified.
+
+    :param resource: the name of the resource.
+
+    .. versionadded:: 0.1.1
+    """
+    if BATCH_ENVIRON_KEY in request.environ:
+        abort(400, description=debug_error_message(
+            'Notifications are not available within batch requests'))
+
+    req = parse_request(resource)
+    match = app.data.matcher(resource, req.where)
+    bus = notification_bus()
+    queue_size = config.NOTIFICATIONS_QUEUE_SIZE
+    heartbeat = config.NOTIFICATIONS_HEARTBEAT
+    projection = config.DOMAIN[resource]['datasource']['projection']
+    id_field = config.ID_FIELD
+    # the stream outlives the app context, and with it the settings.
+    date_format = config.DATE_FORMAT
+
+    def stream():
+        subscription = bus.subscribe(resource, queue_size)
+        try:
+            # sent right away, so that the client knows it is subscribed.
+            yield ': subscribed\n\n'
+            for event in subscription.events(match, heartbeat):
+                if event is None:
+                    yield ': heartbeat\n\n'
+                    continue
+                name, document = event
+                if document is None:
+                    data = None
+                elif name == DELETE:
+                    data = {id_field: document[id_field]}
+                else:
+                    data = dict((field, value) for field, value in
+                                document.items() if projection.get(field))
+                yield 'event: %s\ndata: %s\n\n' % (
+                    name, render_json(data, date_format))
+        finally:
+            subscription.close()
+
+    resp = app.response_class(stream(), mimetype='text/event-stream')
+    resp.headers['Cache-Control'] = 'no-cache'
+    # nginx would buffer the stream otherwise.
+    resp.headers['X-Accel-Buffering'] = 'no'
+    return resp
+
+
+def export_endpoint(url):
+    """ Export endpoint handler (see :func:`export`).
+
+    :param url: the url that led here
+
+    .. versionadded:: 0.1.1
+    """
+    return export(config.RESOURCES[url])
+
+
+@ratelimit()
+@requires_auth('resource')
+def export(resource):
+    """ Streams all the documents of a resource matching the request, as
+    newline-delimited JSON (`application/x-ndjson`) or CSV (`text/csv`),
+    depending on the `Accept` header. Unlike collection GETs, the resultset
+    is not paginated: documents are read with a single cursor,
+    `EXPORT_BATCH_SIZE` at a time, and sent as they come. `where`, `sort`
+    and `projection` are supported.
+
+    :param resource: the name of the resource.
+
+    .. versionadded:: 0.1.1
+    """
+    if BATCH_ENVIRON_KEY in request.environ:
+        abort(400, description=debug_error_message(
+            'Exports are not available within batch requests'))
+
+    req = parse_request(resource)
+    mimetype = request.accept_mimetypes.best_match(EXPORT_MIMETYPES) or \
+        EXPORT_MIMETYPES[0]
+    if mimetype == CSV:
+        # checked before the response starts, as the projection is.
+        columns = export_columns(resource, client_projection(req))
+    cursor = app.data.find_all(resource, req, config.EXPORT_BATCH_SIZE)
+
+    if mimetype == CSV:
+        body = export_csv(cursor, columns)
+        extension = 'csv'
+    else:
+        body = export_ndjson(cursor)
+        extension = 'ndjson'
+    resp = app.response_class(stream_with_context(body), mimetype=mimetype)
+    resp.headers['Content-Disposition'] = 'attachment; filename=%s.%s' % (
+        resource, extension)
+    return compress_response(resp, resource)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+"""
+    eve.export
+    ~~~~~~~~~~
+
+    Resource exports. Documents are read from a single datasource cursor and
+    streamed to the client as they come, either as newline-delimited JSON
+    (one document per line) or as CSV, so that memory use does not grow with
+    the size of the resource.
+
+    :copyright: (c) 2013 by Nicola Iarocci.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import re
+import datetime
+from bson.objectid import ObjectId
+from eve.methods.common import last_updated, date_created
+from eve.render import render_json
+from eve.utils import config, date_to_str
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    # Python 2.6.
+    OrderedDict = None
+
+NDJSON = 'application/x-ndjson'
+CSV = 'text/csv'
+
+# export formats, in order of preference.
+EXPORT_MIMETYPES = (NDJSON, CSV)
+
+# CSV fields holding any of these characters need to be quoted (RFC 4180).
+_CSV_SPECIAL = re.compile('[,"\r\n]')
+
+
+def export_ndjson(documents):
+    """ Renders documents as newline-delimited JSON, one line at a time.
+
+    :param documents: the documents.
+
+    .. versionadded:: 0.1.1
+    """
+    for document in _fixed(documents):
+        yield render_json(document) + '\n'
+
+
+def export_csv(documents, columns):
+    """ Renders documents as CSV, one line at a time, starting with the
+    header line. Datetimes are formatted as in JSON responses, while lists
+    and embedded documents are rendered as JSON.
+
+    :param documents: the documents.
+    :param columns: the fields making the columns, in order (see
+                    :func:`export_columns`).
+
+    .. versionadded:: 0.1.1
+    """
+    yield _csv_row(columns)
+    for document in _fixed(documents):
+        yield _csv_row([document.get(column) for column in columns])
+
+
+def export_columns(resource, projection=None):
+    """ Returns the CSV columns of a resource: the id field, the schema
+    fields and the automatic date fields. Schema fields follow the schema
+    order when the schema is an `OrderedDict`, and are sorted by name
+    otherwise, so that columns don't change from a process to another.
+    Fields left out by the resource projection or by the client projection,
+    if any, are skipped.
+
+    :param resource: the resource name.
+    :param projection: the client projection (see
+                       :func:`eve.utils.client_projection`), if any.
+
+    .. versionadded:: 0.1.1
+    """
+    settings = config.DOMAIN[resource]
+    resource_projection = settings['datasource']['projection']
+    schema = settings['schema']
+    if OrderedDict is not None and isinstance(schema, OrderedDict):
+        schema_fields = list(schema)
+    else:
+        schema_fields = sorted(schema)
+    fields = [config.ID_FIELD] + schema_fields + \
+        [config.LAST_UPDATED, config.DATE_CREATED]
+    columns = []
+    for field in fields:
+        if field in columns or not resource_projection.get(field):
+            continue
+        # the id is always returned by the datasource.
+        if projection and field != config.ID_FIELD and \
+                field not in projection:
+            continue
+        columns.append(field)
+    return columns
+
+
+def _fixed(documents):
+    """ Fixes the automatic date fields of documents, as it happens with
+    GET responses, while they are being iterated.
+    """
+    for document in documents:
+        document[config.LAST_UPDATED] = last_updated(document)
+        document[config.DATE_CREATED] = date_created(document)
+        yield document
+
+
+def _csv_row(values):
+    return ','.join(_csv_field(value) for value in values) + '\r\n'
+
+
+def _csv_field(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.datetime):
+        value = date_to_str(value)
+    elif isinstance(value, ObjectId):
+        value = str(value)
+    elif not isinstance(value, type(u'')):
+        # numbers, booleans, lists and embedded documents.
+        value = render_json(value)
+    if _CSV_SPECIAL.search(value):
+        value = '"%s"' % value.replace('"', '""')
+    return value
@@ -14,15 +14,25 @@
 import eve
 import sys
 import os
-from flask import Flask
+from flask import Flask, request
 from werkzeug.routing import BaseConverter
 from werkzeug.serving import WSGIRequestHandler
 from eve.io.mongo import Mongo, Validator
+from eve.dates import datetime_paths, dates_tree
 from eve.exceptions import ConfigException, SchemaException
-from eve.endpoints import collections_endpoint, item_endpoint, home_endpoint
+from eve.endpoints import collections_endpoint, item_endpoint, home_endpoint, \
+    batch_endpoint, notifications_endpoint, export_endpoint
 from eve.utils import api_prefix, extract_key_values
+from eve.timing import start_request_timer, add_server_timing, phase
+from eve.profiling import profiling_requested, profile
+from eve.hooks import schedule_deferred_hooks
 from events import Events
 
+# events raised by Eve itself. Each one comes in a general flavor and a
+# resource-level one, as in 'on_insert' and 'on_insert_<resource>'.
+EVENTS = ('on_fetch_resource', 'on_fetch_item', 'on_insert', 'on_GET',
+          'on_POST', 'on_PATCH', 'on_PUT', 'on_DELETE')
+
 
 class EveWSGIRequestHandler(WSGIRequestHandler):
     """ Extend werkzeug request handler to include current Eve version in all
@@ -60,8 +70,27 @@ class Eve(Flask, Events):
                  requests. Must be a :class: `eve.auth.BasicAuth` subclass.
     :param redis: the redis (pyredis) instance used by the Rate-Limiting
                   feature, if enabled.
+    :param ratelimiter: the rate limiter used by the Rate-Limiting feature.
+                        Must be a :class:`eve.ratelimit.RateLimiter` instance.
+                        Defaults to a Redis-based limiter, if `redis` is
+                        provided.
+    :param notification_bus: the bus carrying change notifications. Must be a
+                             :class:`eve.notifications.Bus` instance. Defaults
+                             to a Redis-based bus if `redis` is provided, and
+                             to an in-process one otherwise.
     :param kwargs: optional, standard, Flask parameters.
 
+    .. versionchanged:: 0.1.1
+       'ratelimiter' argument added to support pluggable rate limiters.
+       'notification_bus' argument added to support pluggable notification
+       buses.
+       Subscriptions to Eve events are tracked in a registry, so that events
+       without subscribers cost next to nothing (see :meth:`raise_hooks`).
+       Deferred event hooks (see :func:`eve.hooks.deferred`).
+       Request phases are timed and reported with the 'Server-Timing' header
+       when 'SERVER_TIMING' is enabled.
+       On-demand request profiling ('PROFILING').
+
     .. versionchanged:: 0.1.0
        Now supporting both "trailing slashes" and "no-trailing slashes" URLs.
 
@@ -78,7 +107,7 @@ class Eve(Flask, Events):
     """
     def __init__(self, import_name=__package__, settings='settings.py',
                  validator=Validator, data=Mongo, auth=None, redis=None,
-                 **kwargs):
+                 ratelimiter=None, notification_bus=None, **kwargs):
         """Eve main WSGI app is implemented as a Flask subclass. Since we want
         to be able to launch our API by simply invoking Flask's run() method,
         we need to enhance our super-class a little bit.
@@ -91,9 +120,14 @@ class Eve(Flask, Events):
             4. set the validator class used to validate incoming objects
             5. activate the chosen data layer
             6. instance the authentication layer if needed
-            7. set the redis instance to be used by the Rate-Limiting feature
+            7. set the redis instance and rate limiter to be used by the
+               Rate-Limiting feature
+            8. set the bus carrying change notifications
         """
 
+        # subscribed Eve events, by (event, resource). See raise_hooks().
+        self._hooks = {}
+
         # TODO should we support standard Flask parameters as well?
         super(Eve, self).__init__(import_name, **kwargs)
         # enable regex routing
@@ -111,6 +145,65 @@ class Eve(Flask, Events):
         self.data = data(self)
         self.auth = auth() if auth else None
         self.redis = redis
+        self.ratelimiter = ratelimiter
+        self.notification_bus = notification_bus
+
+        # request phases instrumentation (see SERVER_TIMING)
+        self.before_request(start_request_timer)
+        self.after_request(add_server_timing)
+
+        # deferred event hooks run once the response has been sent.
+        self.after_request(schedule_deferred_hooks)
+
+    def __setattr__(self, name, value):
+        """ Keeps the hooks registry up to date. Subscribing to an event
+        (``app.on_insert += callback``) always ends up assigning the event
+        slot to the app attribute, and so does unsubscribing.
+
+        .. versionadded:: 0.1.1
+        """
+        super(Eve, self).__setattr__(name, value)
+        if name.startswith('on_'):
+            for event in EVENTS:
+                if name == event:
+                    key = (event, None)
+                elif name.startswith(event + '_'):
+                    key = (event, name[len(event) + 1:])
+                else:
+                    continue
+                if value is None:
+                    self._hooks.pop(key, None)
+                else:
+                    self._hooks[key] = value
+                break
+
+    def raise_hooks(self, event, resource, args, name=None):
+        """ Raises an Eve event: the general hooks receive the resource name
+        followed by `args`, while the resource-level hooks only receive
+        `args`. Events nobody subscribed to are skipped altogether, no event
+        slot being created or called for them.
+
+        :param event: the event, as in 'on_insert'.
+        :param resource: the resource involved, if any.
+        :param args: the tuple of arguments passed to the hooks.
+        :param name: the name of the resource-level event, when other than
+                     the resource name (see `on_fetch_item_<item_title>`).
+
+        .. versionadded:: 0.1.1
+        """
+        hooks = self._hooks
+        if not hooks:
+            return
+        general = hooks.get((event, None))
+        specific = hooks.get((event, name or resource)) if resource else None
+        # event slots evaluate to False when they have no subscribers.
+        if not (general or specific):
+            return
+        with phase('hooks'):
+            if general:
+                general(resource, *args)
+            if specific:
+                specific(*args)
 
     def run(self, host=None, port=None, debug=None, **options):
         """Pass our own subclass of :class:`werkzeug.serving.WSGIRequestHandler
@@ -130,6 +223,19 @@ class Eve(Flask, Events):
         options.setdefault('request_handler', EveWSGIRequestHandler)
         super(Eve, self).run(host, port, debug, **options)
 
+    def dispatch_request(self):
+        """ Dispatches the request to the appropriate view function. When
+        requested by the client with ``?_profile=1`` (and allowed by
+        configuration) the view is run under cProfile. See
+        :mod:`eve.profiling`.
+
+        .. versionadded:: 0.1.1
+        """
+        dispatch = super(Eve, self).dispatch_request
+        if profiling_requested():
+            return profile(dispatch)
+        return dispatch()
+
     def load_config(self):
         """API settings are loaded from standard python modules. First from
         `settings.py`(or alternative name/path passed as an argument) and
@@ -307,6 +413,19 @@ class Eve(Flask, Events):
         """ When not provided, fills individual resource settings with default
         or global configuration settings.
 
+        .. versionchanged:: 0.1.1
+           'compression_min_size',
+           'compression_level',
+           'sparse',
+           'sync',
+           'notifications',
+           'long_polling',
+           'export',
+           'rate_limit',
+           'rate_limit_cost'.
+           'dates' includes nested datetime fields.
+           'dates_tree'.
+
         .. versionchanged:: 0.1.0
           'embedding'.
            Support for optional HATEOAS.
@@ -370,6 +489,16 @@ class Eve(Flask, Events):
             settings.setdefault('embedding', self.config['EMBEDDING'])
             settings.setdefault('pagination', self.config['PAGINATION'])
             settings.setdefault('projection', self.config['PROJECTION'])
+            settings.setdefault('sparse', self.config['SPARSE'])
+            settings.setdefault('sync', self.config['SYNC'])
+            settings.setdefault('notifications',
+                                self.config['NOTIFICATIONS'])
+            settings.setdefault('long_polling', self.config['LONG_POLLING'])
+            settings.setdefault('export', self.config['EXPORT'])
+            # per-method limits overriding the global RATE_LIMIT_* ones.
+            settings.setdefault('rate_limit', {})
+            settings.setdefault('rate_limit_cost',
+                                self.config['RATE_LIMIT_COST'])
             # TODO make sure that this we really need the test below
             if settings['item_lookup']:
                 item_methods = self.config['ITEM_METHODS']
@@ -385,6 +514,10 @@ class Eve(Flask, Events):
                                 self.config['MONGO_WRITE_CONCERN'])
             settings.setdefault('hateoas',
                                 self.config['HATEOAS'])
+            settings.setdefault('compression_min_size',
+                                self.config['COMPRESSION_MIN_SIZE'])
+            settings.setdefault('compression_level',
+                                self.config['COMPRESSION_LEVEL'])
 
             # empty schemas are allowed for read-only access to resources
             schema = settings.setdefault('schema', {})
@@ -406,14 +539,15 @@ class Eve(Flask, Events):
             projection[self.config['LAST_UPDATED']] = 1
             projection[self.config['DATE_CREATED']] = 1
 
-            # `dates` helper set contains the names of the schema fields
-            # defined as `datetime` types. It will come in handy when
-            # we will be parsing incoming documents
-
-            # TODO support date fields for embedded documents.
-            settings['dates'] = \
-                set(field for field, definition in schema.items()
-                    if definition.get('type') == 'datetime')
+            # `dates` helper set contains the (dotted) paths of the schema
+            # fields defined as `datetime` types, however nested. It is
+            # compiled into the `dates_tree` helper, which directs the
+            # conversion of date strings in incoming documents and queries.
+            # Automatic date fields are always included in the tree.
+            settings['dates'] = set(datetime_paths(schema))
+            settings['dates_tree'] = dates_tree(
+                settings['dates'] | set([self.config['LAST_UPDATED'],
+                                         self.config['DATE_CREATED']]))
 
             # 'defaults' helper set contains the names of fields with
             # default values in their schema definition.
@@ -444,10 +578,28 @@ class Eve(Flask, Events):
             data_relation.setdefault('field',
                                      self.config['ID_FIELD'])
 
+    def allowed_methods(self):
+        """ Returns the value of the Allow header for the current request url,
+        as precomputed for the matching url rule. Urls matching rules which
+        have been added after the API endpoints are resolved by Flask.
+
+        .. versionadded:: 0.1.1
+        """
+        try:
+            return self._allowed_methods[request.url_rule.rule]
+        except (AttributeError, KeyError):
+            return self.make_default_options_response().headers['allow']
+
     def _add_url_rules(self):
         """ Builds the API url map. Methods are enabled for each mapped
         endpoint, as configured in the settings.
 
+        .. versionchanged:: 0.1.1
+           Allowed methods are precomputed for each url rule.
+           Batch endpoint, when 'BATCH' is enabled.
+           Notifications endpoint of resources with 'notifications' enabled.
+           Export endpoint of resources with 'export' enabled.
+
         .. versionchanged:: 0.0.9
            Handle the case of 'additional_lookup' field being an integer.
 
@@ -479,6 +631,12 @@ class Eve(Flask, Events):
         self.add_url_rule('%s/' % prefix, 'home', view_func=home_endpoint,
                           methods=['GET', 'OPTIONS'])
 
+        # batch endpoint
+        if self.config['BATCH']:
+            self.add_url_rule('%s/%s' % (prefix, self.config['BATCH_URL']),
+                              'batch', view_func=batch_endpoint,
+                              methods=['POST'])
+
         for resource, settings in self.config['DOMAIN'].items():
             resources[settings['url']] = resource
             urls[resource] = settings['url']
@@ -490,6 +648,19 @@ class Eve(Flask, Events):
                               methods=settings['resource_methods'] +
                               ['OPTIONS'])
 
+            # notifications endpoint
+            if settings['notifications']:
+                self.add_url_rule('%s/%s' % (url,
+                                             self.config['NOTIFICATIONS_URL']),
+                                  view_func=notifications_endpoint,
+                                  methods=['GET'])
+
+            # export endpoint
+            if settings['export']:
+                self.add_url_rule('%s/%s' % (url, self.config['EXPORT_URL']),
+                                  view_func=export_endpoint,
+                                  methods=['GET'])
+
             # item endpoint
             if settings['item_lookup']:
                 item_url = '%s/<regex("%s"):%s>' % \
@@ -520,3 +691,11 @@ class Eve(Flask, Events):
         self.config['RESOURCES'] = resources
         self.config['URLS'] = urls
         self.config['SOURCES'] = datasources
+
+        # compile the Allow header value of each url rule. Rules sharing the
+        # same url (think the POST override of item endpoints) add up.
+        methods = {}
+        for rule in self.url_map.iter_rules():
+            methods.setdefault(rule.rule, set()).update(rule.methods)
+        self._allowed_methods = dict((url, ', '.join(sorted(m)))
+                                     for url, m in methods.items())
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+
+"""
+    eve.hooks
+    ~~~~~~~~~
+
+    Deferred event hooks. A callback wrapped with :func:`deferred` does not
+    run when the event is raised. A snapshot of its arguments is taken
+    instead, and the callback runs once the response has been sent to the
+    client, on a bounded pool of worker threads. Plain callbacks keep running
+    inline, as usual.
+
+    :copyright: (c) 2013 by Nicola Iarocci.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import copy
+import os
+import threading
+from flask import g, has_request_context, current_app as app
+from werkzeug.local import LocalProxy
+from werkzeug.wrappers import BaseRequest, BaseResponse
+from eve.utils import config
+
+try:
+    from queue import Queue, Full
+except ImportError:
+    from Queue import Queue, Full  # noqa
+
+_executor_lock = threading.Lock()
+
+
+def deferred(callback):
+    """ Wraps an event hook so that it runs in the background, after the
+    response has been sent: ::
+
+        >>> app.on_insert_contacts += deferred(send_notifications)
+        >>> app.on_PATCH += deferred(audit)
+
+    Arguments are snapshotted when the event is raised. Documents are deep
+    copied, so that the callback sees them as they were at that time and
+    can't alter the response. Request and response objects are passed as
+    they are, and only their data should be relied upon. Callbacks run
+    within the application context, and their exceptions are logged.
+
+    :param callback: the event hook.
+
+    .. versionadded:: 0.1.1
+    """
+    return DeferredHook(callback)
+
+
+class DeferredHook(object):
+    """ Event hook queueing its callback for background execution. Hooks
+    wrapping the same callback compare equal, so that they can be
+    unsubscribed with ``app.on_insert -= deferred(callback)``.
+
+    :param callback: the wrapped event hook.
+
+    .. versionadded:: 0.1.1
+    """
+    def __init__(self, callback):
+        self.callback = callback
+
+    def __call__(self, *args):
+        task = (self.callback, snapshot(args))
+        if has_request_context():
+            # handed to the executor when the response is closed.
+            pending = getattr(g, '_deferred_hooks', None)
+            if pending is None:
+                pending = g._deferred_hooks = []
+            pending.append(task)
+        else:
+            hook_executor().submit(*task)
+
+    def __eq__(self, other):
+        return isinstance(other, DeferredHook) and \
+            other.callback == self.callback
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.callback)
+
+    def __repr__(self):
+        return 'deferred(%r)' % self.callback
+
+
+def snapshot(args):
+    """ Returns a copy of event arguments which is safe to use once the
+    request is over. Request and response objects are not copied.
+
+    :param args: the event arguments.
+
+    .. versionadded:: 0.1.1
+    """
+    return tuple(_snapshot(arg) for arg in args)
+
+
+def _snapshot(value):
+    if isinstance(value, LocalProxy):
+        value = value._get_current_object()
+    if isinstance(value, (BaseRequest, BaseResponse)):
+        return value
+    return copy.deepcopy(value)
+
+
+def schedule_deferred_hooks(response):
+    """ `after_request` handler handing the deferred hooks raised by the
+    request over to the executor, once the response has been sent.
+
+    :param response: the response object.
+
+    .. versionadded:: 0.1.1
+    """
+    pending = getattr(g, '_deferred_hooks', None)
+    if pending:
+        executor = hook_executor()
+
+        def submit():
+            for callback, args in pending:
+                executor.submit(callback, args)
+        response.call_on_close(submit)
+    return response
+
+
+class HookExecutor(object):
+    """ Bounded pool of threads running deferred hooks, in the order they
+    are submitted. When the queue is full, :meth:`submit` blocks for up to
+    `timeout` seconds, slowing down the request workers, before dropping the
+    hook.
+
+    :param app: the application.
+    :param workers: number of worker threads.
+    :param queue_size: max number of hooks waiting to run.
+    :param timeout: seconds :meth:`submit` waits for room in the queue.
+
+    .. versionadded:: 0.1.1
+    """
+    def __init__(self, app, workers, queue_size, timeout):
+        self.app = app
+        self.workers = workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._queue = None
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def submit(self, callback, args):
+        """ Queues a hook for execution. Errors are logged if the queue
+        stays full.
+
+        :param callback: the hook.
+        :param args: the hook arguments.
+        """
+        queue = self._ensure_workers()
+        try:
+            queue.put((callback, args), timeout=self.timeout)
+        except Full:
+            self.app.logger.error('Deferred hook %r dropped, the queue is '
+                                  'full' % callback)
+
+    def join(self):
+        """ Waits until the hooks queued so far have run. """
+        if self._queue is not None:
+            self._queue.join()
+
+    def stop(self):
+        """ Stops the workers once the hooks queued so far have run. """
+        if self._pid == os.getpid():
+            for i in range(self.workers):
+                self._queue.put(None)
+
+    def _ensure_workers(self):
+        """ Starts the worker threads, if not running already, and returns
+        the queue. Threads don't survive a fork, so new ones (and a new
+        queue) are started in each worker process.
+        """
+        pid = os.getpid()
+        if self._pid == pid:
+            return self._queue
+        with self._lock:
+            if self._pid != pid:
+                self._queue = Queue(self.queue_size)
+                for i in range(self.workers):
+                    worker = threading.Thread(target=self._run,
+                                              args=(self._queue,))
+                    worker.daemon = True
+                    worker.start()
+                self._pid = pid
+        return self._queue
+
+    def _run(self, queue):
+        while True:
+            task = queue.get()
+            try:
+                if task is None:
+                    break
+                callback, args = task
+                with self.app.app_context():
+                    callback(*args)
+            except Exception:
+                self.app.logger.exception('Deferred hook %r failed' %
+                                          callback)
+            finally:
+                queue.task_done()
+
+
+def hook_executor():
+    """ Returns the deferred hooks executor of the current application. The
+    executor is (re)built whenever its settings change.
+
+    .. versionadded:: 0.1.1
+    """
+    workers = config.DEFERRED_HOOKS_WORKERS
+    queue_size = config.DEFERRED_HOOKS_QUEUE_SIZE
+    timeout = config.DEFERRED_HOOKS_TIMEOUT
+    with _executor_lock:
+        executor = getattr(app, '_hook_executor', None)
+        if executor is None or executor.workers != workers or \
+                executor.queue_size != queue_size or \
+                executor.timeout != timeout:
+            if executor is not None:
+                executor.stop()
+            executor = app._hook_executor = HookExecutor(
+                app._get_current_object(), workers, queue_size, timeout)
+    return executor
@@ -86,6 +86,68 @@ class DataLayer(object):
         """
         raise NotImplementedError
 
+    def find_all(self, resource, req, batch_size):
+        """Retrieves all the documents (rows) matching the current request,
+        disregarding pagination. Consumed by resource exports
+        (`/people/_export`), which stream the documents one at a time. The
+        returned iterable is therefore expected to fetch documents from the
+        database lazily, `batch_size` at a time.
+
+        :param resource: resource being accessed.
+        :param req: an instance of ``eve.utils.ParsedRequest``. Paging
+                    arguments (`page` and `max_results`) are ignored.
+        :param batch_size: number of documents to fetch at a time.
+
+        .. versionadded:: 0.1.1
+        """
+        raise NotImplementedError
+
+    def explain(self, resource, req):
+        """Returns a dict describing how the datasource would satisfy a
+        :func:`find` call for the same request: the actual query, sort,
+        paging and projection, along with the query plan as reported by the
+        database. Only used in debug mode (see `QUERY_EXPLAIN`).
+
+        :param resource: resource being accessed.
+        :param req: an instance of ``eve.utils.ParsedRequest``.
+
+        .. versionadded:: 0.1.1
+        """
+        raise NotImplementedError
+
+    def changes(self, resource, since, max_results):
+        """Retrieves the changes made to a resource after a sync token, in the
+        order they were made. Consumed by sync requests (`/people/?since=`)
+        when `sync` is enabled for the resource, in which case the datasource
+        is also expected to keep track of removed documents/rows.
+
+        :param resource: resource being accessed.
+        :param since: the token returned by the previous sync request. Empty
+                      for the first request, which gets the whole resource.
+        :param max_results: max number of changes to return.
+        :return: a tuple with the list of documents inserted or updated, the
+                 list of ids of removed documents, the token of the next
+                 request and a flag telling whether more changes are pending.
+
+        .. versionadded:: 0.1.1
+        """
+        raise NotImplementedError
+
+    def matcher(self, resource, where=None):
+        """Returns a predicate (a function accepting a document) telling
+        whether a document matches the `where` clause of a request, as well as
+        the base query (filter) and the `auth_field` restriction of the
+        resource. Consumed by change notifications, as documents being
+        written are matched against the clauses of the clients subscribed to
+        them.
+
+        :param resource: resource being accessed.
+        :param where: the `where` clause. Can be None.
+
+        .. versionadded:: 0.1.1
+        """
+        raise NotImplementedError
+
     def find_one(self, resource, **lookup):
         """Retrieves a single document/record. Consumed when a request hits an
         item endpoint (`/people/id/`).
@@ -112,7 +174,11 @@ class DataLayer(object):
         to retrieve
         :param client_projection: a specific projection to use
         :return: a list of documents matching the ids in `ids` from the
-        collection specified in `resource`
+        collection specified in `resource`, in the same order. Ids which
+        don't match any document are skipped.
+
+        .. versionchanged:: 0.1.1
+           Documents are returned as a list, in the order of `ids`.
 
         .. versionadded:: 0.1.0
         """
@@ -221,6 +287,8 @@ class DataLayer(object):
 
         .. versionchanged:: 0.1.1
            auth.request_auth_value is now used to store the auth_field value.
+           Notification streams and exports are checked against
+           `public_methods`.
 
         .. versionchanged:: 0.1.0
            Calls `combine_queries` to merge query and filter_
@@ -269,7 +337,8 @@ class DataLayer(object):
         # If the current HTTP method is in `public_methods` or
         # `public_item_methods`, skip the `auth_field` check
 
-        if request.endpoint == 'collections_endpoint':
+        if request.endpoint in ('collections_endpoint',
+                                'notifications_endpoint', 'export_endpoint'):
             # We need to check against `public_methods`
             public_method_list_to_check = 'public_methods'
         else:
@@ -11,19 +11,38 @@
 """
 
 import ast
-import itertools
+import time
+from datetime import datetime, timedelta
 from bson.errors import InvalidId
 import simplejson as json
 import pymongo
 import sys
 from flask import abort
 from flask.ext.pymongo import PyMongo
-from datetime import datetime
 from bson import ObjectId
+from bson.json_util import dumps
 from eve import ID_FIELD
 from eve.io.mongo.parser import parse, ParseError
+from eve.io.mongo.query import combine, compile_query, get_value
 from eve.io.base import DataLayer, ConnectionException
-from eve.utils import config, debug_error_message, validate_filters
+from eve.utils import config, debug_error_message, validate_filters, \
+    client_projection
+from eve.timing import phase
+from eve.dates import parse_date, coerce_query
+
+# documents of resources with `sync` enabled are stamped, on every write,
+# with a sequence number taken from a per-collection counter. Removed
+# documents leave a tombstone behind, in a companion collection.
+SEQ_FIELD = '_seq'
+SYNC_COUNTERS = '_sync_counters'
+TOMBSTONES = '%s_tombstones'
+
+# documents tombstoned, and then removed, at once.
+_TOMBSTONES_BATCH = 1000
+
+# seconds between two prunings of the tombstones of a collection, per
+# process.
+_PRUNE_INTERVAL = 60
 
 
 class Mongo(DataLayer):
@@ -32,6 +51,10 @@ class Mongo(DataLayer):
 
     def init_app(self, app):
         """
+        .. versionchanged:: 0.1.1
+           Keeps track of the collections prepared for sync requests, and of
+           the last time their tombstones were pruned.
+
         .. versionchanged:: 0.0.9
            support for Python 3.3.
         """
@@ -40,6 +63,8 @@ class Mongo(DataLayer):
             self.driver = PyMongo(app)
         except Exception as e:
             raise ConnectionException(e)
+        self._sync_ready = set()
+        self._pruned_at = {}
 
     def find(self, resource, req):
         """Retrieves a set of documents matching a given request. Queries can
@@ -57,6 +82,10 @@ class Mongo(DataLayer):
         :param resource: resource name.
         :param req: a :class:`ParsedRequest`instance.
 
+        .. versionchanged:: 0.1.1
+           Parsing of the `where` clause is accounted to the 'parse' phase
+           when 'SERVER_TIMING' is enabled.
+
         .. versionchanged:: 0.0.9
            More informative error messages.
 
@@ -74,6 +103,107 @@ class Mongo(DataLayer):
         .. versionchanged:: 0.0.4
            retrieves the target collection via the new config.SOURCES helper.
         """
+        datasource, args = self._find_args(resource, req)
+        return self.driver.db[datasource].find(**args)
+
+    def find_all(self, resource, req, batch_size):
+        """Retrieves all the documents matching a given request, with a
+        single cursor. Filters, sorting and projections are the same as with
+        :func:`find`, but the resultset is not paginated.
+
+        :param resource: resource name.
+        :param req: a :class:`ParsedRequest`instance.
+        :param batch_size: number of documents fetched per round trip.
+
+        .. versionadded:: 0.1.1
+        """
+        datasource, args = self._find_args(resource, req)
+        args.pop('skip', None)
+        args.pop('limit', None)
+        return self.driver.db[datasource].find(**args).batch_size(batch_size)
+
+    def explain(self, resource, req):
+        """Returns the query that :func:`find` would send to MongoDB for the
+        current request (spec, sort, skip/limit and projection), along with
+        the server's explain output and a summary of it: winning plan, keys
+        and documents examined, plus flags for collection scans and in-memory
+        sorts.
+
+        Both the legacy (MongoDB 2.x) and the `queryPlanner`/`executionStats`
+        explain formats are supported.
+
+        :param resource: resource name.
+        :param req: a :class:`ParsedRequest`instance.
+
+        .. versionadded:: 0.1.1
+        """
+        datasource, args = self._find_args(resource, req)
+        explain = self.driver.db[datasource].find(**args).explain()
+        # make sure special BSON values (MinKey, MaxKey, etc.) can be
+        # rendered.
+        explain = json.loads(dumps(explain))
+
+        if 'queryPlanner' in explain:
+            winning_plan = explain['queryPlanner'].get('winningPlan', {})
+            stats = explain.get('executionStats', {})
+            keys_examined = stats.get('totalKeysExamined')
+            docs_examined = stats.get('totalDocsExamined')
+            returned = stats.get('nReturned')
+            stages = list(self._plan_stages(winning_plan))
+            collscan = 'COLLSCAN' in stages
+            in_memory_sort = 'SORT' in stages
+        else:
+            winning_plan = explain.get('cursor')
+            keys_examined = explain.get('nscanned')
+            docs_examined = explain.get('nscannedObjects')
+            returned = explain.get('n')
+            collscan = str(winning_plan).startswith('BasicCursor')
+            in_memory_sort = bool(explain.get('scanAndOrder'))
+
+        return {
+            'source': datasource,
+            'spec': args.get('spec', {}),
+            'sort': args.get('sort'),
+            'skip': args.get('skip', 0),
+            'limit': args.get('limit', 0),
+            'projection': args.get('fields'),
+            'winning_plan': winning_plan,
+            'keys_examined': keys_examined,
+            'docs_examined': docs_examined,
+            'returned': returned,
+            'collscan': collscan,
+            'in_memory_sort': in_memory_sort,
+            'explain': explain,
+        }
+
+    def _plan_stages(self, plan):
+        """ Yields the names of all the stages of a query plan, however
+        nested.
+
+        :param plan: a query plan, as returned by the explain command.
+
+        .. versionadded:: 0.1.1
+        """
+        if isinstance(plan, dict):
+            if 'stage' in plan:
+                yield plan['stage']
+            for value in plan.values():
+                for stage in self._plan_stages(value):
+                    yield stage
+        elif isinstance(plan, list):
+            for value in plan:
+                for stage in self._plan_stages(value):
+                    yield stage
+
+    def _find_args(self, resource, req):
+        """ Returns the datasource and the arguments :func:`find` is going to
+        pass to the driver in order to satisfy the current request.
+
+        :param resource: resource name.
+        :param req: a :class:`ParsedRequest`instance.
+
+        .. versionadded:: 0.1.1
+        """
         args = dict()
 
         if req.max_results:
@@ -91,39 +221,13 @@ class Mongo(DataLayer):
         if req.sort:
             args['sort'] = ast.literal_eval(req.sort)
 
-        client_projection = {}
-        spec = {}
-
-        if req.where:
-            try:
-                spec = self._sanitize(
-                    self._jsondatetime(json.loads(req.where)))
-            except:
-                try:
-                    spec = parse(req.where)
-                except ParseError:
-                    abort(400, description=debug_error_message(
-                        'Unable to parse `where` clause'
-                    ))
-
-        bad_filter = validate_filters(spec, resource)
-        if bad_filter:
-            abort(400, bad_filter)
-
-        if req.projection:
-            try:
-                client_projection = json.loads(req.projection)
-            except:
-                abort(400, description=debug_error_message(
-                    'Unable to parse `projection` clause'
-                ))
-
-        datasource, spec, projection = self._datasource_ex(resource, spec,
-                                                           client_projection)
+        spec = self._spec(resource, req.where)
+        datasource, spec, projection = self._datasource_ex(
+            resource, spec, client_projection(req) or {})
 
         if req.if_modified_since:
-            spec[config.LAST_UPDATED] = \
-                {'$gt': req.if_modified_since}
+            spec = self.combine_queries(
+                spec, {config.LAST_UPDATED: {'$gt': req.if_modified_since}})
 
         if len(spec) > 0:
             args['spec'] = spec
@@ -131,7 +235,107 @@ class Mongo(DataLayer):
         if projection is not None:
             args['fields'] = projection
 
-        return self.driver.db[datasource].find(**args)
+        return datasource, args
+
+    def changes(self, resource, since, max_results):
+        """Retrieves the changes made to a resource after a sync token. Both
+        documents and tombstones are scanned in (sequence number, id) order,
+        so that pages are stable however the collection changes in the
+        meantime. Documents changed more than once within a page are only
+        returned once, in their latest state.
+
+        Sequence numbers are reserved before the writes are made, and writes
+        racing each other can complete out of order. Changes are therefore
+        only returned up to the first sequence number still in flight, so
+        that none is skipped (see :func:`_sync_horizon`).
+
+        Tokens are opaque to clients. They carry the sequence number and the
+        id of the last change returned. Aborts with a 410 when tombstones
+        following the token have been pruned already (see `SYNC_RETENTION`).
+
+        :param resource: resource name.
+        :param since: the sync token. Empty for the first request.
+        :param max_results: max number of changes to return.
+
+        .. versionadded:: 0.1.1
+        """
+        position = self._sync_position(since)
+        datasource, spec, fields = self._datasource_ex(resource, {})
+        self._ensure_sync(datasource)
+
+        horizon, pruned = self._sync_horizon(datasource)
+        if position is not None and position[0] < pruned:
+            abort(410, description=debug_error_message(
+                'Sync token expired, a full sync is needed'
+            ))
+        after = self.combine_queries(self._after(position),
+                                     {SEQ_FIELD: {'$lte': horizon}})
+        if fields is not None:
+            fields = dict(fields)
+            fields[SEQ_FIELD] = 1
+        sort = [(SEQ_FIELD, 1), (ID_FIELD, 1)]
+        # one extra change tells whether more are pending.
+        limit = max_results + 1
+
+        changes = []
+        for document in self.driver.db[datasource].find(
+                spec=self.combine_queries(spec, after), fields=fields,
+                sort=sort, limit=limit):
+            changes.append((document.pop(SEQ_FIELD, 0),
+                            document[ID_FIELD], document))
+
+        # clients performing their first sync have nothing to delete.
+        if position is not None:
+            auth_field = config.DOMAIN[resource]['auth_field']
+            if auth_field and self.query_contains_field(spec, auth_field):
+                after = self.combine_queries(after, {
+                    auth_field: self.get_value_from_query(spec, auth_field)})
+            for tombstone in self.driver.db[TOMBSTONES % datasource].find(
+                    spec=after, fields=[SEQ_FIELD], sort=sort, limit=limit):
+                changes.append((tombstone[SEQ_FIELD], tombstone[ID_FIELD],
+                                None))
+
+        changes.sort(key=lambda change: change[:2])
+        more = len(changes) > max_results
+        changes = changes[:max_results]
+        if changes:
+            seq, id_, _ = changes[-1]
+            since = '%d.%s' % (seq, id_)
+
+        documents = []
+        deleted = []
+        seen = set()
+        for seq, id_, document in reversed(changes):
+            if id_ in seen:
+                continue
+            seen.add(id_)
+            if document is None:
+                deleted.append(id_)
+            else:
+                documents.append(document)
+        documents.reverse()
+        deleted.reverse()
+        return documents, deleted, since, more
+
+    def matcher(self, resource, where=None):
+        """Returns a predicate telling whether a document matches both the
+        `where` clause and the scope of the current request (datasource filter
+        and `auth_field`). Aborts with a 400 if the clause can't be parsed or
+        matched in memory (see :func:`eve.io.mongo.query.compile_query`).
+
+        :param resource: resource name.
+        :param where: the `where` clause, in either syntax.
+
+        .. versionadded:: 0.1.1
+        """
+        datasource, spec, _ = self._datasource_ex(resource,
+                                                  self._spec(resource, where))
+        try:
+            return compile_query(spec or {})
+        except ValueError as e:
+            abort(400, description=debug_error_message(
+                'Unable to match `where` clause: %s' % e
+            ))
 
     def find_one(self, resource, **lookup):
         """Retrieves a single document.
@@ -165,47 +369,51 @@ class Mongo(DataLayer):
         """Retrieves a list of documents from the collection given
         by `resource`, matching the given list of ids.
 
-        This query is generated to *preserve the order* of the elements
-        in the `ids` list. An alternative would be to use the `$in` operator
-        and accept non-dependable ordering for a slight performance boost
-        see <https://jira.mongodb.org/browse/SERVER-7528?focusedCommentId=
-        181518&page=com.atlassian.jira.plugin.system.issuetabpanels:comment
-        -tabpanel#comment-181518>
-
-        To preserve order, we use a query of the form
-            db.collection.find( { $or:[ { _id:ObjectId(...) },
-                { _id:ObjectId(...) }...] } )
-
-        Instead of the simpler
-            {'_id': {'$in': ids}}
-
-        -- via http://stackoverflow.com/a/13185509/1161906
+        Documents are fetched with a single `$in` query, which the query
+        planner serves with a plain index scan no matter how many ids are
+        requested, and then sorted back to the order of the `ids` list.
+        Ids matching no document (or a document which is filtered out by
+        the datasource or auth_field clauses) are simply skipped.
 
         :param resource: resource name.
-        :param ids: a list of ObjectIds corresponding to the documents
-        to retrieve
+        :param ids: a list of ids corresponding to the documents
+        to retrieve. String representations of ObjectIds are accepted.
         :param client_projection: a specific projection to use
         :return: a list of documents matching the ids in `ids` from the
         collection specified in `resource`
 
+        .. versionchanged:: 0.1.1
+           Use the `$in` operator and reorder documents in memory, instead of
+           a `$or` clause per id. Returns a list instead of a cursor.
+
         .. versionadded:: 0.1.0
         """
-        query = {'$or': [
-            {'_id': id_} for id_ in ids
-        ]}
+        object_ids = []
+        for id_ in ids:
+            try:
+                object_ids.append(ObjectId(id_))
+            except (InvalidId, TypeError):
+                object_ids.append(id_)
+
+        query = {config.ID_FIELD: {'$in': object_ids}}
 
         datasource, spec, projection = self._datasource_ex(
             resource, query=query, client_projection=client_projection
         )
 
-        documents = self.driver.db[datasource].find(
-            spec=spec, fields=projection
+        documents = dict(
+            (document[config.ID_FIELD], document) for document in
+            self.driver.db[datasource].find(spec=spec, fields=projection)
         )
-        return documents
+        return [documents[id_] for id_ in object_ids if id_ in documents]
 
     def insert(self, resource, doc_or_docs):
         """Inserts a document into a resource collection.
 
+        .. versionchanged:: 0.1.1
+           Documents of resources with `sync` enabled are stamped with a
+           sequence number.
+
         .. versionchanged:: 0.0.9
            More informative error messages.
 
@@ -221,6 +429,14 @@ class Mongo(DataLayer):
            retrieves the target collection via the new config.SOURCES helper.
         """
         datasource, filter_, _ = self._datasource_ex(resource)
+        first = None
+        if config.DOMAIN[resource]['sync']:
+            documents = doc_or_docs if isinstance(doc_or_docs, list) else \
+                [doc_or_docs]
+            seq = first = self._next_seq(datasource, len(documents))
+            for document in documents:
+                document[SEQ_FIELD] = seq
+                seq += 1
         try:
             return self.driver.db[datasource].insert(doc_or_docs,
                                                      **self._wc(resource))
@@ -231,10 +447,17 @@ class Mongo(DataLayer):
             abort(500, description=debug_error_message(
                 'pymongo.errors.OperationFailure: %s' % e
             ))
+        finally:
+            if first is not None:
+                self._release_seq(datasource, first)
 
     def update(self, resource, id_, updates):
         """Updates a collection document.
 
+        .. versionchanged:: 0.1.1
+           Documents of resources with `sync` enabled are stamped with a
+           sequence number.
+
         .. versionchanged:: 0.0.9
            More informative error messages.
 
@@ -249,6 +472,10 @@ class Mongo(DataLayer):
         """
         datasource, filter_, _ = self._datasource_ex(resource,
                                                      {ID_FIELD: ObjectId(id_)})
+        seq = None
+        if config.DOMAIN[resource]['sync']:
+            updates = dict(updates)
+            updates[SEQ_FIELD] = seq = self._next_seq(datasource)
 
         # TODO consider using find_and_modify() instead. The document might
         # have changed since the ETag was computed. This would require getting
@@ -261,14 +488,25 @@ class Mongo(DataLayer):
             abort(500, description=debug_error_message(
                 'pymongo.errors.OperationFailure: %s' % e
             ))
+        finally:
+            if seq is not None:
+                self._release_seq(datasource, seq)
 
     def replace(self, resource, id_, document):
         """Replaces an existing document.
 
+        .. versionchanged:: 0.1.1
+           Documents of resources with `sync` enabled are stamped with a
+           sequence number.
+
         .. versionadded:: 0.1.0
         """
         datasource, filter_, _ = self._datasource_ex(resource,
                                                      {ID_FIELD: ObjectId(id_)})
+        seq = None
+        if config.DOMAIN[resource]['sync']:
+            document = dict(document)
+            document[SEQ_FIELD] = seq = self._next_seq(datasource)
 
         # TODO consider using find_and_modify() instead. The document might
         # have changed since the ETag was computed. This would require getting
@@ -281,10 +519,17 @@ class Mongo(DataLayer):
             abort(500, description=debug_error_message(
                 'pymongo.errors.OperationFailure: %s' % e
             ))
+        finally:
+            if seq is not None:
+                self._release_seq(datasource, seq)
 
     def remove(self, resource, id_=None):
         """Removes a document or the entire set of documents from a collection.
 
+        .. versionchanged:: 0.1.1
+           Documents of resources with `sync` enabled leave a tombstone
+           behind.
+
         .. versionchanged:: 0.0.9
            More informative error messages.
 
@@ -303,15 +548,257 @@ class Mongo(DataLayer):
         query = {ID_FIELD: ObjectId(id_)} if id_ else None
         datasource, filter_, _ = self._datasource_ex(resource, query)
         try:
-            self.driver.db[datasource].remove(filter_, **self._wc(resource))
+            if config.DOMAIN[resource]['sync']:
+                self._remove_with_tombstones(resource, datasource, filter_)
+            else:
+                self.driver.db[datasource].remove(filter_,
+                                                  **self._wc(resource))
         except pymongo.errors.OperationFailure as e:
             # see comment in :func:`insert()`.
             abort(500, description=debug_error_message(
                 'pymongo.errors.OperationFailure: %s' % e
             ))
 
-    # TODO: The next three methods could be pulled out to form the basis
-    # of a separate MonqoQuery class
+    def _spec(self, resource, where):
+        """ Parses a `where` clause into a query spec. Both the mongo and the
+        python syntaxes are supported. Aborts with a 400 if the clause can't be
+        parsed, or filters on fields which are not allowed.
+
+        :param resource: resource name.
+        :param where: the `where` clause. Can be None.
+
+        .. versionadded:: 0.1.1
+        """
+        spec = {}
+        if where:
+            with phase('parse'):
+                try:
+                    spec = self._sanitize(json.loads(where))
+                except:
+                    try:
+                        spec = parse(where)
+                    except ParseError:
+                        abort(400, description=debug_error_message(
+                            'Unable to parse `where` clause'
+                        ))
+                spec = self._convert_dates(resource, spec)
+
+        bad_filter = validate_filters(spec, resource)
+        if bad_filter:
+            abort(400, bad_filter)
+        return spec
+
+    def _remove_with_tombstones(self, resource, datasource, filter_):
+        """ Removes the documents matching a filter, recording a tombstone
+        for each of them. Tombstones carry the `auth_field` value of the
+        document, if any, so that they are only returned to its owner.
+        Documents created while the removal is in progress are left alone.
+        Tombstones older than `SYNC_RETENTION` are pruned meanwhile.
+
+        :param resource: resource name.
+        :param datasource: the collection.
+        :param filter_: the query matching the documents to remove.
+
+        .. versionadded:: 0.1.1
+        """
+        auth_field = config.DOMAIN[resource]['auth_field']
+        fields = [ID_FIELD]
+        if auth_field:
+            fields.append(auth_field)
+        collection = self.driver.db[datasource]
+        tombstones = self.driver.db[TOMBSTONES % datasource]
+        documents = list(collection.find(filter_, fields=fields))
+
+        for i in range(0, len(documents), _TOMBSTONES_BATCH):
+            batch = documents[i:i + _TOMBSTONES_BATCH]
+            ids = [document[ID_FIELD] for document in batch]
+            seq = first = self._next_seq(datasource, len(batch))
+            now = datetime.utcnow().replace(microsecond=0)
+            records = []
+            for document in batch:
+                record = {ID_FIELD: document[ID_FIELD], SEQ_FIELD: seq,
+                          config.LAST_UPDATED: now}
+                if auth_field in document:
+                    record[auth_field] = document[auth_field]
+                records.append(record)
+                seq += 1
+
+            try:
+                collection.remove(self.combine_queries(filter_ or {}, {
+                    ID_FIELD: {'$in': ids}}), **self._wc(resource))
+                # a document created with the id of a removed one may have
+                # been removed already, so its tombstone is replaced.
+                for record in records:
+                    tombstones.update({ID_FIELD: record[ID_FIELD]}, record,
+                                      upsert=True, **self._wc(resource))
+            finally:
+                self._release_seq(datasource, first)
+
+        retention = config.SYNC_RETENTION
+        if retention is not None and time.time() - \
+                self._pruned_at.get(datasource, 0) > _PRUNE_INTERVAL:
+            self._pruned_at[datasource] = time.time()
+            self._prune_tombstones(datasource, datetime.utcnow() -
+                                   timedelta(seconds=retention))
+
+    def _next_seq(self, datasource, count=1):
+        """ Reserves `count` sequence numbers of a collection, and returns the
+        first one. Reserved numbers are recorded as in flight, along with the
+        reservation time, until :func:`_release_seq` is called once the write
+        is over.
+
+        The counter is only updated if it didn't change since it was read,
+        so that the numbers in flight are recorded along with the new counter
+        value. The update is tried again otherwise.
+
+        :param datasource: the collection.
+        :param count: the number of sequence numbers to reserve.
+
+        .. versionadded:: 0.1.1
+        """
+        counters = self.driver.db[SYNC_COUNTERS]
+        while True:
+            counter = counters.find_one({ID_FIELD: datasource},
+                                        fields=['seq'])
+            last = counter['seq'] if counter else 0
+            try:
+                # the counter is created if missing. If it exists but has
+                # changed meanwhile, the upsert fails with a duplicate key
+                # (which is only reported to acknowledged writes).
+                counters.update({ID_FIELD: datasource, 'seq': last}, {
+                    '$set': {'seq': last + count},
+                    '$push': {'pending': {'seq': last + 1,
+                                          'at': datetime.utcnow()}}},
+                    upsert=True, w=1)
+            except pymongo.errors.DuplicateKeyError:
+                continue
+            return last + 1
+
+    def _release_seq(self, datasource, first):
+        """ Records that the write stamped with the sequence numbers reserved
+        from `first` on is over, whatever its outcome.
+
+        :param datasource: the collection.
+        :param first: the first sequence number reserved for the write.
+
+        .. versionadded:: 0.1.1
+        """
+        self.driver.db[SYNC_COUNTERS].update(
+            {ID_FIELD: datasource}, {'$pull': {'pending': {'seq': first}}})
+
+    def _sync_horizon(self, datasource):
+        """ Returns the last sequence number of a collection which sync
+        requests can go up to, all the previous ones being no longer in
+        flight, along with the last sequence number whose tombstone might
+        have been pruned.
+
+        Numbers reserved more than `SYNC_WRITE_TIMEOUT` seconds ago are
+        deemed to belong to failed writes (e.g. the process was killed), and
+        are dropped.
+
+        :param datasource: the collection.
+
+        .. versionadded:: 0.1.1
+        """
+        counters = self.driver.db[SYNC_COUNTERS]
+        counter = counters.find_one({ID_FIELD: datasource})
+        if counter is None:
+            return 0, 0
+        expired = datetime.utcnow() - \
+            timedelta(seconds=config.SYNC_WRITE_TIMEOUT)
+        pending = counter.get('pending', [])
+        # Flask-PyMongo returns timezone-aware datetimes (see
+        # :func:`eve.methods.common.last_updated`).
+        in_flight = [write['seq'] for write in pending
+                     if write['at'].replace(tzinfo=None) > expired]
+        if len(in_flight) < len(pending):
+            counters.update({ID_FIELD: datasource}, {
+                '$pull': {'pending': {'at': {'$lte': expired}}}})
+        horizon = min(in_flight) - 1 if in_flight else counter['seq']
+        return horizon, counter.get('pruned', 0)
+
+    def _prune_tombstones(self, datasource, before):
+        """ Removes the tombstones recorded before a given time. The last
+        sequence number pruned is recorded first, so that sync tokens which
+        precede it are rejected from then on.
+
+        :param datasource: the collection.
+        :param before: tombstones recorded before this datetime are removed.
+
+        .. versionadded:: 0.1.1
+        """
+        tombstones = self.driver.db[TOMBSTONES % datasource]
+        newest = list(tombstones.find(
+            {config.LAST_UPDATED: {'$lt': before}}, fields=[SEQ_FIELD],
+            sort=[(SEQ_FIELD, -1)], limit=1))
+        if not newest:
+            return
+        pruned = newest[0][SEQ_FIELD]
+        self.driver.db[SYNC_COUNTERS].update(
+            {ID_FIELD: datasource, 'pruned': {'$not': {'$gte': pruned}}},
+            {'$set': {'pruned': pruned}})
+        tombstones.remove({SEQ_FIELD: {'$lte': pruned}})
+
+    def _ensure_sync(self, datasource):
+        """ Prepares a collection for sync requests, once per process:
+        documents stored before `sync` was enabled get sequence number 0,
+        and both the collection and its tombstones are indexed on sequence
+        number and id. Tombstones are also indexed on the time they were
+        recorded, for pruning.
+
+        :param datasource: the collection.
+
+        .. versionadded:: 0.1.1
+        """
+        if datasource in self._sync_ready:
+            return
+        collection = self.driver.db[datasource]
+        collection.update({SEQ_FIELD: {'$exists': False}},
+                          {'$set': {SEQ_FIELD: 0}}, multi=True)
+        index = [(SEQ_FIELD, 1), (ID_FIELD, 1)]
+        collection.ensure_index(index)
+        tombstones = self.driver.db[TOMBSTONES % datasource]
+        tombstones.ensure_index(index)
+        tombstones.ensure_index(config.LAST_UPDATED)
+        self._sync_ready.add(datasource)
+
+    def _sync_position(self, since):
+        """ Returns the (sequence number, id) position encoded in a sync
+        token, or None for an empty token. Aborts with a 400 if the token is
+        not valid.
+
+        :param since: the sync token.
+
+        .. versionadded:: 0.1.1
+        """
+        if not since:
+            return None
+        try:
+            seq, id_ = since.split('.', 1)
+            seq = int(seq)
+        except ValueError:
+            abort(400, description=debug_error_message(
+                'Invalid sync token'
+            ))
+        try:
+            id_ = ObjectId(id_)
+        except (InvalidId, TypeError):
+            pass
+        return seq, id_
+
+    def _after(self, position):
+        """ Returns the query matching the changes recorded after a position
+        (see :func:`_sync_position`).
+
+        :param position: the (sequence number, id) position, or None.
+
+        .. versionadded:: 0.1.1
+        """
+        if position is None:
+            return {}
+        seq, id_ = position
+        return {'$or': [{SEQ_FIELD: {'$gt': seq}},
+                        {SEQ_FIELD: seq, ID_FIELD: {'$gt': id_}}]}
 
     def combine_queries(self, query_a, query_b):
         """
@@ -330,27 +817,29 @@ class Mongo(DataLayer):
             query_a.update(query_b)
         would lose information.
 
-        This implementation of the function just combines everything in the
-        two dicts using the `$and` operator.
-
-        Note that this is exactly same as performing dict.update() except
-        when multiple operators are operating on the /same field/.
+        The combined query is kept as flat as possible, so that MongoDB can
+        make the best use of (compound) indexes: conditions on different
+        fields are collected in the same dict, operators on the same field
+        are merged when safe, and the `$and` operator is only used for
+        conditions that can't be merged. See
+        :func:`eve.io.mongo.query.combine`.
 
         Example:
             combine_queries({'username': {'$exists': True}},
                             {'username': 'mike'})
-        {'$and': [{'username': {'$exists': True}}, {'username': 'mike'}]}
+        {'username': {'$exists': True}, '$and': [{'username': 'mike'}]}
+
+            combine_queries({'age': {'$gt': 18}}, {'role': 'admin'})
+        {'age': {'$gt': 18}, 'role': 'admin'}
+
+        .. versionchanged:: 0.1.1
+           Produce flat conjunctions instead of always chaining the queries
+           with the `$and` operator.
 
         .. versionadded: 0.1.0
            Support for intelligent combination of db queries
         """
-        # Chain the operations with the $and operator
-        return {
-            '$and': [
-                {k: v} for k, v in itertools.chain(query_a.items(),
-                                                   query_b.items())
-            ]
-        }
+        return combine(query_a, query_b)
 
     def get_value_from_query(self, query, field_name):
         """ For the specified field name, parses the query and returns
@@ -367,16 +856,13 @@ class Mongo(DataLayer):
             )
         123
 
+        .. versionchanged:: 0.1.1
+           `$and` clauses are inspected however nested.
+
         .. versionadded: 0.1.0
            Support for parsing values embedded in compound db queries
         """
-        if field_name in query:
-            return query[field_name]
-        elif '$and' in query:
-            for condition in query['$and']:
-                if field_name in condition:
-                    return condition[field_name]
-        raise KeyError
+        return get_value(query, field_name)
 
     def query_contains_field(self, query, field_name):
         """ For the specified field name, does the query contain it?
@@ -391,10 +877,30 @@ class Mongo(DataLayer):
             return False
         return True
 
+    def _convert_dates(self, resource, spec):
+        """ Converts the date strings of a query spec to datetime values. Only
+        fields defined as `datetime` by the resource schema (however nested)
+        and automatic date fields are converted. Resources lacking a schema
+        fall back to :func:`_jsondatetime`.
+
+        :param resource: resource name.
+        :param spec: the query spec.
+
+        .. versionadded:: 0.1.1
+        """
+        settings = config.DOMAIN[resource]
+        if not settings['schema']:
+            return self._jsondatetime(spec)
+        return coerce_query(spec, settings['dates_tree'],
+                            lambda v: parse_date(v, config.DATE_FORMAT))
+
     def _jsondatetime(self, source):
         """ Recursively iterates a JSON dictionary, turning RFC-1123 strings
         into datetime values.
 
+        .. versionchanged:: 0.1.1
+           Fast parsing of the default date format (see :mod:`eve.dates`).
+
         .. versionchanged:: 0.1.0
            Datetime conversion was failing on Py2, since 0.0.9 :P
 
@@ -414,7 +920,7 @@ class Mongo(DataLayer):
                 self._jsondatetime(v)
             elif isinstance(v, _str_type):
                 try:
-                    source[k] = datetime.strptime(v, config.DATE_FORMAT)
+                    source[k] = parse_date(v, config.DATE_FORMAT)
                 except:
                     pass
 
@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+
+"""
+    eve.io.mongo.query
+    ~~~~~~~~~~~~~~~~~~
+
+    Helpers for the manipulation of MongoDB query documents. Allows the
+    MongoDB data-layer to merge client queries, datasource filters and
+    `auth_field` clauses into specs that the query planner can make the best
+    of, and to match documents against queries in memory.
+
+    :copyright: (c) 2013 by Nicola Iarocci.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import re
+import sys
+from datetime import datetime
+
+# operators whose value is bound to another operator in the same dict and
+# therefore can't be safely merged with a different set of operators.
+_UNMERGEABLE_OPERATORS = set(['$regex', '$options'])
+
+# logical operators, as functions of the matches of their clauses.
+_LOGICAL_TESTS = {
+    '$and': all,
+    '$or': any,
+    '$nor': lambda matches: not any(matches),
+}
+
+# comparison operators, as functions of a value and the operand.
+_COMPARISONS = {
+    '$gt': lambda value, operand: value > operand,
+    '$gte': lambda value, operand: value >= operand,
+    '$lt': lambda value, operand: value < operand,
+    '$lte': lambda value, operand: value <= operand,
+}
+
+_REGEX_FLAGS = {'i': re.I, 'm': re.M, 's': re.S, 'x': re.X}
+
+_PATTERN_TYPE = type(re.compile(''))
+
+if sys.version_info[0] == 3:
+    _NUMBER_TYPES = (int, float)
+    _STR_TYPES = (str,)
+else:
+    _NUMBER_TYPES = (int, long, float)  # noqa
+    _STR_TYPES = (basestring,)  # noqa
+
+
+class _Conflict(object):
+    """ Marker returned by :func:`merge_conditions` when two conditions on
+    the same field cannot be merged into a single one.
+    """
+    pass
+
+
+_CONFLICT = _Conflict()
+
+
+def combine(query_a, query_b):
+    """ Returns the intersection (logical AND) of two queries. Neither query
+    is modified.
+
+    The result is a flat conjunction whenever possible. Conditions on
+    distinct fields are simply collected in the same dict, while conditions
+    on the same field are merged when it is safe to do so, for example: ::
+
+        >>> combine({'age': {'$gt': 18}}, {'age': {'$lt': 65}})
+        {'age': {'$gt': 18, '$lt': 65}}
+
+    Conditions that cannot be merged are moved to a top-level `$and` clause,
+    which is also where eventual `$and` clauses from the two queries end up
+    being flattened: ::
+
+        >>> combine({'username': {'$exists': True}}, {'username': 'mike'})
+        {'username': {'$exists': True}, '$and': [{'username': 'mike'}]}
+
+    :param query_a: the first query.
+    :param query_b: the second query.
+
+    .. versionadded:: 0.1.1
+    """
+    result = {}
+    leftovers = []
+    for query in (query_a, query_b):
+        _fold(result, leftovers, query)
+    if leftovers:
+        result['$and'] = leftovers
+    return result
+
+
+def _fold(result, leftovers, query):
+    """ Folds the conditions of `query` into `result`. Conditions which
+    can't be merged are appended to the `leftovers` list.
+    """
+    for key, value in query.items():
+        if key == '$and':
+            for clause in value:
+                _fold(result, leftovers, clause)
+        elif key not in result:
+            result[key] = value
+        else:
+            merged = merge_conditions(key, result[key], value)
+            if merged is _CONFLICT:
+                leftovers.append({key: value})
+            else:
+                result[key] = merged
+
+
+def merge_conditions(key, a, b):
+    """ Merges two conditions on the same key into an equivalent single
+    condition. Returns the `_CONFLICT` marker if that is not possible.
+
+    :param key: the key (field name or top-level operator).
+    :param a: the first condition.
+    :param b: the second condition.
+
+    .. versionadded:: 0.1.1
+    """
+    if a == b:
+        return a
+    if key == '$nor':
+        # none of the first clauses AND none of the second ones.
+        return a + b
+    if key.startswith('$') or not (is_operator_dict(a) and
+                                   is_operator_dict(b)):
+        return _CONFLICT
+    if _UNMERGEABLE_OPERATORS & (set(a) | set(b)):
+        return _CONFLICT
+
+    merged = dict(a)
+    for operator, operand in b.items():
+        if operator in merged and merged[operator] != operand:
+            return _CONFLICT
+        merged[operator] = operand
+    return merged
+
+
+def is_operator_dict(condition):
+    """ Returns True if `condition` is a non-empty dict of query operators
+    (like ``{'$gt': 1, '$lt': 10}``), as opposed to a literal value or
+    embedded document.
+
+    :param condition: the condition to inspect.
+
+    .. versionadded:: 0.1.1
+    """
+    return isinstance(condition, dict) and len(condition) > 0 and \
+        all(k.startswith('$') for k in condition)
+
+
+def get_value(query, field_name):
+    """ Returns the condition set on `field_name` by the query, looking into
+    `$and` clauses however nested. Raises `KeyError` if the field is not
+    constrained by the query.
+
+    :param query: the query to inspect.
+    :param field_name: the field name.
+
+    .. versionadded:: 0.1.1
+    """
+    if field_name in query:
+        return query[field_name]
+    for clause in query.get('$and', []):
+        try:
+            return get_value(clause, field_name)
+        except KeyError:
+            pass
+    raise KeyError(field_name)
+
+
+def compile_query(query):
+    """ Compiles a query into a predicate telling whether a document matches
+    it, as MongoDB would, so that documents which are not read from the
+    database can be filtered too. Dotted field names, arrays (of values and
+    of embedded documents) and the following operators are supported:
+    logical (`$and`, `$or`, `$nor`, `$not`), comparison (`$gt`, `$gte`,
+    `$lt`, `$lte`, `$ne`, `$in`, `$nin`), `$exists`, `$all`, `$size`,
+    `$elemMatch`, `$mod` and `$regex`. Values of different types never
+    compare, as with MongoDB. Raises `ValueError` if the query holds
+    unsupported operators. ::
+
+        >>> match = compile_query({'age': {'$gt': 18}, 'tags': 'admin'})
+        >>> match({'age': 21, 'tags': ['admin', 'user']})
+        True
+
+    :param query: the query to compile.
+
+    .. versionadded:: 0.1.1
+    """
+    tests = []
+    for key, condition in query.items():
+        if key in _LOGICAL_TESTS:
+            if not isinstance(condition, list):
+                raise ValueError('%s needs a list of queries' % key)
+            tests.append(_logical_test(_LOGICAL_TESTS[key],
+                                       [compile_query(q) for q in condition]))
+        elif key.startswith('$'):
+            raise ValueError('Unsupported operator: %s' % key)
+        else:
+            tests.append(_field_test(key.split('.'), _condition(condition)))
+    return lambda document: all(test(document) for test in tests)
+
+
+def _logical_test(combine, tests):
+    return lambda document: combine(test(document) for test in tests)
+
+
+def _field_test(path, test):
+    return lambda document: test(_lookup(document, path))
+
+
+def _lookup(value, path):
+    """ Returns the list of values found at a (split) dotted path. Arrays
+    of embedded documents are traversed, and numeric parts of the path can
+    also address array members.
+    """
+    if not path:
+        return [value]
+    key, rest = path[0], path[1:]
+    if isinstance(value, dict):
+        return _lookup(value[key], rest) if key in value else []
+    if isinstance(value, list):
+        values = []
+        if key.isdigit() and int(key) < len(value):
+            values.extend(_lookup(value[int(key)], rest))
+        for item in value:
+            if isinstance(item, dict):
+                values.extend(_lookup(item, path))
+        return values
+    return []
+
+
+def _candidates(values):
+    """ Values a condition is tested against: the values found at the field
+    path, along with the members of those which are arrays.
+    """
+    candidates = [_naive(value) for value in values]
+    for value in values:
+        if isinstance(value, list):
+            candidates.extend(_naive(item) for item in value)
+    return candidates
+
+
+def _naive(value):
+    """ Returns datetimes as naive UTC values, so that they compare with
+    each other. Datetimes read from the database are timezone-aware, while
+    those of query operands are not.
+    """
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return (value - value.utcoffset()).replace(tzinfo=None)
+    return value
+
+
+def _condition(condition):
+    """ Compiles the condition on a field into a test of the list of values
+    found at the field path.
+    """
+    if is_operator_dict(condition):
+        if '$regex' in condition:
+            condition = dict(condition)
+            pattern = _regex(condition.pop('$regex'),
+                             condition.pop('$options', ''))
+            tests = [_equals(pattern)]
+        else:
+            tests = []
+        for operator, operand in condition.items():
+            tests.append(_operator(operator, operand))
+        return lambda values: all(test(values) for test in tests)
+    return _equals(condition)
+
+
+def _operator(operator, operand):
+    if operator in _COMPARISONS:
+        compare = _COMPARISONS[operator]
+        operand = _naive(operand)
+        return lambda values: any(
+            _comparable(value, operand) and compare(value, operand)
+            for value in _candidates(values))
+    if operator == '$ne':
+        test = _equals(operand)
+        return lambda values: not test(values)
+    if operator in ('$in', '$nin', '$all'):
+        if not isinstance(operand, list):
+            raise ValueError('%s needs a list' % operator)
+        tests = [_equals(item) for item in operand]
+        if operator == '$in':
+            return lambda values: any(test(values) for test in tests)
+        if operator == '$nin':
+            return lambda values: not any(test(values) for test in tests)
+        return lambda values: bool(tests) and \
+            all(test(values) for test in tests)
+    if operator == '$exists':
+        return lambda values: bool(values) == bool(operand)
+    if operator == '$size':
+        return lambda values: any(isinstance(value, list) and
+                                  len(value) == operand for value in values)
+    if operator == '$mod':
+        divisor, remainder = operand
+        return lambda values: any(
+            isinstance(value, _NUMBER_TYPES) and
+            value % divisor == remainder for value in _candidates(values))
+    if operator == '$not':
+        if isinstance(operand, (_PATTERN_TYPE,) + _STR_TYPES):
+            test = _equals(operand if isinstance(operand, _PATTERN_TYPE)
+                           else _regex(operand))
+        elif is_operator_dict(operand):
+            test = _condition(operand)
+        else:
+            raise ValueError('$not needs operators or a regex')
+        return lambda values: not test(values)
+    if operator == '$elemMatch':
+        if is_operator_dict(operand):
+            test = _condition(operand)
+
+            def member(item):
+                return test([item])
+        else:
+            member = compile_query(operand)
+        return lambda values: any(
+            isinstance(value, list) and any(member(item) for item in value)
+            for value in values)
+    raise ValueError('Unsupported operator: %s' % operator)
+
+
+def _equals(operand):
+    """ Compiles an equality condition. A regex matches string values, and
+    None matches missing fields too.
+    """
+    operand = _naive(operand)
+    if isinstance(operand, _PATTERN_TYPE):
+        return lambda values: any(
+            isinstance(value, _STR_TYPES) and operand.search(value)
+            for value in _candidates(values))
+    if operand is None:
+        return lambda values: not values or None in _candidates(values)
+    return lambda values: any(value == operand and
+                              _comparable(value, operand)
+                              for value in _candidates(values))
+
+
+def _regex(pattern, options=''):
+    flags = 0
+    for option in options:
+        if option not in _REGEX_FLAGS:
+            raise ValueError('Unsupported regex option: %s' % option)
+        flags |= _REGEX_FLAGS[option]
+    return re.compile(pattern, flags)
+
+
+def _comparable(a, b):
+    """ Returns True if two values belong to the same type, numbers and
+    strings of different flavors being considered alike.
+    """
+    if isinstance(a, bool) or isinstance(b, bool):
+        return isinstance(a, bool) and isinstance(b, bool)
+    if isinstance(a, _NUMBER_TYPES):
+        return isinstance(b, _NUMBER_TYPES)
+    if isinstance(a, _STR_TYPES):
+        return isinstance(b, _STR_TYPES)
+    return type(a) is type(b)
@@ -10,16 +10,22 @@
     :license: BSD, see LICENSE for more details.
 """
 
-import traceback
 import time
+import traceback
 from datetime import datetime
 from flask import current_app as app, request, abort, g, Response
 import simplejson as json
 from ..utils import str_to_date, parse_request, document_etag, config, \
-    request_method, debug_error_message
+    request_method, debug_error_message, document_link
 from functools import wraps
 from werkzeug.exceptions import BadRequestKeyError, InternalServerError
 from eve.validation import ValidationError
+from eve.timing import phase
+from eve.serializers import msgpack, msgpack_loads, bson_loads
+from eve.dates import coerce_document
+from eve.ratelimit import rate_limiter
+from eve.batch import BATCH_ENVIRON_KEY
+from eve.notifications import notification_bus
 
 def get_document(resource, **lookup):
     """ Retrieves and return a single document. Since this function is used by
@@ -38,7 +44,8 @@ def get_document(resource, **lookup):
       processing of new configuration settings: `filters`, `sorting`, `paging`.
     """
     req = parse_request(resource)
-    document = app.data.find_one(resource, **lookup)
+    with phase('db'):
+        document = app.data.find_one(resource, **lookup)
     if document:
 
         if not req.if_match:
@@ -50,10 +57,12 @@ def get_document(resource, **lookup):
 
         # ensure the retrieved document has LAST_UPDATED and DATE_CREATED,
         # eventually with same default values as in GET.
-        document[config.LAST_UPDATED] = last_updated(document)
-        document[config.DATE_CREATED] = date_created(document)
+        with phase('meta'):
+            document[config.LAST_UPDATED] = last_updated(document)
+            document[config.DATE_CREATED] = date_created(document)
+            etag = document_etag(document)
 
-        if req.if_match != document_etag(document):
+        if req.if_match != etag:
             # client and server etags must match, or we don't allow editing
             # (ensures that client's version of the document is up to date)
             abort(412, description=debug_error_message(
@@ -70,6 +79,10 @@ def parse(value, resource):
     :param value: the string to be evaluated.
     :param resource: name of the involved resource.
 
+    .. versionchanged:: 0.1.1
+       Native datetime values are left untouched.
+       Date strings of embedded documents and lists are converted too.
+
     .. versionchanged:: 0.1.0
        Support for PUT method.
 
@@ -89,11 +102,10 @@ def parse(value, resource):
         document = value
 
     # By design, dates are expressed as RFC-1123 strings. We convert them
-    # to proper datetimes.
-    dates = app.config['DOMAIN'][resource]['dates']
-    document_dates = dates.intersection(set(document.keys()))
-    for date_field in document_dates:
-        document[date_field] = str_to_date(document[date_field])
+    # to proper datetimes (binary payloads already carry native datetimes,
+    # which are left untouched).
+    coerce_document(document, app.config['DOMAIN'][resource]['dates_tree'],
+                    str_to_date)
 
     # update the document with eventual default values
     if request_method() in ('POST', 'PUT'):
@@ -106,11 +118,21 @@ def parse(value, resource):
     return document
 
 
+# decoders of the binary payloads.
+_BINARY_DECODERS = {'application/bson': bson_loads}
+if msgpack:
+    _BINARY_DECODERS['application/x-msgpack'] = msgpack_loads
+
+
 def payload():
     """ Performs sanity checks or decoding depending on the Content-Type,
     then returns the request payload as a dict. If request Content-Type is
     unsupported, aborts with a 400 (Bad Request).
 
+    .. versionchanged:: 0.1.1
+       Support for 'application/x-msgpack' and 'application/bson'
+       Content-Types.
+
     .. versionchanged:: 0.0.9
        More informative error messages.
        request.get_json() replaces the now deprecated request.json
@@ -130,45 +152,28 @@ def payload():
             abort(400, description=debug_error_message(
                 'No form-urlencoded data supplied'
             ))
+    elif content_type in _BINARY_DECODERS:
+        try:
+            document = _BINARY_DECODERS[content_type](request.get_data())
+        except Exception:
+            document = None
+        if not isinstance(document, dict):
+            abort(400, description=debug_error_message(
+                'Unable to decode %s payload' % content_type
+            ))
+        return document
     else:
         abort(400, description=debug_error_message(
             'Unknown or no Content-Type header supplied'))
 
 
-class RateLimit(object):
-    """ Implements the Rate-Limiting logic using Redis as a backend.
-
-    :param key_prefix: the key used to uniquely identify a client.
-    :param limit: requests limit, per period.
-    :param period: limit validity period
-    :param send_x_headers: True if response headers are supposed to include
-                           special 'X-RateLimit' headers
-
-    .. versionadded:: 0.0.7
-    """
-    # We give the key extra expiration_window seconds time to expire in redis
-    # so that badly synchronized clocks between the workers and the redis
-    # server do not cause problems
-    expiration_window = 10
-
-    def __init__(self, key_prefix, limit, period, send_x_headers=True):
-        self.reset = (int(time.time()) // period) * period + period
-        self.key = key_prefix + str(self.reset)
-        self.limit = limit
-        self.period = period
-        self.send_x_headers = send_x_headers
-        p = app.redis.pipeline()
-        p.incr(self.key)
-        p.expireat(self.key, self.reset + self.expiration_window)
-        self.current = min(p.execute()[0], limit + 1)
-
-    remaining = property(lambda x: x.limit - x.current)
-    over_limit = property(lambda x: x.current > x.limit)
-
-
 def get_rate_limit():
-    """ If available, returns a RateLimit instance which is valid for the
-    current request-response.
+    """ If available, returns the rate limit status (see
+    :class:`eve.ratelimit.RateLimitStatus`) which is valid for the current
+    request-response.
+
+    .. versionchanged:: 0.1.1
+       Returns a :class:`eve.ratelimit.RateLimitStatus` instance.
 
     .. versionadded:: 0.0.7
     """
@@ -182,26 +187,56 @@ def ratelimit():
     a authentication-only API, this will impose a ratelimit even on
     non-authenticated users, reducing exposure to DDoS attacks.
 
+    Limits set by the resource (`rate_limit`) take precedence over the global
+    ones, and are accounted separately for each resource and method. Each
+    request consumes the number of units returned by the resource cost
+    function (`rate_limit_cost`), if any, or a single unit.
+
     Before the function is executed it increments the rate limit with the help
-    of the RateLimit class and stores an instance on g as g._rate_limit. Also
+    of the application rate limiter (see :func:`eve.ratelimit.rate_limiter`)
+    and stores the resulting status on g as g._rate_limit. Also
     if the client is indeed over limit, we return a 429, see
     http://tools.ietf.org/html/draft-nottingham-http-new-status-04#section-4
 
+    .. versionchanged:: 0.1.1
+       Redis round trip is accounted to the 'ratelimit' phase when
+       'SERVER_TIMING' is enabled.
+       Limits are enforced by the in-process hybrid limiter when
+       'RATE_LIMIT_SYNC_INTERVAL' is set.
+       Support for pluggable rate limiters. Redis is not required anymore
+       when a limiter is passed to the Eve constructor.
+       Support for per-resource limits and cost functions.
+
     .. versionadded:: 0.0.7
     """
     def decorator(f):
         @wraps(f)
         def rate_limited(*args, **kwargs):
-            method_limit = app.config.get('RATE_LIMIT_' + request_method())
-            if method_limit and app.redis:
+            resource = args[0] if args else None
+            method = request_method()
+            resource_limits = config.DOMAIN[resource]['rate_limit'] \
+                if resource else {}
+            if method in resource_limits:
+                method_limit = resource_limits[method]
+                scope = '%s/%s/' % (resource, method)
+            else:
+                method_limit = app.config.get('RATE_LIMIT_' + method)
+                scope = ''
+            limiter = rate_limiter() if method_limit else None
+            if limiter is not None:
                 limit = method_limit[0]
                 period = method_limit[1]
                 # If authorization is being used the key is 'username'.
                 # Else, fallback to client IP.
-                key = 'rate-limit/%s' % (request.authorization.username
-                                         if request.authorization else
-                                         request.remote_addr)
-                rlimit = RateLimit(key, limit, period, True)
+                key = 'rate-limit/%s%s' % (scope,
+                                           request.authorization.username
+                                           if request.authorization else
+                                           request.remote_addr)
+                cost_function = config.DOMAIN[resource]['rate_limit_cost'] \
+                    if resource else config.RATE_LIMIT_COST
+                with phase('ratelimit'):
+                    cost = cost_function(resource) if cost_function else 1
+                    rlimit = limiter.hit(key, limit, period, cost)
                 if rlimit.over_limit:
                     return Response('Rate limit exceeded', 429)
                 # store the rate limit for further processing by
@@ -214,6 +249,42 @@ def ratelimit():
     return decorator
 
 
+def long_poll(resource, req, method, match=None):
+    """ Invokes `method`, a function returning the response tuple of a GET
+    request. When the client asked to wait for changes (see
+    :attr:`eve.utils.ParsedRequest.wait`) and the response is a 304, waits
+    until the resource changes or the time is up, in which case the 304 is
+    sent back. When the resource changes, `method` is invoked again.
+
+    Waiters are woken by the notification bus (see :mod:`eve.notifications`),
+    to which they subscribe before `method` is first invoked, so that no
+    change is missed. Sub-requests of a batch never wait.
+
+    :param resource: the resource being accessed.
+    :param req: the parsed request.
+    :param method: the function returning the response tuple.
+    :param match: the predicate telling whether a changed document is
+                  relevant to the request. None if they all are.
+
+    .. versionadded:: 0.1.1
+    """
+    if not req.wait or not req.if_none_match or \
+            BATCH_ENVIRON_KEY in request.environ:
+        return method()
+
+    deadline = time.time() + req.wait
+    subscription = notification_bus().subscribe(
+        resource, config.NOTIFICATIONS_QUEUE_SIZE)
+    try:
+        while True:
+            response = method()
+            if response[3] != 304 or not subscription.wait(
+                    deadline - time.time(), match):
+                return response
+    finally:
+        subscription.close()
+
+
 def last_updated(document):
     """Fixes document's LAST_UPDATED field value. Flask-PyMongo returns
     timezone-aware values while stdlib datetime values are timezone-naive.
@@ -327,8 +398,10 @@ def success_resp_item(id, document, resource, resource_def):
 
     # add in etag of posted doc
     lookup = { config.ID_FIELD: response_item[config.ID_FIELD] }
-    posted_doc = app.data.find_one(resource, **lookup)
-    response_item['etag'] = document_etag(posted_doc)
+    with phase('db'):
+        posted_doc = app.data.find_one(resource, **lookup)
+    with phase('meta'):
+        response_item['etag'] = document_etag(posted_doc)
 
     # add in hateoas links
     if resource_def['hateoas']:
@@ -13,6 +13,8 @@
 from flask import current_app as app, abort
 from eve.utils import config
 from eve.auth import requires_auth
+from eve.timing import phase
+from eve.notifications import notify, reset, DELETE
 from eve.methods.common import get_document, ratelimit
 
 
@@ -25,6 +27,9 @@ def delete(resource, **lookup):
     :param resource: name of the resource to which the item(s) belong.
     :param **lookup: item lookup query.
 
+    .. versionchanged:: 0.1.1
+       Change notifications.
+
     .. versionchanged:: 0.0.7
        Support for Rate-Limiting.
 
@@ -39,7 +44,9 @@ def delete(resource, **lookup):
     if not original:
         abort(404)
 
-    app.data.remove(resource, lookup[config.ID_FIELD])
+    with phase('db'):
+        app.data.remove(resource, lookup[config.ID_FIELD])
+    notify(resource, DELETE, None, [original])
     return {}, None, None, 200
 
 
@@ -48,10 +55,15 @@ def delete_resource(resource):
     """Deletes all item of a resource (collection in MongoDB terms). Won't drop
     indexes. Use with caution!
 
+    .. versionchanged:: 0.1.1
+       Subscribers to change notifications are told to reload the resource.
+
     .. versionchanged:: 0.0.4
        Added the ``requires_auth`` decorator.
 
     .. versionadded:: 0.0.2
     """
-    app.data.remove(resource)
+    with phase('db'):
+        app.data.remove(resource)
+    reset(resource)
     return {}, None, None, 200
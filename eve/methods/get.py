@@ -12,13 +12,14 @@
 """
 
 import math
-from flask import current_app as app, abort
+from flask import current_app as app, abort, request
 import simplejson as json
-from .common import ratelimit, epoch, date_created, last_updated
+from .common import ratelimit, epoch, date_created, last_updated, long_poll
 from eve.auth import requires_auth
+from eve.timing import phase
 from eve.utils import parse_request, document_etag, document_link, \
     collection_link, home_link, querydef, resource_uri, config, \
-    debug_error_message
+    debug_error_message, client_projection
 
 
 @ratelimit()
@@ -28,6 +29,17 @@ def get(resource):
 
     :param resource: the name of the resource.
 
+    .. versionchanged:: 0.1.1
+       Database access, documents post-processing and event hooks are
+       accounted to their own phases when 'SERVER_TIMING' is enabled.
+       Support for explain mode ('?_explain=1').
+       Support for multi-get requests ('?ids=a,b,c').
+       Support for sparse responses ('?sparse=1').
+       Support for sync requests ('?since=<token>').
+       Support for long polling. Responses carry an ETag when 'long_polling'
+       is enabled, and conditional requests ('If-None-Match') can wait for
+       the resource to change ('Prefer: wait=10').
+
     .. versionchanged:: 0.1.0
        Support for optional HATEOAS.
        Support for embeddable documents.
@@ -57,38 +69,85 @@ def get(resource):
        with ``_items``. Links wrapped with ``_links``. Links are now properly
        JSON formatted.
     """
-
-    documents = []
-    response = {}
-    last_update = epoch()
-
     req = parse_request(resource)
-    cursor = app.data.find(resource, req)
-
-    for document in cursor:
-        document[config.LAST_UPDATED] = last_updated(document)
-        document[config.DATE_CREATED] = date_created(document)
+    req.ids = _requested_ids(req)
+    return long_poll(resource, req, lambda: _get(resource, req))
 
-        if document[config.LAST_UPDATED] > last_update:
-            last_update = document[config.LAST_UPDATED]
 
-        # document metadata
-        document['etag'] = document_etag(document)
-        if config.DOMAIN[resource]['hateoas']:
-            document['_links'] = {'self':
-                                  document_link(resource,
-                                                document[config.ID_FIELD])}
+def _get(resource, req):
+    """ Retrieves the resource documents that match the parsed request,
+    returning the response tuple (see :func:`get`).
 
-        documents.append(document)
+    .. versionadded:: 0.1.1
+    """
+    documents = []
+    response = {}
+    last_update = epoch()
 
-    _resolve_embedded_documents(resource, req, documents)
+    if _explain_requested():
+        return app.data.explain(resource, req), None, None, 200
+
+    with phase('db'):
+        if req.since is not None:
+            # sync: documents changed, and ids of documents deleted, since
+            # the token, in the order the changes were made.
+            cursor = None
+            documents, deleted, token, more = app.data.changes(
+                resource, req.since,
+                req.max_results or config.PAGINATION_LIMIT)
+        elif req.ids is not None:
+            # multi-get: documents are returned in the requested order.
+            cursor = None
+            documents = app.data.find_list_of_ids(
+                resource, req.ids, client_projection(req))
+        else:
+            cursor = app.data.find(resource, req)
+            documents = list(cursor)
 
-    if req.if_modified_since and len(documents) == 0:
+    with phase('meta'):
+        for document in documents:
+            document[config.LAST_UPDATED] = last_updated(document)
+            document[config.DATE_CREATED] = date_created(document)
+
+            if document[config.LAST_UPDATED] > last_update:
+                last_update = document[config.LAST_UPDATED]
+
+            if req.sparse:
+                # sparse responses don't carry etags and links, so we don't
+                # even bother computing them.
+                continue
+
+            # document metadata
+            document['etag'] = document_etag(document)
+            if config.DOMAIN[resource]['hateoas']:
+                document['_links'] = {'self':
+                                      document_link(resource,
+                                                    document[config.ID_FIELD])}
+
+    with phase('db'):
+        _resolve_embedded_documents(resource, req, documents)
+
+    etag = count = None
+    if config.DOMAIN[resource]['long_polling'] and not req.sparse and \
+            req.since is None:
+        # the count is accounted for, as pagination links depend on it. As
+        # with documents, the ETag is computed before callbacks are invoked.
+        count = _count(cursor)
+        etag = document_etag([count] + [document['etag']
+                                        for document in documents])
+
+    if req.if_modified_since and cursor is not None and \
+            len(documents) == 0:
         # the if-modified-since conditional request returned no documents, we
         # send back a 304 Not-Modified, which means that the client already
         # has the up-to-date representation of the resultset.
         status = 304
         last_modified = None
+    elif etag and etag == req.if_none_match:
+        # the client already has the current representation of the
+        # resultset.
+        status = 304
+        last_modified = last_update if last_update > epoch() else None
     else:
         status = 200
         last_modified = last_update if last_update > epoch() else None
@@ -98,17 +157,27 @@ def get(resource):
         # updated to reflect the changes (they always reflect the documents
         # state on the database.)
 
-        getattr(app, "on_fetch_resource")(resource, documents)
-        getattr(app, "on_fetch_resource_%s" % resource)(documents)
+        app.raise_hooks('on_fetch_resource', resource, (documents,))
 
-        if config.DOMAIN[resource]['hateoas']:
+        if req.since is not None:
+            # sync responses are not paginated. The token of the next request
+            # is provided instead.
+            response['_items'] = documents
+            response['_deleted'] = deleted
+            response['_sync'] = {'token': token, 'more': more}
+            if config.DOMAIN[resource]['hateoas']:
+                response['_links'] = _pagination_links(resource, req, 0)
+        elif config.DOMAIN[resource]['hateoas']:
             response['_items'] = documents
-            response['_links'] = _pagination_links(resource, req,
-                                                   cursor.count())
+            # sparse responses have no pagination links, so there's no need
+            # to count the documents either.
+            if not req.sparse:
+                if count is None:
+                    count = _count(cursor)
+                response['_links'] = _pagination_links(resource, req, count)
         else:
             response = documents
 
-    etag = None
     return response, last_modified, etag, status
 
 
@@ -120,6 +189,13 @@ def getitem(resource, **lookup):
     :param resource: the name of the resource to which the document belongs.
     :param **lookup: the lookup query.
 
+    .. versionchanged:: 0.1.1
+       Database access, document post-processing and event hooks are
+       accounted to their own phases when 'SERVER_TIMING' is enabled.
+       Support for long polling. Conditional requests ('If-None-Match') can
+       wait for the document to change ('Prefer: wait=10') when
+       'long_polling' is enabled.
+
     .. versionchanged:: 0.1.0
        Support for optional HATEOAS.
 
@@ -148,17 +224,30 @@ def getitem(resource, **lookup):
        Superflous ``response`` container removed. Links wrapped with
        ``_links``. Links are now properly JSON formatted.
     """
+    req = parse_request(resource)
+    return long_poll(resource, req, lambda: _getitem(resource, req, **lookup),
+                     _lookup_matcher(lookup))
+
+
+def _getitem(resource, req, **lookup):
+    """ Retrieves a single document, returning the response tuple (see
+    :func:`getitem`).
+
+    .. versionadded:: 0.1.1
+    """
     response = {}
 
-    req = parse_request(resource)
-    document = app.data.find_one(resource, **lookup)
+    with phase('db'):
+        document = app.data.find_one(resource, **lookup)
     if document:
         # need to update the document field as well since the etag must
         # be computed on the same document representation that might have
         # been used in the collection 'get' method
-        last_modified = document[config.LAST_UPDATED] = last_updated(document)
-        document[config.DATE_CREATED] = date_created(document)
-        document['etag'] = document_etag(document)
+        with phase('meta'):
+            last_modified = document[config.LAST_UPDATED] = \
+                last_updated(document)
+            document[config.DATE_CREATED] = date_created(document)
+            document['etag'] = document_etag(document)
 
         if req.if_none_match and document['etag'] == req.if_none_match:
             # request etag matches the current server representation of the
@@ -182,12 +271,9 @@ def getitem(resource, **lookup):
         # functions modify the document, last_modified and etag  won't be
         # updated to reflect the changes (they always reflect the documents
         # state on the database).
-        item_title = config.DOMAIN[resource]['item_title'].lower()
-
-        getattr(app, "on_fetch_item")(resource, document[config.ID_FIELD],
-                                      document)
-        getattr(app, "on_fetch_item_%s" %
-                item_title)(document[config.ID_FIELD], document)
+        app.raise_hooks('on_fetch_item', resource,
+                        (document[config.ID_FIELD], document),
+                        config.DOMAIN[resource]['item_title'].lower())
 
         response.update(document)
         return response, last_modified, document['etag'], 200
@@ -195,6 +281,77 @@ def getitem(resource, **lookup):
     abort(404)
 
 
+def _requested_ids(req):
+    """ Returns the ids of a multi-get request ('?ids=a,b,c'), in the requested
+    order and without duplicates, or None when no ids are requested. Aborts
+    with 400 when more than `PAGINATION_LIMIT` ids are requested, or when the
+    request also carries a filter or a sort, as documents are looked up by id
+    and returned in the requested order.
+
+    :param req: the parsed request.
+
+    .. versionadded:: 0.1.1
+    """
+    if 'ids' not in request.args:
+        return None
+    if req.where or req.sort:
+        abort(400, description=debug_error_message(
+            'Multi-get requests do not support where and sort'
+        ))
+    ids = []
+    seen = set()
+    for id_ in request.args['ids'].split(','):
+        id_ = id_.strip()
+        if id_ and id_ not in seen:
+            seen.add(id_)
+            ids.append(id_)
+    if len(ids) > config.PAGINATION_LIMIT:
+        abort(400, description=debug_error_message(
+            'No more than %d ids can be requested at once' %
+            config.PAGINATION_LIMIT
+        ))
+    return ids
+
+
+def _count(cursor):
+    """ Returns the number of documents matched by a find, or 0 for
+    multi-get results, which are never paginated.
+
+    .. versionadded:: 0.1.1
+    """
+    if cursor is None:
+        return 0
+    with phase('db'):
+        return cursor.count()
+
+
+def _lookup_matcher(lookup):
+    """ Returns a predicate telling whether a document satisfies an item
+    lookup. Lookup values come from the URL, hence they are compared with
+    the string representation of the document values.
+
+    .. versionadded:: 0.1.1
+    """
+    def match(document):
+        for field, value in lookup.items():
+            if field not in document or \
+                    u'%s' % document[field] != u'%s' % value:
+                return False
+        return True
+    return match
+
+
+def _explain_requested():
+    """ Returns True if the client asked for the query plan instead of the
+    actual documents (``?_explain=1``), and explain mode is available. That
+    is, when both debug mode and `QUERY_EXPLAIN` are enabled.
+
+    .. versionadded:: 0.1.1
+    """
+    return app.debug and config.QUERY_EXPLAIN and \
+        request.args.get('_explain') in ('1', 'true')
+
+
 def _resolve_embedded_documents(resource, req, documents):
     """Loops through the documents, adding embedded representations
     of any fields that are (1) defined eligible for embedding in the
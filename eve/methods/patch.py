@@ -15,6 +15,8 @@ from werkzeug import exceptions
 from datetime import datetime
 from eve.utils import document_etag, document_link, config, debug_error_message
 from eve.auth import requires_auth
+from eve.timing import phase
+from eve.notifications import notify, UPDATE
 from eve.validation import ValidationError
 from eve.methods.common import get_document, parse, payload as payload_, \
     ratelimit
@@ -31,6 +33,11 @@ def patch(resource, **lookup):
     :param resource: the name of the resource to which the document belongs.
     :param **lookup: document lookup query.
 
+    .. versionchanged:: 0.1.1
+       Database access and ETag computation are accounted to their own phases
+       when 'SERVER_TIMING' is enabled.
+       Change notifications.
+
     .. versionchanged:: 0.1.0
        Support for optional HATEOAS.
        Re-raises `exceptions.Unauthorized`, this could occur if the
@@ -96,13 +103,17 @@ def patch(resource, **lookup):
             # been updated, and we still have to provide an updated etag,
             # we're going to update the local version of the 'original'
             # document, and we will use it for the etag computation.
+            previous = dict(original)
             original.update(updates)
             # some datetime precision magic
             updates[config.LAST_UPDATED] = original[config.LAST_UPDATED] = \
                 datetime.utcnow().replace(microsecond=0)
-            etag = document_etag(original)
+            with phase('meta'):
+                etag = document_etag(original)
 
-            app.data.update(resource, object_id, updates)
+            with phase('db'):
+                app.data.update(resource, object_id, updates)
+            notify(resource, UPDATE, [original], [previous])
             response_item[config.ID_FIELD] = object_id
             last_modified = response_item[config.LAST_UPDATED] = \
                 original[config.LAST_UPDATED]
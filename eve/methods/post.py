@@ -14,6 +14,8 @@
 from flask import current_app as app, request
 from eve.utils import document_link, config, document_etag
 from eve.auth import requires_auth
+from eve.timing import phase
+from eve.notifications import notify, INSERT
 from eve.methods.common import parse, payload, ratelimit
 from eve.methods.common import validate_document, failure_resp_item, \
     success_resp_item
@@ -43,6 +45,9 @@ def post(resource, payl=None):
 
     .. versionchanged:: 0.1.1
         auth.request_auth_value is now used to store the auth_field value.
+        Database access and event hooks are accounted to their own phases
+        when 'SERVER_TIMING' is enabled.
+        Change notifications.
 
     .. versionchanged:: 0.1.0
        More robust handling of auth_field.
@@ -110,7 +115,6 @@ def post(resource, payl=None):
         payl_items = payl.items()
     
     for key, value in payl_items:
-        print value
         document, doc_issues = validate_document(value, validator, resource,
                                                  resource_def)
         issues.append(doc_issues)
@@ -119,11 +123,12 @@ def post(resource, payl=None):
 
     if len(documents):
         # notify callbacks
-        getattr(app, "on_insert")(resource, documents)
-        getattr(app, "on_insert_%s" % resource)(documents)
+        app.raise_hooks('on_insert', resource, (documents,))
 
         # bulk insert
-        ids = app.data.insert(resource, documents)
+        with phase('db'):
+            ids = app.data.insert(resource, documents)
+        notify(resource, INSERT, documents)
 
     # build response payload
     response = {}
@@ -148,6 +153,4 @@ def post(resource, payl=None):
         for key, response_item in response_items:
             response[key] = response_item
 
-    print response
-
     return response, None, None, 200
@@ -12,6 +12,8 @@
 
 from datetime import datetime
 from eve.auth import requires_auth
+from eve.timing import phase
+from eve.notifications import notify, REPLACE
 from flask import current_app as app, abort, request
 from eve.utils import document_etag, document_link, config, debug_error_message
 from eve.methods.common import get_document, parse, payload as payload_, \
@@ -31,6 +33,9 @@ def put(resource, **lookup):
 
     .. versionchanged:: 0.1.1
         auth.request_auth_value is now used to store the auth_field value.
+        Database access and event hooks are accounted to their own phases
+        when 'SERVER_TIMING' is enabled.
+        Change notifications.
 
     .. versionadded:: 0.1.0
     """
@@ -56,11 +61,14 @@ def put(resource, **lookup):
         last_modified = document[config.LAST_UPDATED]
 
         # notify callbacks
-        getattr(app, "on_insert")(resource, [document])
-        getattr(app, "on_insert_%s" % resource)([document])
+        app.raise_hooks('on_insert', resource, ([document],))
 
         # single replacement
-        app.data.replace(resource, object_id, document)
+        with phase('db'):
+            app.data.replace(resource, object_id, document)
+        replacement = dict(document)
+        replacement[config.ID_FIELD] = object_id
+        notify(resource, REPLACE, [replacement], [original])
 
     response_item = {}
     if len(issues):
@@ -0,0 +1,375 @@
+# -*- coding: utf-8 -*-
+
+"""
+    eve.notifications
+    ~~~~~~~~~~~~~~~~~
+
+    Change notifications. Documents inserted, updated, replaced and deleted
+    through the API are published on a bus, and pushed to the clients
+    subscribed to the notification stream of the resource (see
+    `NOTIFICATIONS`). A bus is a :class:`Bus` subclass, and the one used by
+    the application is either passed to the Eve constructor or picked
+    depending on the availability of a Redis instance:
+
+    - :class:`LocalBus` delivers notifications within the process. Fine for
+      single-process deployments.
+    - :class:`RedisBus` publishes notifications on a Redis pub/sub channel,
+      so that they reach the subscribers of every process.
+
+    Each subscriber has its own bounded queue. A subscriber which can't keep
+    up with the notifications is sent a 'reset' event, telling the client to
+    reload the resource, and is then disconnected.
+
+    Long-polling requests (see `LONG_POLLING`) subscribe to the bus as well,
+    waiting for the documents they are interested in to change.
+
+    :copyright: (c) 2013 by Nicola Iarocci.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import copy
+import os
+import threading
+import time
+from flask import current_app as app
+from eve.serializers import bson_dumps, bson_loads
+from eve.utils import config
+
+try:
+    from queue import Queue, Empty, Full
+except ImportError:
+    from Queue import Queue, Empty, Full  # noqa
+
+try:
+    from redis.exceptions import RedisError
+except ImportError:
+    RedisError = Exception
+
+_bus_lock = threading.Lock()
+
+# notification events.
+INSERT = 'insert'
+UPDATE = 'update'
+REPLACE = 'replace'
+DELETE = 'delete'
+RESET = 'reset'
+
+
+def notify(resource, event, documents, originals=None):
+    """ Publishes the changes made to documents of a resource, if either
+    `notifications` or `long_polling` are enabled for it. Documents can be
+    safely modified afterwards.
+
+    :param resource: the resource name.
+    :param event: the change, as in `INSERT`, `UPDATE`, `REPLACE` or
+                  `DELETE`.
+    :param documents: the documents as they are after the change. None for
+                      deletions.
+    :param originals: the documents as they were before the change. None for
+                      insertions.
+
+    .. versionadded:: 0.1.1
+    """
+    if not _published(resource):
+        return
+    if documents is None:
+        documents = [None] * len(originals)
+    if originals is None:
+        originals = [None] * len(documents)
+    notifications = []
+    for document, original in zip(documents, originals):
+        notifications.append({'resource': resource, 'event': event,
+                              'document': document, 'original': original})
+    notification_bus().publish(notifications)
+
+
+def reset(resource):
+    """ Tells the subscribers of a resource to reload it. Published when
+    changes can't be notified one document at a time, as when the whole
+    resource is deleted.
+
+    :param resource: the resource name.
+
+    .. versionadded:: 0.1.1
+    """
+    if _published(resource):
+        notification_bus().publish([{'resource': resource, 'event': RESET,
+                                     'document': None, 'original': None}])
+
+
+def _published(resource):
+    """ Returns True if changes to the resource are published. """
+    settings = config.DOMAIN[resource]
+    return settings['notifications'] or settings['long_polling']
+
+
+class Subscription(object):
+    """ A subscriber to the notifications of a resource.
+
+    :param bus: the bus.
+    :param resource: the resource name.
+    :param queue_size: max number of notifications waiting to be sent.
+
+    .. versionadded:: 0.1.1
+    """
+    def __init__(self, bus, resource, queue_size):
+        self.bus = bus
+        self.resource = resource
+        self.overflow = False
+        self._queue = Queue(queue_size)
+
+    def put(self, notification):
+        """ Queues a notification, without blocking. Notifications not
+        fitting in the queue are lost, and the subscription is flagged.
+
+        :param notification: the notification.
+        """
+        try:
+            self._queue.put_nowait(notification)
+        except Full:
+            self.overflow = True
+
+    def events(self, match, heartbeat):
+        """ Yields the events to be sent to the subscriber, as (event,
+        document) tuples, or None when no notification arrived for
+        `heartbeat` seconds. Updated documents which no longer match are
+        reported as deleted, and documents which don't match at all are
+        skipped. Ends when the subscriber falls behind, after a 'reset' event.
+
+        :param match: the predicate telling whether a document matches the
+                      subscription (see :meth:`eve.io.DataLayer.matcher`).
+        :param heartbeat: seconds between heartbeats.
+        """
+        while not self.overflow:
+            try:
+                notification = self._queue.get(timeout=heartbeat)
+            except Empty:
+                yield None
+                continue
+            event = notification['event']
+            document = notification['document']
+            original = notification['original']
+            if event == RESET:
+                yield RESET, None
+            elif document is not None and match(document):
+                yield event, document
+            elif original is not None and match(original):
+                yield DELETE, original
+        yield RESET, None
+
+    def wait(self, timeout, match=None):
+        """ Waits for a notification, up to `timeout` seconds. Returns True
+        if one arrived in time. Notifications about documents which match
+        neither before nor after the change are skipped, unless some
+        notifications were lost meanwhile.
+
+        :param timeout: seconds to wait for.
+        :param match: the predicate telling whether a document is relevant
+                      to the subscriber. None if they all are.
+        """
+        deadline = time.time() + timeout
+        while True:
+            if self.overflow:
+                # lost notifications might have been relevant.
+                self.overflow = False
+                return True
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            try:
+                notification = self._queue.get(timeout=remaining)
+            except Empty:
+                return False
+            if match is None or notification['event'] == RESET:
+                return True
+            for document in (notification['document'],
+                             notification['original']):
+                if document is not None and match(document):
+                    return True
+
+    def close(self):
+        """ Stops receiving notifications. """
+        self.bus.unsubscribe(self)
+
+
+class Bus(object):
+    """ Base class for notification buses. Subclasses must implement
+    :meth:`publish`, and have the published notifications eventually
+    delivered to the subscribers of every process with :meth:`deliver`.
+
+    .. versionadded:: 0.1.1
+    """
+    def __init__(self):
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def publish(self, notifications):
+        """ Publishes notifications.
+
+        :param notifications: the list of notifications.
+        """
+        raise NotImplementedError
+
+    def subscribe(self, resource, queue_size):
+        """ Returns a new :class:`Subscription` to the notifications of a
+        resource.
+
+        :param resource: the resource name.
+        :param queue_size: max number of notifications waiting to be sent.
+        """
+        subscription = Subscription(self, resource, queue_size)
+        with self._lock:
+            self._subscriptions.setdefault(resource, []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """ Removes a subscription.
+
+        :param subscription: the subscription.
+        """
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.resource, [])
+            if subscription in subscriptions:
+                subscriptions.remove(subscription)
+
+    def deliver(self, notification):
+        """ Queues a notification for the subscribers of this process. Never
+        blocks.
+
+        :param notification: the notification.
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(
+                notification['resource'], []))
+        for subscription in subscriptions:
+            subscription.put(notification)
+
+    def stop(self):
+        """ Releases the resources held by the bus, if any. """
+        pass
+
+
+class LocalBus(Bus):
+    """ Bus delivering notifications to the subscribers of the current
+    process only. Notifications are copied, as their documents are still
+    owned by the request.
+
+    .. versionadded:: 0.1.1
+    """
+    def publish(self, notifications):
+        for notification in notifications:
+            # no need to copy what nobody is going to receive.
+            if self._subscriptions.get(notification['resource']):
+                self.deliver(copy.deepcopy(notification))
+
+
+class RedisBus(Bus):
+    """ Bus publishing notifications on a Redis pub/sub channel, as BSON
+    documents. Each process listens to the channel on a background thread,
+    and delivers what it receives to its own subscribers. Notifications are
+    lost while Redis is unreachable, in which case subscribers are sent a
+    'reset' event once the connection is back.
+
+    :param redis: the redis (pyredis) instance.
+    :param channel: the pub/sub channel.
+
+    .. versionadded:: 0.1.1
+    """
+    # seconds between attempts to reconnect to Redis.
+    retry_interval = 1
+
+    def __init__(self, redis, channel):
+        super(RedisBus, self).__init__()
+        self.redis = redis
+        self.channel = channel
+        self._pubsub = None
+        self._pid = None
+        self._stopped = False
+
+    def publish(self, notifications):
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for notification in notifications:
+                pipe.publish(self.channel, bson_dumps(notification))
+            pipe.execute()
+        except RedisError as e:
+            app.logger.error('Unable to publish notifications: %s' % e)
+
+    def subscribe(self, resource, queue_size):
+        self._ensure_listener()
+        return super(RedisBus, self).subscribe(resource, queue_size)
+
+    def stop(self):
+        self._stopped = True
+        if self._pubsub is not None and self._pid == os.getpid():
+            try:
+                self._pubsub.unsubscribe()
+            except RedisError:
+                pass
+
+    def _ensure_listener(self):
+        """ Starts the listener thread, if not running already. Threads don't
+        survive a fork, so a new one is started in each worker process.
+        """
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid != pid:
+                # subscribers inherited from the parent process are gone.
+                self._subscriptions = {}
+                listener = threading.Thread(target=self._run)
+                listener.daemon = True
+                listener.start()
+                self._pid = pid
+
+    def _run(self):
+        connected = True
+        while not self._stopped:
+            try:
+                self._pubsub = self.redis.pubsub()
+                self._pubsub.subscribe(self.channel)
+                if not connected:
+                    # notifications might have been missed meanwhile.
+                    self._reset_all()
+                    connected = True
+                for message in self._pubsub.listen():
+                    if self._stopped:
+                        break
+                    if message['type'] == 'message':
+                        self.deliver(bson_loads(message['data']))
+            except RedisError:
+                connected = False
+                time.sleep(self.retry_interval)
+
+    def _reset_all(self):
+        with self._lock:
+            resources = list(self._subscriptions.keys())
+        for resource in resources:
+            self.deliver({'resource': resource, 'event': RESET,
+                          'document': None, 'original': None})
+
+
+def notification_bus():
+    """ Returns the notification bus of the current application: the one
+    passed to the constructor if any, otherwise a :class:`RedisBus` when
+    a Redis instance is available, or a :class:`LocalBus`.
+
+    .. versionadded:: 0.1.1
+    """
+    if app.notification_bus is not None:
+        return app.notification_bus
+    channel = config.NOTIFICATIONS_CHANNEL
+    with _bus_lock:
+        bus = getattr(app, '_notification_bus', None)
+        if app.redis:
+            if not isinstance(bus, RedisBus) or bus.redis is not app.redis \
+                    or bus.channel != channel:
+                if bus is not None:
+                    bus.stop()
+                bus = app._notification_bus = RedisBus(app.redis, channel)
+        elif not isinstance(bus, LocalBus):
+            if bus is not None:
+                bus.stop()
+            bus = app._notification_bus = LocalBus()
+    return bus
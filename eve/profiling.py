@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+"""
+    eve.profiling
+    ~~~~~~~~~~~~~
+
+    On-demand profiling of single API requests. When enabled, adding
+    ``?_profile=1`` to any API url will run the request under cProfile. Only
+    meant for debugging: the feature is only available in debug mode.
+
+    :copyright: (c) 2013 by Nicola Iarocci.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import os
+import time
+import uuid
+import cProfile
+import pstats
+from flask import request, Response, current_app as app
+from eve.auth import authenticated
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+def profiling_requested():
+    """ Returns True if the current request should be profiled. That is, if
+    the client asked for it with ``?_profile=1``, debug mode and `PROFILING`
+    are both enabled and the identity claimed by the client is included with
+    `PROFILING_ALLOWED`. The identity is not verified yet: :func:`profile`
+    only returns profiling data once it is.
+
+    .. versionadded:: 0.1.1
+    """
+    if not (app.debug and app.config['PROFILING']):
+        return False
+    if request.args.get('_profile') not in ('1', 'true'):
+        return False
+    return _allowed()
+
+
+def client_identity():
+    """ Returns the identity claimed by the client: the username for Basic
+    and Token authentication, the user id for HMAC authentication. Please
+    note that the identity is only verified once the request has been
+    authenticated (see :func:`eve.auth.authenticated`).
+
+    .. versionadded:: 0.1.1
+    """
+    auth = request.authorization
+    if auth:
+        return auth.username
+    header = request.headers.get('Authorization')
+    if header and ':' in header:
+        return header.split(':')[0]
+    return None
+
+
+def profile(f, *args, **kwargs):
+    """ Runs `f` under cProfile. If `PROFILING_DIR` is set, profile stats
+    are saved to a `.prof` file in that directory and the actual response is
+    returned, with an `X-Eve-Profile` header reporting the file name.
+    Otherwise, the response is replaced by a plain-text report listing the
+    `PROFILING_RESTRICTIONS` top functions, sorted by cumulative time.
+
+    Profiling information is only returned when the request has been
+    authenticated, and the verified identity is included with
+    `PROFILING_ALLOWED`. Otherwise, including when authentication fails or
+    the method is public, the response is returned as-is.
+
+    :param f: the callable processing the request (usually the view).
+
+    .. versionadded:: 0.1.1
+    """
+    profiler = cProfile.Profile()
+    response = profiler.runcall(f, *args, **kwargs)
+
+    if not (authenticated() and _allowed()):
+        return response
+
+    directory = app.config['PROFILING_DIR']
+    if directory:
+        filename = '%s-%s-%s.prof' % (time.strftime('%Y%m%d-%H%M%S'),
+                                      request.endpoint,
+                                      uuid.uuid4().hex[:8])
+        profiler.dump_stats(os.path.join(directory, filename))
+        response.headers.add('X-Eve-Profile', filename)
+        return response
+
+    stream = StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats('cumulative')
+    stats.print_stats(app.config['PROFILING_RESTRICTIONS'])
+    return Response(stream.getvalue(), 200, mimetype='text/plain')
+
+
+def _allowed():
+    """ Returns True if the client identity is included with
+    `PROFILING_ALLOWED`.
+    """
+    identity = client_identity()
+    return identity is not None and \
+        identity in app.config['PROFILING_ALLOWED']
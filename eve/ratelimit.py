@@ -0,0 +1,415 @@
+# -*- coding: utf-8 -*-
+
+"""
+    eve.ratelimit
+    ~~~~~~~~~~~~~
+
+    Rate limiting backends. A backend is a :class:`RateLimiter` subclass,
+    and the one used by the application is either passed to the Eve
+    constructor or, when a Redis instance is available, picked among the
+    Redis-based ones:
+
+    - :class:`RedisRateLimiter` counts requests in Redis, with a round trip
+      per request.
+    - :class:`HybridRateLimiter` keeps the allowance of clients in memory and
+      syncs consumed units with Redis in batches, every
+      `RATE_LIMIT_SYNC_INTERVAL` seconds. Between two syncs a process can't
+      see what the others consumed, hence a client can exceed its limit by at
+      most `RATE_LIMIT_SYNC_BATCH` units per process. Should Redis be
+      unreachable, limits are enforced by each process on its own until Redis
+      is back.
+    - :class:`MemoryRateLimiter` is a Redis-free, in-process limiter for
+      single-process deployments.
+
+    Requests consume a number of units from the allowance of the client, as
+    returned by the configured cost function (see `RATE_LIMIT_COST`). Cost
+    functions for common cases are provided by this module.
+
+    :copyright: (c) 2013 by Nicola Iarocci.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import os
+import threading
+import time
+from math import ceil
+from flask import current_app as app, request
+from werkzeug.exceptions import HTTPException
+from eve.utils import config
+# eve.methods.common imports this module, so payload() is looked up at call
+# time.
+import eve.methods.common
+
+try:
+    from redis.exceptions import RedisError
+except ImportError:
+    RedisError = Exception
+
+_limiter_lock = threading.Lock()
+
+# Atomically consumes ARGV[1] units (the cost) from the allowance of a client
+# (KEYS[1]), unless that would exceed the limit (ARGV[2]). ARGV[3] is the
+# expiration time of the key. Returns the units which are, or would have
+# been, consumed in the current window.
+_HIT_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local cost = tonumber(ARGV[1])
+if current + cost > tonumber(ARGV[2]) then
+    return current + cost
+end
+current = redis.call('INCRBY', KEYS[1], cost)
+redis.call('EXPIREAT', KEYS[1], ARGV[3])
+return current
+"""
+
+
+class RateLimitStatus(object):
+    """ The state of a client rate limit, as returned by
+    :meth:`RateLimiter.hit`.
+
+    :param limit: units allowed per period.
+    :param current: units consumed in the current period.
+    :param reset: the time (epoch) at which the current period ends.
+    :param send_x_headers: True if response headers are supposed to include
+                           special 'X-RateLimit' headers
+
+    .. versionadded:: 0.1.1
+    """
+    def __init__(self, limit, current, reset, send_x_headers=True):
+        self.limit = limit
+        self.current = current
+        self.reset = reset
+        self.send_x_headers = send_x_headers
+
+    remaining = property(lambda x: x.limit - x.current)
+    over_limit = property(lambda x: x.current > x.limit)
+
+
+class RateLimiter(object):
+    """ Base class for rate limiting backends. Subclasses must implement
+    :meth:`hit`, and be safe to use from multiple threads.
+
+    .. versionadded:: 0.1.1
+    """
+    def hit(self, key_prefix, limit, period, cost=1):
+        """ Consumes `cost` units from the allowance of a client, unless that
+        would exceed the limit. Returns a :class:`RateLimitStatus`.
+
+        :param key_prefix: the key used to uniquely identify a client.
+        :param limit: units limit, per period.
+        :param period: limit validity period, in seconds.
+        :param cost: units consumed by the request.
+        """
+        raise NotImplementedError
+
+
+class RedisRateLimiter(RateLimiter):
+    """ Fixed-window rate limiter counting consumed units in Redis, with
+    a round trip per request. Limits are checked and units consumed
+    atomically, by a server-side Lua script.
+
+    :param redis: the redis (pyredis) instance.
+
+    .. versionadded:: 0.1.1
+       Replaces :class:`eve.methods.common.RateLimit`.
+    """
+    # We give the key extra expiration_window seconds time to expire in redis
+    # so that badly synchronized clocks between the workers and the redis
+    # server do not cause problems
+    expiration_window = 10
+
+    def __init__(self, redis):
+        self.redis = redis
+        self._hit = redis.register_script(_HIT_SCRIPT)
+
+    def hit(self, key_prefix, limit, period, cost=1):
+        reset = (int(time.time()) // period) * period + period
+        key = key_prefix + str(reset)
+        current = self._hit(keys=[key], args=[cost, limit,
+                                              reset + self.expiration_window])
+        return RateLimitStatus(limit, min(current, limit + 1), reset)
+
+
+class _Bucket(object):
+    """ Allowance of a client for the current period. `remote` is the count
+    last read from Redis (all processes included), `pending` the units
+    consumed locally and not synced yet.
+    """
+    __slots__ = ('reset', 'remote', 'pending')
+
+    def __init__(self, reset):
+        self.reset = reset
+        self.remote = 0
+        self.pending = 0
+
+
+class HybridRateLimiter(RateLimiter):
+    """ Rate limiter keeping per-client buckets in process and syncing them
+    with Redis in the background. Windows and Redis keys are the same used by
+    :class:`RedisRateLimiter`, so that processes using either backend agree on
+    the counts.
+
+    :param redis: the redis (pyredis) instance.
+    :param interval: seconds between two syncs with Redis.
+    :param batch: max number of units consumed locally before a sync is
+                  forced. Bounds the overshoot of each process.
+
+    .. versionadded:: 0.1.1
+    """
+    expiration_window = RedisRateLimiter.expiration_window
+
+    def __init__(self, redis, interval, batch):
+        self.redis = redis
+        self.interval = interval
+        self.batch = batch
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._offline_until = 0
+        self._stopped = threading.Event()
+        self._pid = None
+
+    def hit(self, key_prefix, limit, period, cost=1):
+        self._ensure_worker()
+        now = time.time()
+        reset = (int(now) // period) * period + period
+        key = key_prefix + str(reset)
+
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = _Bucket(reset)
+            flush = bucket.pending >= self.batch and \
+                now >= self._offline_until
+        if flush:
+            self.sync()
+
+        with self._lock:
+            current = bucket.remote + bucket.pending + cost
+            if current <= limit:
+                bucket.pending += cost
+        return RateLimitStatus(limit, min(current, limit + 1), reset)
+
+    def sync(self):
+        """ Pushes the locally consumed units to Redis, and fetches the
+        counts of the other processes in return. Buckets of elapsed periods
+        are dropped.
+        """
+        with self._sync_lock:
+            now = time.time()
+            with self._lock:
+                for key, bucket in list(self._buckets.items()):
+                    if bucket.reset <= now:
+                        del self._buckets[key]
+                sent = [(key, bucket, bucket.pending)
+                        for key, bucket in self._buckets.items()]
+            if not sent:
+                return
+
+            p = self.redis.pipeline(transaction=False)
+            for key, bucket, pending in sent:
+                if pending:
+                    p.incrby(key, pending)
+                    p.expireat(key, bucket.reset + self.expiration_window)
+                else:
+                    p.get(key)
+            try:
+                results = iter(p.execute())
+            except RedisError:
+                # local-only limits until Redis is back.
+                self._offline_until = now + self.interval
+                return
+
+            with self._lock:
+                for key, bucket, pending in sent:
+                    bucket.remote = int(next(results) or 0)
+                    if pending:
+                        next(results)
+                        bucket.pending -= pending
+            self._offline_until = 0
+
+    def stop(self):
+        """ Stops the background sync, flushing the pending units first. """
+        self._stopped.set()
+        self.sync()
+
+    def _ensure_worker(self):
+        """ Starts the background sync thread, if not running already.
+        Threads don't survive a fork, so a new one is started in each worker
+        process.
+        """
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            worker = threading.Thread(target=self._run)
+            worker.daemon = True
+            worker.start()
+
+    def _run(self):
+        while True:
+            self._stopped.wait(self.interval)
+            if self._stopped.is_set():
+                break
+            self.sync()
+
+
+class _Window(object):
+    """ Units consumed by a client in the current and previous windows. """
+    __slots__ = ('start', 'current', 'previous')
+
+    def __init__(self, start):
+        self.start = start
+        self.current = 0
+        self.previous = 0
+
+
+class MemoryRateLimiter(RateLimiter):
+    """ In-process, sliding-window rate limiter. Meant for single-process
+    deployments which don't want to depend on Redis.
+
+    The units consumed in the last `period` seconds are estimated from the
+    counts of the current and previous fixed windows, the latter weighted by
+    its overlap with the sliding window. This only takes two counters per
+    client, whatever the limit. Idle clients are evicted every
+    `sweep_interval` seconds.
+
+    :param sweep_interval: seconds between two evictions of idle clients.
+
+    .. versionadded:: 0.1.1
+    """
+    def __init__(self, sweep_interval=60):
+        self.sweep_interval = sweep_interval
+        self._windows = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.time() + sweep_interval
+
+    def hit(self, key_prefix, limit, period, cost=1):
+        now = time.time()
+        start = (int(now) // period) * period
+        key = (key_prefix, period)
+
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+
+            window = self._windows.get(key)
+            if window is None:
+                window = self._windows[key] = _Window(start)
+            elif window.start != start:
+                if window.start == start - period:
+                    window.previous = window.current
+                else:
+                    window.previous = 0
+                window.start = start
+                window.current = 0
+
+            weight = 1 - (now - start) / float(period)
+            current = int(ceil(window.previous * weight)) + window.current + \
+                cost
+            if current <= limit:
+                window.current += cost
+        return RateLimitStatus(limit, min(current, limit + 1), start + period)
+
+    def _sweep(self, now):
+        """ Drops the clients which have been idle for more than a period,
+        as nothing they consumed counts anymore.
+        """
+        for key, window in list(self._windows.items()):
+            if window.start + 2 * key[1] <= now:
+                del self._windows[key]
+        self._next_sweep = now + self.sweep_interval
+
+
+def rate_limiter():
+    """ Returns the rate limiter of the current application: the one passed
+    to the constructor if any, otherwise a Redis-based one when a Redis
+    instance is available (:class:`HybridRateLimiter` if
+    `RATE_LIMIT_SYNC_INTERVAL` is set, :class:`RedisRateLimiter` otherwise).
+    Returns None if no limiter is available.
+
+    .. versionadded:: 0.1.1
+    """
+    if app.ratelimiter is not None:
+        return app.ratelimiter
+    if app.redis:
+        if config.RATE_LIMIT_SYNC_INTERVAL:
+            return hybrid_limiter()
+        limiter = getattr(app, '_redis_limiter', None)
+        if limiter is None or limiter.redis is not app.redis:
+            limiter = app._redis_limiter = RedisRateLimiter(app.redis)
+        return limiter
+    return None
+
+
+def hybrid_limiter():
+    """ Returns the hybrid rate limiter of the current application. The
+    limiter is (re)built whenever the Redis instance or the sync settings
+    change.
+
+    .. versionadded:: 0.1.1
+    """
+    interval = config.RATE_LIMIT_SYNC_INTERVAL
+    batch = config.RATE_LIMIT_SYNC_BATCH
+    with _limiter_lock:
+        limiter = getattr(app, '_hybrid_limiter', None)
+        if limiter is None or limiter.redis is not app.redis or \
+                limiter.interval != interval or limiter.batch != batch:
+            if limiter is not None:
+                limiter.stop()
+            limiter = app._hybrid_limiter = HybridRateLimiter(
+                app.redis, interval, batch)
+    return limiter
+
+
+def documents_cost(resource):
+    """ Cost function charging a unit per document of POST payloads, whatever
+    their Content-Type, and a single unit for any other request. With
+    `SINGULAR_INSERTS` payloads hold a single document, so they cost a unit
+    too. Payloads which can't be parsed cost a unit, the error being reported
+    by the POST method itself.
+
+    :param resource: the resource being accessed, if any.
+
+    .. versionadded:: 0.1.1
+    """
+    if request.method != 'POST' or config.SINGULAR_INSERTS:
+        return 1
+    try:
+        documents = eve.methods.common.payload()
+    except HTTPException:
+        return 1
+    return max(len(documents or ()), 1)
+
+
+def max_results_cost(resource):
+    """ Cost function charging a unit per document possibly returned by GET
+    requests on resource endpoints, as in `max_results` (or the default page
+    size), and a single unit for any other request.
+
+    :param resource: the resource being accessed, if any.
+
+    .. versionadded:: 0.1.1
+    """
+    if request.method not in ('GET', 'HEAD') or \
+            request.endpoint != 'collections_endpoint':
+        return 1
+    try:
+        max_results = int(float(request.args['max_results']))
+    except (KeyError, ValueError):
+        max_results = config.PAGINATION_DEFAULT
+    return min(max(max_results, 1), config.PAGINATION_LIMIT)
+
+
+def body_size_cost(resource):
+    """ Cost function charging a unit per started KiB of the request body,
+    and at least a unit per request.
+
+    :param resource: the resource being accessed, if any.
+
+    .. versionadded:: 0.1.1
+    """
+    return max(int(ceil((request.content_length or 0) / 1024.0)), 1)
@@ -10,6 +10,8 @@
     :license: BSD, see LICENSE for more details.
 """
 
+import copy
+import re
 import time
 import datetime
 import simplejson as json
@@ -17,21 +19,60 @@ from werkzeug import utils
 from functools import wraps
 from bson.objectid import ObjectId
 from eve.methods.common import get_rate_limit
-from eve.utils import date_to_str, config, request_method
-from flask import make_response, request, Response, current_app as app
-
-# mapping between supported mime types and render functions.
+from eve.utils import date_to_str, config, request_method, LRUCache
+from eve.dates import format_date
+from eve.timing import timed
+from eve.compression import compress_response
+from eve.serializers import msgpack, msgpack_dumps, bson_dumps
+from flask import make_response, request, Response, stream_with_context, \
+    current_app as app
+
+# mapping between supported mime types and render functions. Renderers which
+# can produce their output incrementally also provide a stream function.
 _MIME_TYPES = [{'mime': ('application/json',), 'renderer': 'render_json'},
                {'mime': ('application/xml', 'text/xml', 'application/x-xml',),
-                'renderer': 'render_xml'}]
+                'renderer': 'render_xml', 'streamer': 'stream_xml'},
+               {'mime': ('application/bson',), 'renderer': 'render_bson'}]
+if msgpack:
+    _MIME_TYPES.append({'mime': ('application/x-msgpack',),
+                        'renderer': 'render_msgpack'})
 _DEFAULT_MIME = 'application/json'
 
+# supported mime types, and the render and stream functions of each of them,
+# compiled once from _MIME_TYPES.
+_SUPPORTED_MIMES = []
+_RENDERERS = {}
+for _mime in _MIME_TYPES:
+    for _mime_type in _mime['mime']:
+        _SUPPORTED_MIMES.append(_mime_type)
+        _RENDERERS[_mime_type] = (_mime['renderer'], _mime.get('streamer'))
+
+# memoized results of the Accept header negotiation.
+_best_mimes = LRUCache(128)
+
+# events raised after each request, by method.
+_METHOD_EVENTS = dict((method, 'on_' + method) for method in
+                      ('GET', 'POST', 'PATCH', 'DELETE', 'PUT'))
+
+# values of these types never need to be escaped when rendered as xml.
+_UNESCAPED_TYPES = (bool, int, float, ObjectId)
+
+# text values are only escaped when they hold any of these characters.
+_XML_SPECIAL = re.compile('[&<>"]')
+_TEXT_TYPES = (type(u''), str)
+
 
 def raise_event(f):
     """ Raises both general and resource-level events after the decorated
     function has been executed. Returns both the flask.request object and the
     response payload to the callback.
 
+    .. versionchanged:: 0.1.1
+       Event hooks are accounted to the 'hooks' phase when 'SERVER_TIMING' is
+       enabled.
+       Events without subscribers are skipped (see
+       :meth:`eve.Eve.raise_hooks`).
+
     .. versionchanged:: 0.1.0
        Support for PUT.
 
@@ -44,15 +85,10 @@ def raise_event(f):
     @wraps(f)
     def decorated(*args, **kwargs):
         r = f(*args, **kwargs)
-        method = request_method()
-        if method in ('GET', 'POST', 'PATCH', 'DELETE', 'PUT'):
-            event_name = 'on_' + method
+        event = _METHOD_EVENTS.get(request_method())
+        if event:
             resource = args[0] if args else None
-            # general hook
-            getattr(app, event_name)(resource, request, r)
-            if resource:
-                # resource hook
-                getattr(app, event_name + '_' + resource)(request, r)
+            app.raise_hooks(event, resource, (request, r))
         return r
     return decorated
 
@@ -85,6 +121,7 @@ def send_response(resource, response):
         return _prepare_response(resource, *response if response else [None])
 
 
+@timed('render')
 def _prepare_response(resource, dct, last_modified=None, etag=None,
                       status=200):
     """ Prepares the response object according to the client request and
@@ -97,6 +134,12 @@ def _prepare_response(resource, dct, last_modified=None, etag=None,
     :param etag: ETag header value.
     :param status: response status.
 
+    .. versionchanged:: 0.1.1
+       Accounted to the 'render' phase when 'SERVER_TIMING' is enabled.
+       Streamed responses when 'RESPONSE_STREAMING' is enabled.
+       Response compression when 'COMPRESSION' is enabled.
+       Allowed methods and CORS headers are precomputed.
+
     .. versionchanged:: 0.1.0
        Support for optional HATEOAS.
 
@@ -115,14 +158,20 @@ def _prepare_response(resource, dct, last_modified=None, etag=None,
     .. versionadded:: 0.0.4
     """
     if request.method == 'OPTIONS':
-        resp = app.make_default_options_response()
+        resp = app.response_class()
+        resp.headers['Allow'] = app.allowed_methods()
     else:
         # obtain the best match between client's request and available mime
         # types, along with the corresponding render function.
-        mime, renderer = _best_mime()
+        mime, renderer, streamer = _best_mime()
 
-        # invoke the render function and obtain the corresponding rendered item
-        rendered = globals()[renderer](dct)
+        if streamer and config.RESPONSE_STREAMING:
+            # the response body will be rendered while it is being sent.
+            rendered = stream_with_context(globals()[streamer](dct))
+        else:
+            # invoke the render function and obtain the corresponding rendered
+            # item
+            rendered = globals()[renderer](dct)
 
         # build the main wsgi rensponse object
         resp = make_response(rendered, status)
@@ -149,23 +198,8 @@ def _prepare_response(resource, dct, last_modified=None, etag=None,
 
     # CORS
     if 'Origin' in request.headers and config.X_DOMAINS is not None:
-        if isinstance(config.X_DOMAINS, str):
-            domains = [config.X_DOMAINS]
-        else:
-            domains = config.X_DOMAINS
-
-        if config.X_HEADERS is None:
-            headers = []
-        elif isinstance(config.X_HEADERS, str):
-            headers = [config.X_HEADERS]
-        else:
-            headers = config.X_HEADERS
-
-        methods = app.make_default_options_response().headers['allow']
-        resp.headers.add('Access-Control-Allow-Origin', ', '.join(domains))
-        resp.headers.add('Access-Control-Allow-Headers', ', '.join(headers))
-        resp.headers.add('Access-Control-Allow-Methods', methods)
-        resp.headers.add('Access-Control-Allow-Max-Age', 21600)
+        for header, value in _cors_headers(app.allowed_methods()):
+            resp.headers.add(header, value)
 
     # Rate-Limiting
     limit = get_rate_limit()
@@ -174,32 +208,76 @@ def _prepare_response(resource, dct, last_modified=None, etag=None,
         resp.headers.add('X-RateLimit-Limit', str(limit.limit))
         resp.headers.add('X-RateLimit-Reset', str(limit.reset))
 
-    return resp
+    return compress_response(resp, resource)
 
 
 def _best_mime():
     """ Returns the best match between the requested mime type and the
     ones supported by Eve. Along with the mime, also the corresponding
-    render function is returns.
+    render and stream functions are returned. The latter is None if the
+    renderer does not support streaming.
+
+    .. versionchanged:: 0.1.1
+       Returns the stream function too.
+       Results are memoized by Accept header value.
     """
-    supported = []
-    renders = {}
-    for mime in _MIME_TYPES:
-        for mime_type in mime['mime']:
-            supported.append(mime_type)
-            renders[mime_type] = mime['renderer']
-    best_match = request.accept_mimetypes.best_match(supported) or \
-        _DEFAULT_MIME
-    return best_match, renders[best_match]
+    accept = request.headers.get('Accept')
+    match = _best_mimes.get(accept)
+    if match is None:
+        best_match = request.accept_mimetypes.best_match(_SUPPORTED_MIMES) \
+            or _DEFAULT_MIME
+        match = (best_match,) + _RENDERERS[best_match]
+        _best_mimes.set(accept, match)
+    return match
+
+
+def _cors_headers(methods):
+    """ Returns the CORS headers to be added to the response, given the value
+    of the Allow header. Headers are compiled once for each set of allowed
+    methods, and reused until either 'X_DOMAINS' or 'X_HEADERS' change.
+
+    :param methods: the value of the Allow header.
+
+    .. versionadded:: 0.1.1
+    """
+    domains, headers = config.X_DOMAINS, config.X_HEADERS
+    table = getattr(app, '_cors_table', None)
+    if table is None or table[0] != domains or table[1] != headers:
+        table = app._cors_table = (copy.copy(domains), copy.copy(headers),
+                                   {})
+
+    cors = table[2].get(methods)
+    if cors is None:
+        if isinstance(domains, str):
+            domains = [domains]
+        if headers is None:
+            headers = []
+        elif isinstance(headers, str):
+            headers = [headers]
+        cors = table[2][methods] = [
+            ('Access-Control-Allow-Origin', ', '.join(domains)),
+            ('Access-Control-Allow-Headers', ', '.join(headers)),
+            ('Access-Control-Allow-Methods', methods),
+            ('Access-Control-Allow-Max-Age', '21600')]
+    return cors
 
 
 class APIEncoder(json.JSONEncoder):
     """ Propretary JSONEconder subclass used by the json render function.
     This is needed to address the encoding of special values.
+
+    .. versionchanged:: 0.1.1
+       Optional `date_format`, for rendering outside of the app context.
     """
+    def __init__(self, date_format=None, **kwargs):
+        super(APIEncoder, self).__init__(**kwargs)
+        self.date_format = date_format
+
     def default(self, obj):
         if isinstance(obj, datetime.datetime):
             # convert any datetime to RFC 1123 format
+            if self.date_format:
+                return format_date(obj, self.date_format)
             return date_to_str(obj)
         elif isinstance(obj, (datetime.time, datetime.date)):
             # should not happen since the only supported date-like format
@@ -211,13 +289,39 @@ class APIEncoder(json.JSONEncoder):
         return json.JSONEncoder.default(self, obj)
 
 
-def render_json(data):
+def render_json(data, date_format=None):
     """ JSON render function
 
+    :param data: the data to render.
+    :param date_format: the format of datetime values. Defaults to the
+                        `DATE_FORMAT` setting, which is only available within
+                        the app context.
+
+    .. versionchanged:: 0.1.1
+       `date_format` argument.
+
     .. versionchanged:: 0.1.0
        Support for optional HATEOAS.
     """
-    return json.dumps(data, cls=APIEncoder)
+    return json.dumps(data, cls=APIEncoder, date_format=date_format)
+
+
+def render_msgpack(data):
+    """ MessagePack render function. Datetimes and ObjectIds are encoded
+    as extension types (see :mod:`eve.serializers`).
+
+    .. versionadded:: 0.1.1
+    """
+    return msgpack_dumps(data)
+
+
+def render_bson(data):
+    """ BSON render function. Datetimes and ObjectIds are natively supported
+    by BSON.
+
+    .. versionadded:: 0.1.1
+    """
+    return bson_dumps(data)
 
 
 def render_xml(data):
@@ -225,32 +329,52 @@ def render_xml(data):
 
     :param data: the data stream to be rendered as xml.
 
+    .. versionchanged:: 0.1.1
+       Rendered chunks are joined once, in linear time. The data stream is not
+       modified anymore.
+
     .. versionchanged:: 0.1.0
        Support for optional HATEOAS.
 
     .. versionchanged:: 0.0.3
        Support for HAL-like hyperlinks and resource descriptors.
     """
+    return ''.join(stream_xml(data))
+
+
+def stream_xml(data):
+    """ XML stream function. A generator yielding the XML representation of
+    the data stream in chunks: root node and links first, then one chunk per
+    item and finally the closing tag. Suitable for streamed responses.
+
+    :param data: the data stream to be rendered as xml.
+
+    .. versionadded:: 0.1.1
+    """
     if isinstance(data, list):
         data = {'_items': data}
 
-    xml = ''
     if data:
-        xml += xml_root_open(data)
-        xml += xml_add_links(data)
-        xml += xml_add_items(data)
-        xml += xml_root_close()
-    return xml
+        yield xml_root_open(data) + xml_add_links(data)
+        if '_items' in data:
+            for item in data['_items']:
+                yield xml_item(item)
+        else:
+            yield xml_dict(data)
+        yield xml_root_close()
 
 
 def xml_root_open(data):
     """ Returns the opening tag for the XML root node. If the datastream
     includes informations about resource endpoints (href, title), they will
-    be added as node attributes. The resource endpoint is then removed to allow
-    for further processing of the datastream.
+    be added as node attributes.
 
     :param data: the data stream to be rendered as xml.
 
+    .. versionchanged:: 0.1.1
+       The resource endpoint is not removed from the datastream anymore.
+       Titles are escaped.
+
     .. versionchanged:: 0.1.0
        Support for optional HATEOAS.
 
@@ -262,35 +386,42 @@ def xml_root_open(data):
     links = data.get('_links')
     href = title = ''
     if links and 'self' in links:
-        self_ = links.pop('self')
+        self_ = links['self']
         href = ' href="%s" ' % utils.escape(self_['href'])
         if 'title' in self_:
-            title = ' title="%s" ' % self_['title']
+            title = ' title="%s" ' % utils.escape(self_['title'])
     return '<resource%s%s>' % (href, title)
 
 
-def xml_add_links(data):
-    """ Returns as many <link> nodes as there are in the datastream. The links
-    are then removed from the datastream to allow for further processing.
+def xml_add_links(data, include_self=False):
+    """ Returns as many <link> nodes as there are in the datastream. Unless
+    `include_self` is True, the 'self' link is skipped, as it is rendered as
+    attributes of the root node.
 
     :param data: the data stream to be rendered as xml.
+    :param include_self: wether the 'self' link should be rendered too.
+
+    .. versionchanged:: 0.1.1
+       Links are not removed from the datastream anymore. Titles are escaped.
+       'include_self' argument.
 
     .. versionchanged:: 0.0.6
        Links are now properly escaped.
 
     .. versionadded:: 0.0.3
     """
-    xml = ''
+    chunks = []
     chunk = '<link rel="%s" href="%s" title="%s" />'
-    links = data.pop('_links', {})
+    links = data.get('_links') or {}
     for rel, link in links.items():
-        if isinstance(link, list):
-            xml += ''.join([chunk % (rel, utils.escape(d['href']), d['title'])
-                            for d in link])
-        else:
-            xml += ''.join(chunk % (rel, utils.escape(link['href']),
-                                    link['title']))
-    return xml
+        if rel == 'self' and not include_self:
+            continue
+        if not isinstance(link, list):
+            link = [link]
+        for d in link:
+            chunks.append(chunk % (rel, utils.escape(d['href']),
+                                   utils.escape(d.get('title', ''))))
+    return ''.join(chunks)
 
 
 def xml_add_items(data):
@@ -302,11 +433,9 @@ def xml_add_items(data):
 
     .. versionadded:: 0.0.3
     """
-    try:
-        xml = ''.join([xml_item(item) for item in data['_items']])
-    except:
-        xml = xml_dict(data)
-    return xml
+    if '_items' in data:
+        return ''.join([xml_item(item) for item in data['_items']])
+    return xml_dict(data)
 
 
 def xml_item(item):
@@ -316,11 +445,10 @@ def xml_item(item):
 
     .. versionadded:: 0.0.3
     """
-    xml = xml_root_open(item)
-    xml += xml_add_links(item)
-    xml += xml_dict(item)
-    xml += xml_root_close()
-    return xml
+    chunks = [xml_root_open(item), xml_add_links(item)]
+    _xml_dict(item, chunks.append)
+    chunks.append(xml_root_close())
+    return ''.join(chunks)
 
 
 def xml_root_close():
@@ -332,27 +460,61 @@ def xml_root_close():
 
 
 def xml_dict(data):
-    """ Renders a dict as XML.
+    """ Renders a dict as XML. Links are not included, as they are rendered
+    by :func:`xml_add_links`.
 
     :param data: the data stream to be rendered as xml.
 
+    .. versionchanged:: 0.1.1
+       Values are escaped. Chunks are joined once, in linear time.
+
     .. versionadded:: 0.0.3
     """
-    xml = ''
+    chunks = []
+    _xml_dict(data, chunks.append)
+    return ''.join(chunks)
+
+
+def _xml_dict(data, write):
+    """ Renders a dict as XML, passing the escaped chunks to `write`.
+
+    :param data: the data stream to be rendered as xml.
+    :param write: the callable receiving the rendered chunks.
+
+    .. versionadded:: 0.1.1
+    """
+    # checks are sorted by the frequency of the value types.
     for k, v in data.items():
-        if isinstance(v, datetime.datetime):
-            v = date_to_str(v)
-        elif isinstance(v, (datetime.time, datetime.date)):
-            v = v.isoformat()
+        if k == '_links':
+            continue
         if not isinstance(v, list):
-            v = [v]
+            v = (v,)
         for value in v:
-            if isinstance(value, dict):
-                links = xml_add_links(value)
-                xml += "<%s>" % k
-                xml += xml_dict(value)
-                xml += links
-                xml += "</%s>" % k
+            if isinstance(value, _TEXT_TYPES):
+                write('<%s>%s</%s>' % (k, _xml_escape(value), k))
+            elif isinstance(value, _UNESCAPED_TYPES):
+                # nothing to escape in there.
+                write('<%s>%s</%s>' % (k, value, k))
+            elif isinstance(value, dict):
+                write('<%s>' % k)
+                _xml_dict(value, write)
+                write(xml_add_links(value, include_self=True))
+                write('</%s>' % k)
+            elif isinstance(value, datetime.datetime):
+                write('<%s>%s</%s>' % (k, _xml_escape(date_to_str(value)),
+                                       k))
+            elif isinstance(value, (datetime.time, datetime.date)):
+                write('<%s>%s</%s>' % (k, value.isoformat(), k))
             else:
-                xml += "<%s>%s</%s>" % (k, value, k)
-    return xml
+                write('<%s>%s</%s>' % (k, _xml_escape('%s' % (value,)), k))
+
+
+def _xml_escape(value):
+    """ Escapes a text value, which is returned as-is when there's nothing
+    to escape, as it is most often the case.
+
+    .. versionadded:: 0.1.1
+    """
+    if _XML_SPECIAL.search(value):
+        return utils.escape(value)
+    return value
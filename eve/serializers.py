@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+"""
+    eve.serializers
+    ~~~~~~~~~~~~~~~
+
+    Binary serialization formats (MessagePack, BSON), meant for service
+    clients which would rather skip the cost of JSON encoding and decoding.
+    Unlike JSON, both formats natively carry datetimes and ObjectIds.
+
+    MessagePack support requires the optional `msgpack` package, version 1.0
+    or later, which natively packs and unpacks the standard timestamp
+    extension type (-1) used for datetimes. ObjectIds are encoded with the
+    `OBJECTID_EXT_TYPE` extension type, its 12 raw bytes being the payload.
+
+    :copyright: (c) 2013 by Nicola Iarocci.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import calendar
+import datetime
+from bson import BSON, ObjectId
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# older releases can't handle the timestamp extension type.
+if msgpack and msgpack.version < (1, 0):
+    msgpack = None
+
+# MessagePack extension type of ObjectIds.
+OBJECTID_EXT_TYPE = 0x4f
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def msgpack_dumps(data):
+    """ Serializes `data` to MessagePack.
+
+    :param data: the data to serialize.
+
+    .. versionadded:: 0.1.1
+    """
+    return msgpack.packb(data, default=_msgpack_default, use_bin_type=True)
+
+
+def msgpack_loads(raw):
+    """ Deserializes a MessagePack document.
+
+    :param raw: the bytes to deserialize.
+
+    .. versionadded:: 0.1.1
+    """
+    return _msgpack_datetime(msgpack.unpackb(
+        raw, ext_hook=_msgpack_ext_hook, object_hook=_msgpack_object_hook,
+        list_hook=_msgpack_list_hook, raw=False))
+
+
+def bson_dumps(data):
+    """ Serializes `data` to BSON. As BSON documents can't be lists, a list
+    is wrapped in a document, under the `_items` key.
+
+    :param data: the data to serialize.
+
+    .. versionadded:: 0.1.1
+    """
+    if isinstance(data, list):
+        data = {'_items': data}
+    return BSON.encode(data or {})
+
+
+def bson_loads(raw):
+    """ Deserializes a BSON document.
+
+    :param raw: the bytes to deserialize.
+
+    .. versionadded:: 0.1.1
+    """
+    return BSON(raw).decode()
+
+
+def _msgpack_default(obj):
+    if isinstance(obj, datetime.datetime):
+        return msgpack.Timestamp(calendar.timegm(obj.utctimetuple()),
+                                 obj.microsecond * 1000)
+    elif isinstance(obj, ObjectId):
+        return msgpack.ExtType(OBJECTID_EXT_TYPE, obj.binary)
+    elif isinstance(obj, (datetime.time, datetime.date)):
+        return obj.isoformat()
+    raise TypeError('%r is not MessagePack serializable' % obj)
+
+
+def _msgpack_ext_hook(code, data):
+    if code == OBJECTID_EXT_TYPE:
+        return ObjectId(data)
+    return msgpack.ExtType(code, data)
+
+
+def _msgpack_object_hook(obj):
+    for key, value in obj.items():
+        if isinstance(value, msgpack.Timestamp):
+            obj[key] = _msgpack_datetime(value)
+    return obj
+
+
+def _msgpack_list_hook(obj):
+    return [_msgpack_datetime(value) for value in obj]
+
+
+def _msgpack_datetime(value):
+    """ Returns the naive, UTC datetime of a MessagePack timestamp, as found
+    in the rest of the codebase. Any other value is returned as-is.
+    """
+    if isinstance(value, msgpack.Timestamp):
+        return _EPOCH + datetime.timedelta(
+            microseconds=value.to_unix_nano() // 1000)
+    return value
@@ -1,10 +1,15 @@
 # -*- coding: utf-8 -*-
 from bson import ObjectId
 
+import base64
 import eve
+import hashlib
+import hmac
 import json
+import threading
+import time
 from eve import Eve
-from eve.auth import BasicAuth, TokenAuth, HMACAuth
+from eve.auth import BasicAuth, TokenAuth, HMACAuth, StreamingHMACAuth
 from eve.tests import TestBase
 
 
@@ -35,6 +40,32 @@ class BadHMACAuth(HMACAuth):
     pass
 
 
+class ValidStreamingHMACAuth(StreamingHMACAuth):
+    def secret_key(self, userid, allowed_roles, resource, method):
+        if userid == 'admin':
+            return 'secret'
+
+
+class UsernameBasicAuth(BasicAuth):
+    def check_auth(self, username, password, allowed_roles, resource, method):
+        self.request_auth_value = username
+        # give concurrent requests a chance to overwrite the value.
+        time.sleep(0.001)
+        return password == 'secret'
+
+
+class CountingBasicAuth(ValidBasicAuth):
+    def __init__(self):
+        super(CountingBasicAuth, self).__init__()
+        self.checks = 0
+
+    def check_auth(self, username, password, allowed_roles, resource, method):
+        self.checks += 1
+        self.request_auth_value = username
+        return super(CountingBasicAuth, self).check_auth(
+            username, password, allowed_roles, resource, method)
+
+
 class TestBasicAuth(TestBase):
 
     def setUp(self):
@@ -225,6 +256,68 @@ class TestHMACAuth(TestBasicAuth):
         self.assert401(r.status_code)
 
 
+class TestStreamingHMACAuth(TestBase):
+    def setUp(self):
+        super(TestStreamingHMACAuth, self).setUp()
+        self.app = Eve(settings=self.settings_file,
+                       auth=ValidStreamingHMACAuth)
+        self.test_client = self.app.test_client()
+
+    def test_signed_get(self):
+        r = self.test_client.get(self.known_resource_url,
+                                 headers=self.sign('admin', 'secret', ''))
+        self.assert200(r.status_code)
+
+    def test_signed_json_post(self):
+        data = json.dumps({'item1': {'ref': '1234567890123456789054321'}})
+        r = self.post(data, 'application/json',
+                      self.sign('admin', 'secret', data))
+        self.assertPostOK(r)
+
+    def test_signed_form_post(self):
+        data = 'item1=%7B%22ref%22%3A+%221234567890123456789054321%22%7D'
+        r = self.post(data, 'application/x-www-form-urlencoded',
+                      self.sign('admin', 'secret', data))
+        self.assertPostOK(r)
+
+    def test_bad_signature(self):
+        data = json.dumps({'item1': {'ref': '1234567890123456789054321'}})
+        r = self.post(data, 'application/json',
+                      self.sign('admin', 'wrong', data))
+        self.assert401(r.status_code)
+        r = self.post(data, 'application/json',
+                      [('Authorization', 'not a signature')])
+        self.assert401(r.status_code)
+
+    def test_unknown_user(self):
+        data = json.dumps({'item1': {'ref': '1234567890123456789054321'}})
+        r = self.post(data, 'application/json',
+                      self.sign('nobody', 'secret', data))
+        self.assert401(r.status_code)
+
+    def test_oversized_body(self):
+        self.app.config['MAX_CONTENT_LENGTH'] = 10
+        data = json.dumps({'item1': {'ref': '1234567890123456789054321'}})
+        r = self.post(data, 'application/json',
+                      self.sign('admin', 'secret', data))
+        self.assertEqual(r.status_code, 413)
+
+    def assertPostOK(self, r):
+        self.assert200(r.status_code)
+        result = json.loads(r.get_data().decode('utf-8'))
+        self.assertEqual(result['item1']['status'], eve.STATUS_OK)
+
+    def sign(self, userid, key, data):
+        digest = hmac.new(key.encode('utf-8'), data.encode('utf-8'),
+                          hashlib.sha1).hexdigest()
+        return [('Authorization', '%s:%s' % (userid, digest))]
+
+    def post(self, data, content_type, headers):
+        return self.test_client.post(self.known_resource_url, data=data,
+                                     content_type=content_type,
+                                     headers=headers)
+
+
 class TestUserRestrictedAccess(TestBase):
     def setUp(self):
         super(TestUserRestrictedAccess, self).setUp()
@@ -401,3 +494,136 @@ class TestUserRestrictedAccess(TestBase):
                                   headers=self.valid_auth,
                                   content_type='application/json')
         return self.parse_response(r)
+
+
+class TestConcurrentUserRestrictedAccess(TestBase):
+    def setUp(self):
+        super(TestConcurrentUserRestrictedAccess, self).setUp()
+        self.app = Eve(settings=self.settings_file, auth=UsernameBasicAuth)
+        self.resource = self.app.config['DOMAIN'][self.known_resource]
+        del self.resource['datasource']['filter']
+        self.app.set_defaults()
+        self.app._add_url_rules()
+        for resource, settings in self.app.config['DOMAIN'].items():
+            settings['auth_field'] = 'username'
+        self.test_client = self.app.test_client()
+        self.users = ['user%d' % i for i in range(4)]
+
+    def test_request_auth_value(self):
+        for i, user in enumerate(self.users):
+            data = json.dumps({'item1': {'ref': str(i) * 25}})
+            r = self.test_client.post(self.known_resource_url, data=data,
+                                      headers=self.auth(user),
+                                      content_type='application/json')
+            self.assert200(r.status_code)
+
+        failures = []
+
+        def client(i, user):
+            # each user can only see the document it created.
+            for n in range(20):
+                r = self.test_client.get(self.known_resource_url,
+                                         headers=self.auth(user))
+                items = json.loads(r.get_data().decode('utf-8'))['_items']
+                refs = [item['ref'] for item in items]
+                if refs != [str(i) * 25]:
+                    failures.append((user, refs))
+
+        threads = [threading.Thread(target=client, args=(i, user))
+                   for i, user in enumerate(self.users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(failures, [])
+
+    def test_request_auth_value_accessor(self):
+        auth = self.app.auth
+        auth.request_auth_value = 'default'
+        with self.app.test_request_context():
+            self.assertEqual(auth.request_auth_value, 'default')
+            auth.request_auth_value = 'user'
+            self.assertEqual(auth.request_auth_value, 'user')
+        with self.app.test_request_context():
+            self.assertEqual(auth.request_auth_value, 'default')
+        self.assertEqual(auth.request_auth_value, 'default')
+
+    def auth(self, user):
+        credentials = base64.b64encode(('%s:secret' % user).encode('utf-8'))
+        return [('Authorization', 'Basic %s' % credentials.decode('utf-8'))]
+
+
+class TestAuthCache(TestBase):
+    def setUp(self):
+        super(TestAuthCache, self).setUp()
+        self.app = Eve(settings=self.settings_file, auth=CountingBasicAuth)
+        self.app.config['AUTH_CACHE_SIZE'] = 10
+        self.test_client = self.app.test_client()
+        self.valid_auth = [('Authorization', 'Basic YWRtaW46c2VjcmV0')]
+        # admin:wrong
+        self.invalid_auth = [('Authorization', 'Basic YWRtaW46d3Jvbmc=')]
+
+    def test_cache_disabled(self):
+        self.app.config['AUTH_CACHE_SIZE'] = 0
+        self.assertChecks(2, self.known_resource_url, self.known_resource_url)
+
+    def test_cache(self):
+        self.assertChecks(1, self.known_resource_url, self.known_resource_url)
+        # outcome depends on the resource and method being accessed too.
+        self.assertChecks(2, self.known_resource_url, self.empty_resource_url)
+
+    def test_cache_failures(self):
+        for i in range(2):
+            r = self.test_client.get(self.known_resource_url,
+                                     headers=self.invalid_auth)
+            self.assert401(r.status_code)
+        self.assertEqual(self.app.auth.checks, 2)
+
+    def test_cache_ttl(self):
+        self.app.config['AUTH_CACHE_TTL'] = 0
+        self.assertChecks(2, self.known_resource_url, self.known_resource_url)
+
+    def test_cache_request_auth_value(self):
+        self.assertChecks(1, self.known_resource_url)
+        self.app.auth.request_auth_value = None
+        self.assertChecks(1, self.known_resource_url)
+        self.assertEqual(self.app.auth.request_auth_value, 'admin')
+
+    def test_cache_invalidation(self):
+        self.assertChecks(1, self.known_resource_url)
+        with self.app.app_context():
+            self.app.auth.invalidate_cache('someone else')
+        self.assertChecks(1, self.known_resource_url)
+        with self.app.app_context():
+            self.app.auth.invalidate_cache('admin')
+        self.assertChecks(2, self.known_resource_url)
+        with self.app.app_context():
+            self.app.auth.invalidate_cache()
+        self.assertChecks(3, self.known_resource_url)
+
+    def test_shared_cache(self):
+        try:
+            from redis import Redis, ConnectionError
+            self.app.redis = Redis()
+            self.app.redis.flushdb()
+        except (ImportError, ConnectionError):
+            print("Skipped. Needs a running redis-server and 'pip install "
+                  "redis'")
+            return
+        self.app.config['AUTH_CACHE_SHARED'] = True
+        self.app.config['AUTH_CACHE_SECRET'] = 'shared secret'
+        self.assertChecks(1, self.known_resource_url)
+        # another process, sharing the same redis and secret.
+        self.app._auth_cache = None
+        self.assertChecks(1, self.known_resource_url)
+        self.assertEqual(self.app.auth.request_auth_value, 'admin')
+        with self.app.app_context():
+            self.app.auth.invalidate_cache('admin')
+        self.assertChecks(2, self.known_resource_url)
+        self.app.redis.flushdb()
+
+    def assertChecks(self, checks, *urls):
+        for url in urls:
+            r = self.test_client.get(url, headers=self.valid_auth)
+            self.assert200(r.status_code)
+        self.assertEqual(self.app.auth.checks, checks)
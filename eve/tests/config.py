@@ -42,6 +42,33 @@ class TestConfig(TestBase):
         self.assertEqual(self.app.config['RATE_LIMIT_POST'], None)
         self.assertEqual(self.app.config['RATE_LIMIT_PATCH'], None)
         self.assertEqual(self.app.config['RATE_LIMIT_DELETE'], None)
+        self.assertEqual(self.app.config['RATE_LIMIT_SYNC_INTERVAL'], None)
+        self.assertEqual(self.app.config['RATE_LIMIT_SYNC_BATCH'], 10)
+        self.assertEqual(self.app.config['RATE_LIMIT_COST'], None)
+        self.assertEqual(self.app.config['AUTH_CACHE_SIZE'], 0)
+        self.assertEqual(self.app.config['AUTH_CACHE_TTL'], 60)
+        self.assertEqual(self.app.config['AUTH_CACHE_SHARED'], False)
+        self.assertEqual(self.app.config['AUTH_CACHE_SECRET'], None)
+        self.assertEqual(self.app.config['DEFERRED_HOOKS_WORKERS'], 4)
+        self.assertEqual(self.app.config['DEFERRED_HOOKS_QUEUE_SIZE'], 1000)
+        self.assertEqual(self.app.config['DEFERRED_HOOKS_TIMEOUT'], 5)
+        self.assertEqual(self.app.config['BATCH'], False)
+        self.assertEqual(self.app.config['BATCH_URL'], '_batch')
+        self.assertEqual(self.app.config['BATCH_LIMIT'], 50)
+        self.assertEqual(self.app.config['BATCH_WORKERS'], 4)
+        self.assertEqual(self.app.config['SYNC'], False)
+        self.assertEqual(self.app.config['NOTIFICATIONS'], False)
+        self.assertEqual(self.app.config['NOTIFICATIONS_URL'],
+                         '_notifications')
+        self.assertEqual(self.app.config['NOTIFICATIONS_QUEUE_SIZE'], 100)
+        self.assertEqual(self.app.config['NOTIFICATIONS_HEARTBEAT'], 15)
+        self.assertEqual(self.app.config['NOTIFICATIONS_CHANNEL'],
+                         'eve-notifications')
+        self.assertEqual(self.app.config['LONG_POLLING'], False)
+        self.assertEqual(self.app.config['LONG_POLLING_MAX_WAIT'], 30)
+        self.assertEqual(self.app.config['EXPORT'], False)
+        self.assertEqual(self.app.config['EXPORT_URL'], '_export')
+        self.assertEqual(self.app.config['EXPORT_BATCH_SIZE'], 1000)
 
         self.assertEqual(self.app.config['MONGO_HOST'], 'localhost')
         self.assertEqual(self.app.config['MONGO_PORT'], 27017)
@@ -173,6 +200,16 @@ class TestConfig(TestBase):
         self.assertEqual(settings['allowed_filters'],
                          self.app.config['ALLOWED_FILTERS'])
         self.assertEqual(settings['projection'], self.app.config['PROJECTION'])
+        self.assertEqual(settings['sparse'], self.app.config['SPARSE'])
+        self.assertEqual(settings['sync'], self.app.config['SYNC'])
+        self.assertEqual(settings['notifications'],
+                         self.app.config['NOTIFICATIONS'])
+        self.assertEqual(settings['long_polling'],
+                         self.app.config['LONG_POLLING'])
+        self.assertEqual(settings['export'], self.app.config['EXPORT'])
+        self.assertEqual(settings['rate_limit'], {})
+        self.assertEqual(settings['rate_limit_cost'],
+                         self.app.config['RATE_LIMIT_COST'])
         self.assertEqual(settings['sorting'], self.app.config['SORTING'])
         self.assertEqual(settings['embedding'], self.app.config['EMBEDDING'])
         self.assertEqual(settings['pagination'], self.app.config['PAGINATION'])
@@ -266,6 +303,49 @@ class TestConfig(TestBase):
         self.assertEqual(type(settings['dates']), set)
         self.assertEqual(len(settings['dates']), 2)
 
+    def test_schema_nested_dates(self):
+        self.domain.clear()
+        self.domain['resource'] = {
+            'schema': {
+                'born': {'type': 'datetime'},
+                'name': {'type': 'string'},
+                'location': {
+                    'type': 'dict',
+                    'schema': {
+                        'since': {'type': 'datetime'},
+                        'city': {'type': 'string'},
+                    }
+                },
+                'rows': {
+                    'type': 'list',
+                    'schema': {
+                        'type': 'dict',
+                        'schema': {'when': {'type': 'datetime'}}
+                    }
+                },
+                'history': {
+                    'type': 'list',
+                    'schema': {'type': 'datetime'}
+                },
+                'pair': {
+                    'type': 'list',
+                    'items': [{'type': 'string'}, {'type': 'datetime'}]
+                },
+            }
+        }
+        self.app.set_defaults()
+        settings = self.domain['resource']
+        self.assertEqual(settings['dates'],
+                         set(['born', 'location.since', 'rows.when',
+                              'history', 'pair.1']))
+        tree = settings['dates_tree']
+        self.assertEqual(tree['location'], {'since': True})
+        self.assertEqual(tree['rows'], {'when': True})
+        self.assertEqual(tree['pair'], {'1': True})
+        self.assertTrue(tree[self.app.config['LAST_UPDATED']])
+        self.assertTrue(tree[self.app.config['DATE_CREATED']])
+        self.assertFalse('name' in tree)
+
     def test_schema_defaults(self):
         self.domain.clear()
         self.domain['resource'] = {
@@ -1,7 +1,16 @@
 # -*- coding: utf-8 -*-
 
+import os
+import shutil
+import tempfile
+from datetime import datetime
+import simplejson as json
 from eve.tests import TestBase
+from eve.tests.auth import CountingBasicAuth, ValidBasicAuth
 from eve import Eve
+from eve.notifications import LocalBus, INSERT, UPDATE, DELETE
+from eve.ratelimit import MemoryRateLimiter
+from eve.export import export_columns, OrderedDict
 
 # TODO find a reliable way to test item endpoints
 # which are based on regex, maybe reverse them?
@@ -76,3 +85,405 @@ class TestEndPoints(TestBase):
         self.assert200(r.status_code)
         r = self.test_prefix.get('/prefix/v1/contacts/')
         self.assert200(r.status_code)
+
+
+class TestProfiling(TestBase):
+
+    def setUp(self):
+        super(TestProfiling, self).setUp()
+        self.app = Eve(settings=self.settings_file, auth=ValidBasicAuth)
+        self.test_client = self.app.test_client()
+        self.app.debug = True
+        self.app.config['PROFILING'] = True
+        self.app.config['PROFILING_ALLOWED'] = ['admin']
+        self.profile_url = '%s?_profile=1' % self.known_resource_url
+        # admin:secret
+        self.valid_auth = [('Authorization', 'Basic YWRtaW46c2VjcmV0')]
+
+    def test_profiling_disabled(self):
+        self.app.config['PROFILING'] = False
+        r = self.test_client.get(self.profile_url, headers=self.valid_auth)
+        self.assert200(r.status_code)
+        self.assertEqual(r.content_type, 'application/json')
+
+    def test_profiling_needs_debug(self):
+        self.app.debug = False
+        r = self.test_client.get(self.profile_url, headers=self.valid_auth)
+        self.assertEqual(r.content_type, 'application/json')
+
+    def test_profiling_report(self):
+        self.app.config['PROFILING_RESTRICTIONS'] = 200
+        r = self.test_client.get(self.profile_url, headers=self.valid_auth)
+        self.assert200(r.status_code)
+        self.assertTrue('text/plain' in r.content_type)
+        report = r.get_data()
+        self.assertTrue(b'cumulative' in report)
+        self.assertTrue(b'(find)' in report)
+        self.assertTrue(b'(document_etag)' in report)
+        self.assertTrue(b'(render_json)' in report)
+
+    def test_profiling_not_allowed(self):
+        self.app.config['PROFILING_ALLOWED'] = ['someone']
+        r = self.test_client.get(self.profile_url, headers=self.valid_auth)
+        self.assertEqual(r.content_type, 'application/json')
+
+    def test_profiling_nobody_allowed_by_default(self):
+        self.app.config['PROFILING_ALLOWED'] = []
+        r = self.test_client.get(self.profile_url, headers=self.valid_auth)
+        self.assertEqual(r.content_type, 'application/json')
+
+    def test_profiling_unverified_identity(self):
+        # admin:wrong
+        r = self.test_client.get(self.profile_url, headers=[
+            ('Authorization', 'Basic YWRtaW46d3Jvbmc=')])
+        self.assert401(r.status_code)
+        self.assertFalse('text/plain' in r.content_type)
+        # credentials of public methods are not checked.
+        self.app.config['DOMAIN'][self.known_resource]['public_methods'] = \
+            ['GET']
+        r = self.test_client.get(self.profile_url, headers=[
+            ('Authorization', 'Basic YWRtaW46d3Jvbmc=')])
+        self.assert200(r.status_code)
+        self.assertEqual(r.content_type, 'application/json')
+
+    def test_profiling_dir(self):
+        directory = tempfile.mkdtemp()
+        try:
+            self.app.config['PROFILING_DIR'] = directory
+            r = self.test_client.get(self.profile_url,
+                                     headers=self.valid_auth)
+            self.assert200(r.status_code)
+            self.assertEqual(r.content_type, 'application/json')
+            filename = r.headers.get('X-Eve-Profile')
+            self.assertTrue(filename.endswith('.prof'))
+            self.assertTrue(os.path.exists(os.path.join(directory,
+                                                        filename)))
+        finally:
+            shutil.rmtree(directory)
+
+
+class TestBatch(TestBase):
+
+    def setUp(self):
+        super(TestBatch, self).setUp()
+        self.app = Eve(settings='eve/tests/test_batch.py')
+        self.test_client = self.app.test_client()
+
+    def test_batch_disabled(self):
+        self.app = Eve(settings=self.settings_file)
+        self.test_client = self.app.test_client()
+        r = self.test_client.post('/_batch', data='[]',
+                                  content_type='application/json')
+        self.assert404(r.status_code)
+
+    def test_batch(self):
+        changes = {'key1': {'ref': '1234567890123456789012345'}}
+        results = self.batch([
+            {'method': 'GET', 'path': self.known_resource_url},
+            {'method': 'GET', 'path': self.item_id_url},
+            {'method': 'PATCH', 'path': self.item_id_url, 'body': changes,
+             'headers': {'If-Match': self.item_etag}},
+            {'method': 'GET', 'path': self.item_id_url},
+            {'method': 'GET', 'path': self.unknown_item_id_url},
+            {'method': 'GET', 'path': '%s?max_results=1' %
+             self.known_resource_url},
+        ])
+        self.assertEqual([result['status'] for result in results],
+                         [200, 200, 200, 200, 404, 200])
+        self.assertEqual(len(results[0]['body']['_items']), 25)
+        self.assertEqual(results[1]['body']['ref'], self.item_ref)
+        self.assertEqual(results[2]['body']['key1']['status'], 'OK')
+        # reads following a write see its outcome.
+        self.assertEqual(results[3]['body']['ref'],
+                         '1234567890123456789012345')
+        self.assertEqual(results[3]['headers']['ETag'],
+                         results[3]['body']['etag'])
+        self.assertEqual(len(results[5]['body']['_items']), 1)
+
+    def test_batch_concurrent_reads(self):
+        self.app.config['BATCH_WORKERS'] = 8
+        results = self.batch([{'method': 'GET', 'path': self.item_id_url}
+                              for i in range(20)])
+        self.assertEqual(len(results), 20)
+        for result in results:
+            self.assertEqual(result['status'], 200)
+            self.assertEqual(result['body']['ref'], self.item_ref)
+        # the worker threads are shared by the batches.
+        executor = self.app._batch_executor
+        self.batch([{'method': 'GET', 'path': self.item_id_url}] * 2)
+        self.assertTrue(self.app._batch_executor is executor)
+
+    def test_batch_bad_requests(self):
+        for data in ('', '{}', '[{"path": "/"}]', '["GET"]'):
+            r = self.test_client.post('/_batch', data=data,
+                                      content_type='application/json')
+            self.assertEqual(r.status_code, 400)
+        self.app.config['BATCH_LIMIT'] = 1
+        subrequests = [{'method': 'GET', 'path': '/'}] * 2
+        r = self.test_client.post('/_batch', data=json.dumps(subrequests),
+                                  content_type='application/json')
+        self.assertEqual(r.status_code, 400)
+
+    def test_nested_batch(self):
+        results = self.batch([{'method': 'POST', 'path': '/_batch',
+                               'body': []}])
+        self.assertEqual(results[0]['status'], 400)
+
+    def test_batch_auth(self):
+        self.app = Eve(settings='eve/tests/test_batch.py',
+                       auth=CountingBasicAuth)
+        self.test_client = self.app.test_client()
+        subrequests = [{'method': 'GET', 'path': self.item_id_url},
+                       {'method': 'GET', 'path': self.known_resource_url},
+                       {'method': 'GET', 'path': self.item_id_url}]
+        results = self.batch(subrequests)
+        self.assertEqual([result['status'] for result in results],
+                         [401, 401, 401])
+        # admin:secret
+        results = self.batch(subrequests, [('Authorization',
+                                            'Basic YWRtaW46c2VjcmV0')])
+        self.assertEqual([result['status'] for result in results],
+                         [200, 200, 200])
+        # one check per distinct resource and method.
+        self.assertEqual(self.app.auth.checks, 1)
+
+    def test_batch_ratelimit(self):
+        self.app = Eve(settings='eve/tests/test_batch.py',
+                       ratelimiter=MemoryRateLimiter())
+        self.app.config['RATE_LIMIT_GET'] = (3, 60)
+        self.test_client = self.app.test_client()
+        # each sub-request is charged against the GET limit.
+        results = self.batch([{'method': 'GET', 'path': self.item_id_url}
+                              for i in range(5)])
+        self.assertEqual(sorted(result['status'] for result in results),
+                         [200, 200, 200, 429, 429])
+        r = self.test_client.get(self.item_id_url)
+        self.assertEqual(r.status_code, 429)
+
+    def batch(self, subrequests, headers=[]):
+        r = self.test_client.post('/_batch', data=json.dumps(subrequests),
+                                  content_type='application/json',
+                                  headers=headers)
+        self.assert200(r.status_code)
+        return json.loads(r.get_data().decode('utf-8'))
+
+
+class TestNotifications(TestBase):
+
+    def setUp(self):
+        super(TestNotifications, self).setUp()
+        self.app = Eve(settings='eve/tests/test_notifications.py')
+        self.test_client = self.app.test_client()
+
+    def test_notifications_disabled(self):
+        self.app = Eve(settings=self.settings_file)
+        self.test_client = self.app.test_client()
+        r = self.test_client.get('%s/_notifications' %
+                                 self.known_resource_url)
+        self.assert404(r.status_code)
+
+    def test_notifications(self):
+        r, events = self.subscribe()
+        self.assertEqual(r.mimetype, 'text/event-stream')
+        self.assertEqual(r.headers['Cache-Control'], 'no-cache')
+
+        data = {'item1': json.dumps({'ref': '1234567890123456789054321'})}
+        self.assert200(self.test_client.post(self.known_resource_url,
+                                             data=data).status_code)
+        event, document = next(events)
+        self.assertEqual(event, 'insert')
+        self.assertEqual(document['ref'], '1234567890123456789054321')
+
+        changes = {'key1': json.dumps({'ref': '1234567890123456789012345'})}
+        self.assert200(self.test_client.patch(
+            self.item_id_url, data=changes,
+            headers=[('If-Match', self.item_etag)]).status_code)
+        event, document = next(events)
+        self.assertEqual(event, 'update')
+        self.assertEqual(document['_id'], self.item_id)
+        self.assertEqual(document['ref'], '1234567890123456789012345')
+
+        self.assert200(self.test_client.delete(
+            self.known_resource_url).status_code)
+        self.assertEqual(next(events), ('reset', None))
+        r.close()
+
+    def test_notifications_where(self):
+        where = '{"ref": "1234567890123456789012345"}'
+        r, events = self.subscribe('?where=%s' % where)
+
+        # not matching, so the next event is a heartbeat.
+        data = {'item1': json.dumps({'ref': '1234567890123456789054321'})}
+        self.assert200(self.test_client.post(self.known_resource_url,
+                                             data=data).status_code)
+        self.assertEqual(next(events), (None, None))
+
+        changes = {'key1': json.dumps({'ref': '1234567890123456789012345'})}
+        r = self.test_client.patch(self.item_id_url, data=changes,
+                                   headers=[('If-Match', self.item_etag)])
+        etag = json.loads(r.get_data().decode('utf-8'))['key1']['etag']
+        event, document = next(events)
+        self.assertEqual(event, 'update')
+
+        # no longer matching, so reported as deleted.
+        changes = {'key1': json.dumps({'ref': '9234567890123456789054321'})}
+        self.assert200(self.test_client.patch(
+            self.item_id_url, data=changes,
+            headers=[('If-Match', etag)]).status_code)
+        self.assertEqual(next(events), ('delete', {'_id': self.item_id}))
+        r.close()
+
+    def test_notifications_where_date(self):
+        # stored dates come back timezone-aware, the query ones are naive.
+        where = '{"%s": {"$gte": "Tue, 01 Jan 2013 00:00:00 GMT"}}' % \
+            self.app.config['DATE_CREATED']
+        r, events = self.subscribe('?where=%s' % where)
+        changes = {'key1': json.dumps({'ref': '1234567890123456789012345'})}
+        self.assert200(self.test_client.patch(
+            self.item_id_url, data=changes,
+            headers=[('If-Match', self.item_etag)]).status_code)
+        event, document = next(events)
+        self.assertEqual(event, 'update')
+        self.assertEqual(document['_id'], self.item_id)
+        r.close()
+
+    def test_notifications_date_format(self):
+        # events are rendered once the request is over.
+        self.app.config['DATE_FORMAT'] = '%Y-%m-%d'
+        r, events = self.subscribe()
+        changes = {'key1': json.dumps({'ref': '1234567890123456789012345'})}
+        self.assert200(self.test_client.patch(
+            self.item_id_url, data=changes,
+            headers=[('If-Match', self.item_etag)]).status_code)
+        event, document = next(events)
+        self.assertEqual(event, 'update')
+        # would raise a ValueError if rendered with the default format.
+        datetime.strptime(document[self.app.config['LAST_UPDATED']],
+                          '%Y-%m-%d')
+        r.close()
+
+    def test_notifications_overflow(self):
+        self.app.config['NOTIFICATIONS_QUEUE_SIZE'] = 1
+        r, events = self.subscribe()
+        data = {'item1': json.dumps({'ref': '1234567890123456789054321'}),
+                'item2': json.dumps({'ref': '9234567890123456789054321'})}
+        self.assert200(self.test_client.post(self.known_resource_url,
+                                             data=data).status_code)
+        self.assertEqual(next(events), ('reset', None))
+        self.assertRaises(StopIteration, next, events)
+
+    def test_local_bus(self):
+        bus = LocalBus()
+        subscription = bus.subscribe('contacts', 10)
+        original = {'_id': 1, 'ref': 'a'}
+        document = {'_id': 1, 'ref': 'b'}
+        bus.publish([{'resource': 'contacts', 'event': UPDATE,
+                      'document': document, 'original': original}])
+        bus.publish([{'resource': 'users', 'event': INSERT,
+                      'document': {'_id': 2}, 'original': None}])
+        # published documents are copied.
+        document['ref'] = 'c'
+        events = subscription.events(lambda d: d['ref'] == 'a', 0.01)
+        self.assertEqual(next(events), (DELETE, original))
+        self.assertEqual(next(events), None)
+        subscription.close()
+        self.assertEqual(bus._subscriptions['contacts'], [])
+
+    def subscribe(self, query=''):
+        r = self.test_client.get('%s/_notifications%s' %
+                                 (self.known_resource_url, query),
+                                 buffered=False)
+        self.assert200(r.status_code)
+        chunks = iter(r.response)
+        self.assertEqual(next(chunks).decode('utf-8'), ': subscribed\n\n')
+        return r, self.events(chunks)
+
+    def events(self, chunks):
+        for chunk in chunks:
+            chunk = chunk.decode('utf-8')
+            if chunk.startswith(':'):
+                yield None, None
+                continue
+            event, data = chunk.strip().split('\n')
+            yield event[len('event: '):], json.loads(data[len('data: '):])
+
+
+class TestExport(TestBase):
+
+    def setUp(self):
+        super(TestExport, self).setUp()
+        self.app = Eve(settings='eve/tests/test_export.py')
+        self.test_client = self.app.test_client()
+        self.export_url = '%s/_export' % self.known_resource_url
+
+    def test_export_disabled(self):
+        self.app = Eve(settings=self.settings_file)
+        self.test_client = self.app.test_client()
+        r = self.test_client.get(self.export_url)
+        self.assert404(r.status_code)
+
+    def test_export_ndjson(self):
+        r = self.test_client.get(self.export_url)
+        self.assert200(r.status_code)
+        self.assertEqual(r.mimetype, 'application/x-ndjson')
+        self.assertEqual(r.headers['Content-Disposition'],
+                         'attachment; filename=contacts.ndjson')
+        lines = r.get_data().decode('utf-8').splitlines()
+        # not paginated.
+        self.assertEqual(len(lines), self.known_resource_count)
+        documents = [json.loads(line) for line in lines]
+        self.assertTrue(self.item_id in [document['_id']
+                                         for document in documents])
+
+    def test_export_where(self):
+        r = self.test_client.get('%s?where={"ref": "%s"}' %
+                                 (self.export_url, self.item_ref))
+        self.assert200(r.status_code)
+        lines = r.get_data().decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])['_id'], self.item_id)
+
+    def test_export_csv(self):
+        r = self.test_client.get(self.export_url,
+                                 headers=[('Accept', 'text/csv')])
+        self.assert200(r.status_code)
+        self.assertEqual(r.mimetype, 'text/csv')
+        lines = r.get_data().decode('utf-8').split('\r\n')
+        self.assertEqual(lines.pop(), '')
+        columns = lines[0].split(',')
+        self.assertEqual(columns[0], '_id')
+        self.assertTrue('ref' in columns)
+        self.assertEqual(columns[-2:], [self.app.config['LAST_UPDATED'],
+                                        self.app.config['DATE_CREATED']])
+        self.assertEqual(len(lines), self.known_resource_count + 1)
+
+        r = self.test_client.get('%s?projection={"ref": 1}' %
+                                 self.export_url,
+                                 headers=[('Accept', 'text/csv')])
+        lines = r.get_data().decode('utf-8').split('\r\n')
+        self.assertEqual(lines[0], '_id,ref')
+        self.assertTrue('%s,%s' % (self.item_id, self.item_ref) in lines)
+
+    def test_export_columns_order(self):
+        settings = self.app.config['DOMAIN'][self.known_resource]
+        with self.app.test_request_context():
+            fields = export_columns(self.known_resource)[1:-2]
+            self.assertTrue(len(fields) > 1)
+            self.assertEqual(fields, sorted(fields))
+
+            if OrderedDict is not None:
+                settings['schema'] = OrderedDict(
+                    sorted(settings['schema'].items(), reverse=True))
+                self.assertEqual(export_columns(self.known_resource)[1:-2],
+                                 sorted(fields, reverse=True))
+
+    def test_export_auth(self):
+        self.app = Eve(settings='eve/tests/test_export.py',
+                       auth=CountingBasicAuth)
+        self.test_client = self.app.test_client()
+        r = self.test_client.get(self.export_url)
+        self.assert401(r.status_code)
+        # admin:secret
+        r = self.test_client.get(self.export_url, headers=[
+            ('Authorization', 'Basic YWRtaW46c2VjcmV0')])
+        self.assert200(r.status_code)
@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
 
+import random
 from unittest import TestCase
 from bson import ObjectId
-from datetime import datetime
+from bson.tz_util import utc
+from datetime import datetime, timedelta
 from eve.io.mongo.parser import parse, ParseError
+from eve.io.mongo.query import compile_query
 from eve.io.mongo import Validator, Mongo
 from eve.utils import config
 from cerberus.errors import ERROR_BAD_TYPE
@@ -118,9 +121,79 @@ class TestMongoDriver(TestCase):
         combined = mongo.combine_queries(query_a, query_b)
         self.assertEqual(
             combined,
-            {'$and': [{'username': {'$exists': True}}, {'username': 'mike'}]}
+            {'username': {'$exists': True}, '$and': [{'username': 'mike'}]}
         )
 
+    def test_combine_queries_flat(self):
+        mongo = Mongo(None)
+        query_a = {'username': 'mike', 'age': {'$gt': 18}}
+        query_b = {'age': {'$lt': 65}, 'role': 'admin'}
+        combined = mongo.combine_queries(query_a, query_b)
+        self.assertEqual(combined, {'username': 'mike',
+                                    'age': {'$gt': 18, '$lt': 65},
+                                    'role': 'admin'})
+        # inputs are left untouched
+        self.assertEqual(query_a, {'username': 'mike', 'age': {'$gt': 18}})
+        self.assertEqual(query_b, {'age': {'$lt': 65}, 'role': 'admin'})
+
+    def test_combine_queries_same_value(self):
+        mongo = Mongo(None)
+        combined = mongo.combine_queries({'username': 'mike'},
+                                         {'username': 'mike'})
+        self.assertEqual(combined, {'username': 'mike'})
+
+    def test_combine_queries_conflicting_operators(self):
+        mongo = Mongo(None)
+        combined = mongo.combine_queries({'age': {'$gt': 18}},
+                                         {'age': {'$gt': 21}})
+        self.assertEqual(combined, {'age': {'$gt': 18},
+                                    '$and': [{'age': {'$gt': 21}}]})
+        combined = mongo.combine_queries({'ref': {'$regex': '^a'}},
+                                         {'ref': {'$ne': 'abc'}})
+        self.assertEqual(combined, {'ref': {'$regex': '^a'},
+                                    '$and': [{'ref': {'$ne': 'abc'}}]})
+
+    def test_combine_queries_flattens_and(self):
+        mongo = Mongo(None)
+        query_a = {'$and': [{'a': 1}, {'$and': [{'b': 2}]}]}
+        query_b = {'$and': [{'c': 3}], 'd': 4}
+        combined = mongo.combine_queries(query_a, query_b)
+        self.assertEqual(combined, {'a': 1, 'b': 2, 'c': 3, 'd': 4})
+
+    def test_combine_queries_or_nor(self):
+        mongo = Mongo(None)
+        combined = mongo.combine_queries({'$or': [{'a': 1}, {'b': 1}]},
+                                         {'$or': [{'c': 1}, {'d': 1}]})
+        self.assertEqual(combined, {'$or': [{'a': 1}, {'b': 1}],
+                                    '$and': [{'$or': [{'c': 1}, {'d': 1}]}]})
+        combined = mongo.combine_queries({'$nor': [{'a': 1}]},
+                                         {'$nor': [{'b': 1}]})
+        self.assertEqual(combined, {'$nor': [{'a': 1}, {'b': 1}]})
+
+    def test_combine_queries_semantics(self):
+        # property test: for randomly generated queries and documents, the
+        # combined query must match exactly the documents matched by both
+        # queries.
+        mongo = Mongo(None)
+        rnd = random.Random(42)
+        documents = [random_document(rnd) for i in range(50)]
+        for i in range(500):
+            query_a = random_query(rnd)
+            query_b = random_query(rnd)
+            combined = mongo.combine_queries(query_a, query_b)
+            for document in documents:
+                self.assertEqual(match(document, combined),
+                                 match(document, query_a) and
+                                 match(document, query_b),
+                                 (query_a, query_b, combined, document))
+
+    def test_get_value_from_nested_query(self):
+        mongo = Mongo(None)
+        query = {'$and': [{'a': 1}, {'$and': [{'username': 'mike'}]}]}
+        self.assertEqual(mongo.get_value_from_query(query, 'username'),
+                         'mike')
+        self.assertRaises(KeyError, mongo.get_value_from_query, query, 'b')
+
     def test_get_value_from_query(self):
         mongo = Mongo(None)
         simple_query = {config.ID_FIELD: 'abcdef012345678901234567'}
@@ -150,3 +223,135 @@ class TestMongoDriver(TestCase):
                                                    config.ID_FIELD))
         self.assertFalse(mongo.query_contains_field(compound_query,
                                                     'fake-field'))
+
+    def test_compile_query(self):
+        match = compile_query({'age': {'$gt': 18}, 'tags': 'admin'})
+        self.assertTrue(match({'age': 21, 'tags': ['admin', 'user']}))
+        self.assertFalse(match({'age': 21, 'tags': ['user']}))
+        self.assertFalse(match({'age': '21', 'tags': 'admin'}))
+        match = compile_query({'rows.sku': 'a', 'location.city': {
+            '$regex': '^new', '$options': 'i'}})
+        self.assertTrue(match({'rows': [{'sku': 'b'}, {'sku': 'a'}],
+                               'location': {'city': 'New York'}}))
+        self.assertFalse(match({'rows': [{'sku': 'b'}],
+                                'location': {'city': 'New York'}}))
+        match = compile_query({'alist': {'$size': 2, '$all': [1]},
+                               'prog': {'$not': {'$mod': [2, 0]}}})
+        self.assertTrue(match({'alist': [1, 2], 'prog': 3}))
+        self.assertFalse(match({'alist': [1, 2], 'prog': 4}))
+        self.assertFalse(match({'alist': [2, 3], 'prog': 3}))
+        self.assertTrue(compile_query({})({}))
+
+    def test_compile_query_datetimes(self):
+        # documents read from the database hold timezone-aware datetimes,
+        # while query operands are naive.
+        naive = datetime(2013, 1, 1, 12)
+        aware = naive.replace(tzinfo=utc)
+        later = aware + timedelta(seconds=1)
+        match = compile_query({'d': {'$gte': naive}})
+        self.assertTrue(match({'d': aware}))
+        self.assertTrue(match({'d': [later]}))
+        self.assertFalse(match({'d': aware - timedelta(seconds=1)}))
+        self.assertTrue(compile_query({'d': naive})({'d': aware}))
+        self.assertTrue(compile_query({'d': {'$in': [naive]}})({'d': aware}))
+        self.assertTrue(compile_query({'d': {'$lt': aware}})({'d': naive -
+                        timedelta(seconds=1)}))
+
+    def test_compile_query_unsupported(self):
+        self.assertRaises(ValueError, compile_query, {'$where': 'true'})
+        self.assertRaises(ValueError, compile_query, {'a': {'$near': 1}})
+        self.assertRaises(ValueError, compile_query, {'$or': {'a': 1}})
+
+    def test_compile_query_semantics(self):
+        # property test: compiled queries must match exactly the documents
+        # matched by the queries.
+        rnd = random.Random(42)
+        documents = [random_document(rnd) for i in range(50)]
+        for i in range(500):
+            query = random_query(rnd)
+            compiled = compile_query(query)
+            for document in documents:
+                self.assertEqual(compiled(document), match(document, query),
+                                 (query, document))
+
+
+# A minimal, in-memory implementation of the MongoDB query semantics, used to
+# prove that combined queries are equivalent to the original ones.
+
+_FIELDS = ['a', 'b', 'c']
+_OPERATORS = ['$gt', '$gte', '$lt', '$lte', '$ne', '$in', '$nin', '$exists']
+
+
+def random_document(rnd):
+    return dict((field, rnd.randint(0, 3)) for field in _FIELDS
+                if rnd.random() > 0.2)
+
+
+def random_condition(rnd):
+    if rnd.random() < 0.3:
+        return rnd.randint(0, 3)
+    condition = {}
+    for operator in rnd.sample(_OPERATORS, rnd.randint(1, 2)):
+        if operator in ('$in', '$nin'):
+            condition[operator] = rnd.sample(range(4), rnd.randint(1, 3))
+        elif operator == '$exists':
+            condition[operator] = rnd.random() > 0.3
+        else:
+            condition[operator] = rnd.randint(0, 3)
+    return condition
+
+
+def random_query(rnd, depth=0):
+    query = {}
+    for field in rnd.sample(_FIELDS, rnd.randint(0, 3)):
+        query[field] = random_condition(rnd)
+    if depth < 2 and rnd.random() < 0.3:
+        operator = rnd.choice(['$and', '$or', '$nor'])
+        query[operator] = [random_query(rnd, depth + 1)
+                           for i in range(rnd.randint(1, 2))]
+    return query
+
+
+def match(document, query):
+    for key, condition in query.items():
+        if key == '$and':
+            if not all(match(document, q) for q in condition):
+                return False
+        elif key == '$or':
+            if not any(match(document, q) for q in condition):
+                return False
+        elif key == '$nor':
+            if any(match(document, q) for q in condition):
+                return False
+        elif not match_condition(document, key, condition):
+            return False
+    return True
+
+
+def match_condition(document, field, condition):
+    exists = field in document
+    value = document.get(field)
+    if not isinstance(condition, dict):
+        return exists and value == condition
+    for operator, operand in condition.items():
+        if operator == '$exists':
+            ok = exists == operand
+        elif operator == '$ne':
+            ok = not exists or value != operand
+        elif operator == '$nin':
+            ok = not exists or value not in operand
+        elif operator == '$in':
+            ok = exists and value in operand
+        elif not exists:
+            ok = False
+        elif operator == '$gt':
+            ok = value > operand
+        elif operator == '$gte':
+            ok = value >= operand
+        elif operator == '$lt':
+            ok = value < operand
+        elif operator == '$lte':
+            ok = value <= operand
+        if not ok:
+            return False
+    return True
@@ -1,4 +1,7 @@
+import threading
+import time
 import simplejson as json
+from datetime import datetime, timedelta
 from bson import ObjectId
 from eve.tests import TestBase
 from eve.tests.test_settings import MONGO_DBNAME
@@ -329,6 +332,280 @@ class TestGet(TestBase):
         content = json.loads(r.get_data())
         self.assertTrue('location' in content['_items'][0]['person'])
 
+    def test_get_explain(self):
+        # explain mode is not available unless explicitly enabled
+        response, status = self.get(self.known_resource, '?_explain=1')
+        self.assert200(status)
+        self.assertTrue('_items' in response)
+
+        self.app.debug = True
+        self.app.config['QUERY_EXPLAIN'] = True
+        where = '{"ref": "%s"}' % self.item_name
+        response, status = self.get(self.known_resource,
+                                    '?_explain=1&where=%s&sort=[("prog",1)]'
+                                    '&max_results=10&page=2' % where)
+        self.assert200(status)
+        self.assertTrue('_items' not in response)
+        self.assertEqual(response['source'], 'contacts')
+        self.assertEqual(response['limit'], 10)
+        self.assertEqual(response['skip'], 10)
+        self.assertEqual(response['sort'], [['prog', 1]])
+        self.assertTrue('ref' in json.dumps(response['spec']))
+        self.assertTrue('username' in json.dumps(response['spec']))
+        self.assertTrue('explain' in response)
+        # no index on either 'ref' or 'prog'
+        self.assertTrue(response['collscan'])
+        self.assertTrue(response['in_memory_sort'])
+
+    def test_get_ids(self):
+        response, status = self.get(self.known_resource, '?max_results=5')
+        ids = [item[self.app.config['ID_FIELD']] for item in
+               response['_items']]
+        ids.reverse()
+        # unknown ids and documents excluded by the datasource filter ('users'
+        # share the 'contacts' collection) are skipped.
+        query = [ids[0], self.unknown_item_id, ids[1], self.user_id] + ids[2:]
+        response, status = self.get(self.known_resource,
+                                    '?ids=%s&max_results=2' % ','.join(query))
+        self.assert200(status)
+        resource = response['_items']
+        self.assertEqual([item[self.app.config['ID_FIELD']] for item in
+                          resource], ids)
+        for item in resource:
+            self.assertItem(item)
+        links = response['_links']
+        self.assertEqual(len(links), 2)
+        self.assertResourceLink(links, self.known_resource)
+        self.assertHomeLink(links)
+
+    def test_get_ids_projection(self):
+        response, status = self.get(self.known_resource,
+                                    '?ids=%s&projection={"prog": 1}' %
+                                    self.item_id)
+        self.assert200(status)
+        resource = response['_items']
+        self.assertEqual(len(resource), 1)
+        self.assertTrue('prog' in resource[0])
+        self.assertFalse('ref' in resource[0])
+
+    def test_get_ids_limit(self):
+        limit = self.app.config['PAGINATION_LIMIT']
+        ids = ','.join(str(ObjectId()) for i in range(limit))
+        response, status = self.get(self.known_resource, '?ids=%s' % ids)
+        self.assert200(status)
+        self.assertEqual(len(response['_items']), 0)
+
+        ids = ','.join(str(ObjectId()) for i in range(limit + 1))
+        response, status = self.get(self.known_resource, '?ids=%s' % ids)
+        self.assert400(status)
+
+        # only collection GET requests parse ids.
+        r = self.test_client.get('%s?ids=%s' % (self.item_id_url, ids))
+        self.assert200(r.status_code)
+
+    def test_get_ids_where_sort(self):
+        response, status = self.get(self.known_resource,
+                                    '?ids=%s&where={"ref": "%s"}' %
+                                    (self.item_id, self.item_ref))
+        self.assert400(status)
+        response, status = self.get(self.known_resource,
+                                    '?ids=%s&sort=[("ref", 1)]' %
+                                    self.item_id)
+        self.assert400(status)
+
+    def test_get_sparse(self):
+        self.app.config['DOMAIN'][self.known_resource]['sparse'] = True
+        response, status = self.get(self.known_resource,
+                                    '?sparse=1&projection={"prog": 1}')
+        self.assert200(status)
+        self.assertEqual(list(response.keys()), ['_items'])
+        resource = response['_items']
+        self.assertEqual(len(resource), self.app.config['PAGINATION_DEFAULT'])
+        for item in resource:
+            self.assertItem(item)
+            self.assertTrue('prog' in item)
+            self.assertFalse('ref' in item)
+            self.assertFalse('etag' in item)
+            self.assertFalse('_links' in item)
+
+    def test_get_sparse_disabled(self):
+        response, status = self.get(self.known_resource, '?sparse=1')
+        self.assert200(status)
+        self.assertTrue('_links' in response)
+        for item in response['_items']:
+            self.assertTrue('etag' in item)
+            self.assertTrue('_links' in item)
+
+    def test_get_sync(self):
+        self.app.config['DOMAIN'][self.known_resource]['sync'] = True
+        ids, deleted, token = self.sync('')
+        _db = self.connection[MONGO_DBNAME]
+        self.assertEqual(len(ids), _db.contacts.count())
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual(deleted, [])
+
+        # nothing changed since.
+        response, status = self.get(self.known_resource, '?since=%s' % token)
+        self.assert200(status)
+        self.assertEqual(response['_items'], [])
+        self.assertEqual(response['_deleted'], [])
+        self.assertEqual(response['_sync'], {'token': token, 'more': False})
+
+        changes = {'key1': json.dumps({'ref': '1234567890123456789012345'})}
+        r = self.test_client.patch(self.item_id_url, data=changes,
+                                   headers=[('If-Match', self.item_etag)])
+        self.assert200(r.status_code)
+        ids, deleted, token = self.sync(token)
+        self.assertEqual(ids, [self.item_id])
+        self.assertEqual(deleted, [])
+
+        r = self.test_client.delete(self.item_id_url, headers=[
+            ('If-Match', self.getitem_etag(self.item_id))])
+        self.assert200(r.status_code)
+        ids, deleted, token = self.sync(token)
+        self.assertEqual(ids, [])
+        self.assertEqual(deleted, [self.item_id])
+
+    def test_get_sync_update_and_delete(self):
+        self.app.config['DOMAIN'][self.known_resource]['sync'] = True
+        ids, deleted, token = self.sync('')
+
+        changes = {'key1': json.dumps({'ref': '1234567890123456789012345'})}
+        r = self.test_client.patch(self.item_id_url, data=changes,
+                                   headers=[('If-Match', self.item_etag)])
+        self.assert200(r.status_code)
+        r = self.test_client.delete(self.item_id_url, headers=[
+            ('If-Match', self.getitem_etag(self.item_id))])
+        self.assert200(r.status_code)
+
+        # changes to the same document are reported once.
+        ids, deleted, token = self.sync(token)
+        self.assertEqual(ids, [])
+        self.assertEqual(deleted, [self.item_id])
+
+    def test_get_sync_write_in_flight(self):
+        self.app.config['DOMAIN'][self.known_resource]['sync'] = True
+        ids, deleted, token = self.sync('')
+        with self.app.test_request_context():
+            seq = self.app.data._next_seq(self.known_resource)
+
+        # a write following the one in flight completes first.
+        changes = {'key1': json.dumps({'ref': '1234567890123456789012345'})}
+        r = self.test_client.patch(self.item_id_url, data=changes,
+                                   headers=[('If-Match', self.item_etag)])
+        self.assert200(r.status_code)
+        ids, deleted, token = self.sync(token)
+        self.assertEqual(ids, [])
+
+        with self.app.test_request_context():
+            self.app.data._release_seq(self.known_resource, seq)
+        ids, deleted, token = self.sync(token)
+        self.assertEqual(ids, [self.item_id])
+
+    def test_get_sync_failed_write(self):
+        self.app.config['DOMAIN'][self.known_resource]['sync'] = True
+        ids, deleted, token = self.sync('')
+        # a write which never completes leaves its reservation behind.
+        with self.app.test_request_context():
+            self.app.data._next_seq(self.known_resource)
+
+        changes = {'key1': json.dumps({'ref': '1234567890123456789012345'})}
+        r = self.test_client.patch(self.item_id_url, data=changes,
+                                   headers=[('If-Match', self.item_etag)])
+        self.assert200(r.status_code)
+        ids, deleted, token = self.sync(token)
+        self.assertEqual(ids, [])
+
+        # the reservation expires.
+        self.app.config['SYNC_WRITE_TIMEOUT'] = 0
+        ids, deleted, token = self.sync(token)
+        self.assertEqual(ids, [self.item_id])
+        _db = self.connection[MONGO_DBNAME]
+        counter = _db._sync_counters.find_one({'_id': self.known_resource})
+        self.assertEqual(counter['pending'], [])
+
+    def test_get_sync_expired_token(self):
+        self.app.config['DOMAIN'][self.known_resource]['sync'] = True
+        ids, deleted, token = self.sync('')
+        r = self.test_client.delete(self.item_id_url, headers=[
+            ('If-Match', self.item_etag)])
+        self.assert200(r.status_code)
+
+        with self.app.test_request_context():
+            self.app.data._prune_tombstones(
+                self.known_resource, datetime.utcnow() + timedelta(seconds=1))
+        response, status = self.get(self.known_resource, '?since=%s' % token)
+        self.assertEqual(status, 410)
+        ids, deleted, token = self.sync('')
+        self.assertFalse(self.item_id in ids)
+
+    def test_get_sync_bad_token(self):
+        self.app.config['DOMAIN'][self.known_resource]['sync'] = True
+        response, status = self.get(self.known_resource, '?since=not-a-token')
+        self.assert400(status)
+
+    def test_get_sync_disabled(self):
+        response, status = self.get(self.known_resource, '?since=')
+        self.assert200(status)
+        self.assertFalse('_sync' in response)
+        self.assertFalse('_deleted' in response)
+
+    def test_get_long_poll(self):
+        self.app.config['DOMAIN'][self.known_resource]['long_polling'] = True
+        r = self.test_client.get(self.known_resource_url)
+        etag = r.headers.get('ETag')
+        self.assertTrue(etag is not None)
+        r = self.test_client.get(self.known_resource_url,
+                                 headers=[('If-None-Match', etag)])
+        self.assert304(r.status_code)
+
+        # woken by a change to the resource.
+        changes = {'key1': json.dumps({'ref': '1234567890123456789012345'})}
+        timer = patch_later(self.app, self.item_id_url, changes,
+                            self.item_etag)
+        started = time.time()
+        r = self.test_client.get(self.known_resource_url,
+                                 headers=[('If-None-Match', etag),
+                                          ('Prefer', 'wait=10')])
+        timer.join()
+        self.assert200(r.status_code)
+        self.assertTrue(time.time() - started < 10)
+        self.assertNotEqual(r.headers.get('ETag'), etag)
+
+    def test_get_long_poll_timeout(self):
+        self.app.config['DOMAIN'][self.known_resource]['long_polling'] = True
+        etag = self.test_client.get(self.known_resource_url).headers['ETag']
+        started = time.time()
+        r = self.test_client.get(self.known_resource_url,
+                                 headers=[('If-None-Match', etag),
+                                          ('Prefer', 'wait=1')])
+        self.assert304(r.status_code)
+        self.assertTrue(time.time() - started >= 1)
+
+    def test_get_long_poll_disabled(self):
+        r = self.test_client.get(self.known_resource_url)
+        self.assertTrue(r.headers.get('ETag') is None)
+
+    def sync(self, token):
+        ids = []
+        deleted = []
+        more = True
+        while more:
+            response, status = self.get(self.known_resource,
+                                        '?since=%s&max_results=10' % token)
+            self.assert200(status)
+            ids.extend(item[self.app.config['ID_FIELD']] for item in
+                       response['_items'])
+            deleted.extend(response['_deleted'])
+            token = response['_sync']['token']
+            more = response['_sync']['more']
+        return ids, deleted, token
+
+    def getitem_etag(self, id_):
+        response, status = self.get(self.known_resource, item=id_)
+        self.assert200(status)
+        return response['etag']
+
 
 class TestGetItem(TestBase):
 
@@ -389,6 +666,30 @@ class TestGetItem(TestBase):
         self.assert304(r.status_code)
         self.assertTrue(not r.get_data())
 
+    def test_getitem_long_poll(self):
+        self.app.config['DOMAIN'][self.known_resource]['long_polling'] = True
+        changes = {'key1': json.dumps({'ref': '1234567890123456789012345'})}
+        timer = patch_later(self.app, self.item_id_url, changes,
+                            self.item_etag)
+        started = time.time()
+        r = self.test_client.get(self.item_id_url,
+                                 headers=[('If-None-Match', self.item_etag),
+                                          ('Prefer', 'wait=10')])
+        timer.join()
+        self.assert200(r.status_code)
+        self.assertTrue(time.time() - started < 10)
+        response, status = self.parse_response(r)
+        self.assertEqual(response['ref'], '1234567890123456789012345')
+
+    def test_getitem_long_poll_timeout(self):
+        self.app.config['DOMAIN'][self.known_resource]['long_polling'] = True
+        started = time.time()
+        r = self.test_client.get(self.item_id_url,
+                                 headers=[('If-None-Match', self.item_etag),
+                                          ('Prefer', 'wait=1')])
+        self.assert304(r.status_code)
+        self.assertTrue(time.time() - started >= 1)
+
     def test_cache_control(self):
         self.assertCacheControl(self.item_id_url)
 
@@ -448,3 +749,13 @@ class TestHead(TestBase):
         r = self.test_client.get('/')
         self.assertTrue(not h.data)
         self.assertEqual(r.headers, h.headers)
+
+
+def patch_later(app, url, changes, etag):
+    # patches a document from another thread, while a request is waiting.
+    def patch():
+        app.test_client().patch(url, data=changes,
+                                headers=[('If-Match', etag)])
+    timer = threading.Timer(0.2, patch)
+    timer.start()
+    return timer
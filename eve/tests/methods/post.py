@@ -2,6 +2,9 @@ from eve.tests import TestBase
 from eve import STATUS_OK, LAST_UPDATED, ID_FIELD, DATE_CREATED
 import simplejson as json
 from ast import literal_eval
+from datetime import datetime
+from bson import BSON, ObjectId
+from eve.serializers import msgpack_dumps
 
 
 class TestPost(TestBase):
@@ -151,6 +154,32 @@ class TestPost(TestBase):
         self.assert200(status)
         self.assertPostResponse(r, ["item1"])
 
+    def test_post_bson(self):
+        self.assertPostBinary('application/bson', BSON.encode)
+
+    def test_post_msgpack(self):
+        self.assertPostBinary('application/x-msgpack', msgpack_dumps)
+
+    def test_post_bad_binary_payload(self):
+        for content_type in ('application/bson', 'application/x-msgpack'):
+            r, status = self.post(self.known_resource_url, data=b'\xc1\x00',
+                                  headers=[], content_type=content_type)
+            self.assert400(status)
+
+    def assertPostBinary(self, content_type, dumps):
+        born = datetime(2012, 11, 6, 10, 33, 31)
+        tid = ObjectId('50656e4538345b39dd0414f0')
+        data = {'item1': {'ref': '1234567890123456789054321', 'born': born,
+                          'tid': tid}}
+        r, status = self.post(self.known_resource_url, data=dumps(data),
+                              headers=[], content_type=content_type)
+        self.assert200(status)
+        self.assertPostResponse(r, ['item1'])
+        db_value = self.compare_post_with_get(r['item1'][ID_FIELD],
+                                              ['born', 'tid'])
+        self.assertEqual(db_value[0], 'Tue, 06 Nov 2012 10:33:31 GMT')
+        self.assertEqual(db_value[1], str(tid))
+
     def test_post_referential_integrity(self):
         data = {'item1': json.dumps({"person": self.unknown_item_id})}
         r, status = self.post('/invoices/', data=data)
@@ -1,4 +1,8 @@
 from eve.tests import TestBase
+from eve.ratelimit import HybridRateLimiter, MemoryRateLimiter, \
+    RedisRateLimiter, documents_cost, max_results_cost, body_size_cost
+from eve.serializers import bson_dumps, msgpack_dumps
+import threading
 import time
 
 
@@ -37,6 +41,182 @@ class TestRateLimit(TestBase):
         self.assertTrue('X-RateLimit-Limit' not in r.headers)
         self.assertTrue('X-RateLimit-Reset' not in r.headers)
 
+    def test_hybrid_ratelimit(self):
+        self.app.config['RATE_LIMIT_SYNC_INTERVAL'] = 0.1
+        self.get_ratelimit(self.known_resource_url)
+
+    def test_hybrid_sync(self):
+        if not self.app.redis:
+            return
+        limiter = HybridRateLimiter(self.app.redis, 60, 10)
+        for i in range(3):
+            limit = limiter.hit('key', 5, 60)
+            self.assertFalse(limit.over_limit)
+        self.assertEqual(limit.remaining, 2)
+        key = 'key%d' % limit.reset
+        self.assertEqual(self.app.redis.get(key), None)
+
+        # units consumed by other processes are accounted after the sync.
+        self.app.redis.incrby(key, 2)
+        limiter.sync()
+        self.assertEqual(int(self.app.redis.get(key)), 5)
+        self.assertTrue(limiter.hit('key', 5, 60).over_limit)
+        limiter.stop()
+
+    def test_hybrid_batch(self):
+        if not self.app.redis:
+            return
+        limiter = HybridRateLimiter(self.app.redis, 60, 2)
+        for i in range(3):
+            limit = limiter.hit('key', 10, 60)
+        # the third hit forced a sync of the first two.
+        self.assertEqual(int(self.app.redis.get('key%d' % limit.reset)), 2)
+        self.assertEqual(limit.remaining, 7)
+        limiter.stop()
+
+    def test_hybrid_redis_down(self):
+        try:
+            from redis import Redis
+        except ImportError:
+            return
+        limiter = HybridRateLimiter(Redis(port=1), 60, 1)
+        for i in range(2):
+            self.assertFalse(limiter.hit('key', 2, 60).over_limit)
+        self.assertTrue(limiter.hit('key', 2, 60).over_limit)
+        limiter.stop()
+
+    def test_memory_ratelimit(self):
+        self.app.redis = None
+        self.app.ratelimiter = MemoryRateLimiter()
+        self.app.config['RATE_LIMIT_GET'] = (1, 1)
+        url = self.known_resource_url
+        self.assertRateLimit(self.test_client.get(url))
+        r = self.test_client.get(url)
+        self.assertEqual(r.status_code, 429)
+
+        # units consumed in the previous window still count, until a whole
+        # period has elapsed.
+        time.sleep(2)
+        self.assertRateLimit(self.test_client.get(url))
+
+    def test_memory_sliding_window(self):
+        limiter = MemoryRateLimiter()
+        limit = limiter.hit('key', 10, 60)
+        self.assertFalse(limit.over_limit)
+        self.assertEqual(limit.remaining, 9)
+        self.assertEqual(limit.reset % 60, 0)
+
+        limiter._windows[('key', 60)].previous = 1000
+        self.assertTrue(limiter.hit('key', 10, 60).over_limit)
+        # rejected hits are not accounted.
+        self.assertEqual(limiter._windows[('key', 60)].current, 1)
+
+    def test_memory_eviction(self):
+        limiter = MemoryRateLimiter(sweep_interval=0)
+        limiter.hit('idle', 10, 60)
+        limiter.hit('busy', 10, 3600)
+        limiter._sweep(time.time() + 120)
+        self.assertEqual(list(limiter._windows.keys()), [('busy', 3600)])
+
+    def test_memory_threads(self):
+        limiter = MemoryRateLimiter()
+        accepted = []
+
+        def client():
+            for i in range(100):
+                if not limiter.hit('key', 500, 3600).over_limit:
+                    accepted.append(1)
+
+        threads = [threading.Thread(target=client) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(accepted), 500)
+
+    def test_resource_ratelimit(self):
+        self.app.ratelimiter = MemoryRateLimiter()
+        self.app.config['RATE_LIMIT_GET'] = None
+        settings = self.app.config['DOMAIN'][self.known_resource]
+        settings['rate_limit'] = {'GET': (1, 60)}
+        url = self.known_resource_url
+        self.assertRateLimit(self.test_client.get(url))
+        self.assertEqual(self.test_client.get(url).status_code, 429)
+
+        # other resources are not affected.
+        r = self.test_client.get(self.empty_resource_url)
+        self.assert200(r.status_code)
+        self.assertTrue('X-RateLimit-Limit' not in r.headers)
+
+    def test_ratelimit_cost(self):
+        self.app.ratelimiter = MemoryRateLimiter()
+        settings = self.app.config['DOMAIN'][self.known_resource]
+        settings['rate_limit'] = {'GET': (30, 60)}
+        settings['rate_limit_cost'] = max_results_cost
+        url = self.known_resource_url
+        r = self.test_client.get('%s?max_results=20' % url)
+        self.assert200(r.status_code)
+        self.assertEqual(r.headers['X-RateLimit-Remaining'], '10')
+        r = self.test_client.get('%s?max_results=20' % url)
+        self.assertEqual(r.status_code, 429)
+        r = self.test_client.get('%s?max_results=10' % url)
+        self.assert200(r.status_code)
+        self.assertEqual(r.headers['X-RateLimit-Remaining'], '0')
+
+    def test_cost_functions(self):
+        url = self.known_resource_url
+        with self.app.test_request_context(url, method='POST',
+                                           data='{"a": {}, "b": {}}',
+                                           content_type='application/json'):
+            self.assertEqual(documents_cost(self.known_resource), 2)
+            self.assertEqual(max_results_cost(self.known_resource), 1)
+        with self.app.test_request_context(url, method='POST',
+                                           data={'a': '{}', 'b': '{}'}):
+            self.assertEqual(documents_cost(self.known_resource), 2)
+        with self.app.test_request_context(url, method='POST',
+                                           data='x' * 2049):
+            self.assertEqual(documents_cost(self.known_resource), 1)
+            self.assertEqual(body_size_cost(self.known_resource), 3)
+        with self.app.test_request_context(url):
+            self.assertEqual(body_size_cost(self.known_resource), 1)
+            self.assertEqual(documents_cost(self.known_resource), 1)
+
+        with self.app.test_request_context('%s?max_results=7' % url):
+            self.assertEqual(max_results_cost(self.known_resource), 7)
+        limit = self.app.config['PAGINATION_LIMIT']
+        with self.app.test_request_context('%s?max_results=%d' %
+                                           (url, limit + 1)):
+            self.assertEqual(max_results_cost(self.known_resource), limit)
+
+    def test_documents_cost_binary(self):
+        url = self.known_resource_url
+        documents = {'a': {}, 'b': {}, 'c': {}}
+        for content_type, dumps in (('application/bson', bson_dumps),
+                                    ('application/x-msgpack', msgpack_dumps)):
+            with self.app.test_request_context(url, method='POST',
+                                               data=dumps(documents),
+                                               content_type=content_type):
+                self.assertEqual(documents_cost(self.known_resource), 3)
+
+    def test_documents_cost_singular_inserts(self):
+        self.app.config['SINGULAR_INSERTS'] = True
+        url = self.known_resource_url
+        with self.app.test_request_context(url, method='POST',
+                                           data='{"a": 1, "b": 2}',
+                                           content_type='application/json'):
+            self.assertEqual(documents_cost(self.known_resource), 1)
+
+    def test_redis_cost(self):
+        if not self.app.redis:
+            return
+        limiter = RedisRateLimiter(self.app.redis)
+        limit = limiter.hit('key', 5, 60, 3)
+        self.assertEqual(limit.remaining, 2)
+        # rejected requests don't consume any unit.
+        self.assertTrue(limiter.hit('key', 5, 60, 3).over_limit)
+        self.assertEqual(int(self.app.redis.get('key%d' % limit.reset)), 3)
+        self.assertEqual(limiter.hit('key', 5, 60, 2).remaining, 0)
+
     def get_ratelimit(self, url):
         if self.app.redis:
             self.assertRateLimit(self.test_client.get(url))
@@ -2,7 +2,13 @@
 
 from eve.tests import TestBase
 import simplejson as json
+import threading
 from eve.utils import api_prefix
+from eve.hooks import deferred
+from eve.render import render_xml, stream_xml, _best_mime, _best_mimes
+from eve.serializers import msgpack_loads
+from bson import BSON, ObjectId
+from datetime import datetime
 
 
 class TestRenders(TestBase):
@@ -24,6 +30,74 @@ class TestRenders(TestBase):
                                  headers=[('Accept', 'application/xml')])
         self.assertTrue(b'&amp;' in r.get_data())
 
+    def test_xml_values_escaping(self):
+        data = {'_id': 'id', 'name': 'Tom & <Jerry>',
+                '_links': {'self': {'title': 'Contact & co', 'href': '/a?b&c'},
+                           'parent': {'title': 'home', 'href': '/'}}}
+        with self.app.test_request_context():
+            xml = render_xml(data)
+        self.assertTrue('<name>Tom &amp; &lt;Jerry&gt;</name>' in xml)
+        self.assertTrue('title="Contact &amp; co"' in xml)
+        self.assertTrue('href="/a?b&amp;c"' in xml)
+        self.assertTrue('<link rel="parent" href="/" title="home" />' in xml)
+
+    def test_xml_render_does_not_alter_data(self):
+        item = {'_id': 'id', 'ref': 'ref',
+                '_links': {'self': {'title': 'contact', 'href': '/c/id'}}}
+        data = {'_items': [item],
+                '_links': {'self': {'title': 'contacts', 'href': '/c'},
+                           'parent': {'title': 'home', 'href': '/'}}}
+        original = json.loads(json.dumps(data))
+        with self.app.test_request_context():
+            xml = render_xml(data)
+        self.assertEqual(data, original)
+        self.assertEqual(xml.count('<resource'), 2)
+
+    def test_xml_stream(self):
+        data = {'_items': [{'_id': str(i), 'ref': 'item %d' % i}
+                           for i in range(3)]}
+        with self.app.test_request_context():
+            chunks = list(stream_xml(data))
+            self.assertEqual(len(chunks), 5)
+            self.assertEqual(''.join(chunks), render_xml(data))
+
+    def test_xml_streamed_response(self):
+        url = '%s?max_results=10' % self.known_resource_url
+        headers = [('Accept', 'application/xml')]
+        rendered = self.test_client.get(url, headers=headers)
+        self.app.config['RESPONSE_STREAMING'] = True
+        r = self.test_client.get(url, headers=headers)
+        self.assert200(r.status_code)
+        self.assertFalse('Content-Length' in r.headers)
+        self.assertTrue('application/xml' in r.content_type)
+        self.assertEqual(r.get_data(), rendered.get_data())
+
+        # json is always rendered at once
+        r = self.test_client.get(url)
+        self.assertTrue('Content-Length' in r.headers)
+
+    def test_bson_render(self):
+        r = self.test_client.get(self.known_resource_url,
+                                 headers=[('Accept', 'application/bson')])
+        self.assertEqual(r.content_type, 'application/bson')
+        self.assertBinaryItems(BSON(r.get_data()).decode())
+
+    def test_msgpack_render(self):
+        r = self.test_client.get(self.known_resource_url,
+                                 headers=[('Accept', 'application/x-msgpack')])
+        self.assertEqual(r.content_type, 'application/x-msgpack')
+        self.assertBinaryItems(msgpack_loads(r.get_data()))
+
+    def assertBinaryItems(self, data):
+        items = data['_items']
+        self.assertEqual(len(items), self.app.config['PAGINATION_DEFAULT'])
+        for item in items:
+            self.assertTrue(isinstance(item[self.app.config['ID_FIELD']],
+                                       ObjectId))
+            self.assertTrue(isinstance(item[self.app.config['LAST_UPDATED']],
+                                       datetime))
+        self.assertTrue('_links' in data)
+
     def test_unknown_render(self):
         r = self.test_client.get('/', headers=[('Accept', 'application/html')])
         self.assertEqual(r.content_type, 'application/json')
@@ -54,6 +128,44 @@ class TestRenders(TestBase):
         self.assertEqual(r.headers['Access-Control-Allow-Origin'],
                          'http://example.com, http://1on1.com')
 
+    def test_CORS_headers_follow_settings(self):
+        self.app.config['X_DOMAINS'] = ['http://example.com']
+        r = self.test_client.get('/', headers=[('Origin',
+                                                'http://example.com')])
+        self.assertEqual(r.headers['Access-Control-Allow-Origin'],
+                         'http://example.com')
+        # in-place changes are picked up as well
+        self.app.config['X_DOMAINS'].append('http://1on1.com')
+        self.app.config['X_HEADERS'] = 'X-Custom'
+        r = self.test_client.get('/', headers=[('Origin',
+                                                'http://example.com')])
+        self.assertEqual(r.headers['Access-Control-Allow-Origin'],
+                         'http://example.com, http://1on1.com')
+        self.assertEqual(r.headers['Access-Control-Allow-Headers'],
+                         'X-Custom')
+
+    def test_allowed_methods(self):
+        r = self.test_client.open(self.item_id_url, method='OPTIONS')
+        self.assert200(r.status_code)
+        allowed = r.headers['Allow'].split(', ')
+        # POST is routed to item endpoints as PATCH is allowed (see
+        # X-HTTP-Method-Override)
+        for method in ('GET', 'HEAD', 'PATCH', 'PUT', 'DELETE', 'POST',
+                       'OPTIONS'):
+            self.assertTrue(method in allowed)
+
+    def test_best_mime_memoized(self):
+        headers = [('Accept', 'application/xml;q=0.9, text/html')]
+        with self.app.test_request_context(headers=headers):
+            match = _best_mime()
+            self.assertEqual(match, ('application/xml', 'render_xml',
+                                     'stream_xml'))
+            self.assertEqual(_best_mime(), match)
+            self.assertTrue(headers[0][1] in _best_mimes)
+
+        with self.app.test_request_context():
+            self.assertEqual(_best_mime()[0], 'application/json')
+
     def test_CORS_OPTIONS(self, url='/', methods=[]):
         r = self.test_client.open(url, method='OPTIONS')
         self.assertFalse('Access-Control-Allow-Origin' in r.headers)
@@ -253,13 +365,82 @@ class TestEventHooks(TestBase):
         self.test_client.get(self.item_id_url)
         self.assertTrue(self.passed)
 
-    def post(self, extra=None):
+    def test_on_fetch_item_resource(self):
+        def resource_hook(_id, document):
+            self.assertEqual(str(_id), self.item_id)
+            self.passed = True
+        self.app.on_fetch_item_contact += resource_hook
+        self.test_client.get(self.item_id_url)
+        self.assertTrue(self.passed)
+
+    def test_unsubscribed_events(self):
+        self.test_client.get(self.known_resource_url)
+        self.test_client.get(self.item_id_url)
+        self.post()
+        # no event slots have been created along the way.
+        for name in self.app.__dict__:
+            self.assertFalse(name.startswith('on_'))
+
+    def test_subscribe_unsubscribe(self):
+        def general_hook(resource, request, payload):
+            self.callback_value = resource
+        self.test_client.get(self.known_resource_url)
+        self.app.on_GET += general_hook
+        self.test_client.get(self.known_resource_url)
+        self.assertEqual(self.callback_value, self.known_resource)
+        self.callback_value = None
+        self.app.on_GET -= general_hook
+        self.test_client.get(self.known_resource_url)
+        self.assertEqual(self.callback_value, None)
+
+    def test_deferred_hooks(self):
+        calls = []
+
+        def inline_hook(documents):
+            self.documents = documents
+
+        def deferred_hook(documents):
+            calls.append((threading.current_thread(), documents))
+        self.app.on_insert_contacts += inline_hook
+        self.app.on_insert_contacts += deferred(deferred_hook)
+        self.post(buffered=True)
+        self.app._hook_executor.join()
+        self.assertEqual(len(calls), 1)
+        thread, documents = calls[0]
+        self.assertNotEqual(thread, threading.current_thread())
+        # a snapshot taken before the documents were stored.
+        self.assertTrue('_id' in self.documents[0])
+        self.assertFalse('_id' in documents[0])
+
+    def test_deferred_hooks_errors(self):
+        def failing_hook(resource, request, payload):
+            raise ValueError()
+
+        def resource_hook(request, payload):
+            self.passed = True
+        self.app.on_GET += deferred(failing_hook)
+        self.app.on_GET_contacts += deferred(resource_hook)
+        r = self.test_client.get(self.known_resource_url, buffered=True)
+        self.assert200(r.status_code)
+        self.app._hook_executor.join()
+        self.assertTrue(self.passed)
+
+    def test_deferred_hooks_unsubscribe(self):
+        def general_hook(resource, request, payload):
+            self.passed = True
+        self.app.on_GET += deferred(general_hook)
+        self.app.on_GET -= deferred(general_hook)
+        self.test_client.get(self.known_resource_url, buffered=True)
+        self.assertFalse(self.passed)
+        self.assertEqual(getattr(self.app, '_hook_executor', None), None)
+
+    def post(self, extra=None, buffered=False):
         headers = [('Content-Type', 'application/x-www-form-urlencoded')]
         data = {'item1': json.dumps({"ref": "0123456789012345678901234"})}
         if extra:
             headers.extend(extra)
         self.test_client.post(self.known_resource_url, data=data,
-                              headers=headers)
+                              headers=headers, buffered=buffered)
 
     def patch(self):
         headers = [('Content-Type', 'application/x-www-form-urlencoded'),
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 
+import zlib
 from ast import literal_eval
 from eve.tests import TestBase
 import simplejson as json
@@ -72,3 +73,115 @@ class TestNoHateoas(TestBase):
                                    headers=headers)
         response = json.loads(r.get_data().decode())
         self.assertTrue('_links' not in response['item1'])
+
+
+class TestServerTiming(TestBase):
+
+    def test_server_timing_disabled(self):
+        r = self.test_client.get(self.known_resource_url)
+        self.assertTrue('Server-Timing' not in r.headers)
+
+    def test_server_timing_resource(self):
+        self.app.config['SERVER_TIMING'] = True
+        r = self.test_client.get(self.known_resource_url)
+        self.assert200(r.status_code)
+        timing = r.headers.get('Server-Timing')
+        self.assertTrue(timing is not None)
+        metrics = dict(metric.split(';dur=')
+                       for metric in timing.split(', '))
+        for name in ('parse', 'db', 'meta', 'hooks', 'render', 'total'):
+            self.assertTrue(name in metrics)
+            self.assertTrue(float(metrics[name]) >= 0)
+
+    def test_server_timing_item(self):
+        self.app.config['SERVER_TIMING'] = True
+        r = self.test_client.get(self.item_id_url)
+        self.assert200(r.status_code)
+        self.assertTrue('db;dur=' in r.headers['Server-Timing'])
+
+
+class TestCompression(TestBase):
+
+    def setUp(self):
+        super(TestCompression, self).setUp()
+        self.app.config['COMPRESSION'] = True
+        self.app.config['COMPRESSION_MIN_SIZE'] = 0
+        self.app.config['DOMAIN'][self.known_resource][
+            'compression_min_size'] = 0
+
+    def get_encoded(self, url, encoding='gzip', headers=None):
+        headers = (headers or []) + [('Accept-Encoding', encoding)]
+        return self.test_client.get(url, headers=headers)
+
+    def test_compression_disabled(self):
+        self.app.config['COMPRESSION'] = False
+        r = self.get_encoded(self.known_resource_url)
+        self.assertTrue('Content-Encoding' not in r.headers)
+        self.assertTrue('Vary' not in r.headers)
+
+    def test_compression_not_accepted(self):
+        r = self.test_client.get(self.known_resource_url)
+        self.assert200(r.status_code)
+        self.assertTrue('Content-Encoding' not in r.headers)
+        self.assertTrue('Accept-Encoding' in r.headers['Vary'])
+
+    def test_gzip(self):
+        plain = self.test_client.get(self.known_resource_url).get_data()
+        r = self.get_encoded(self.known_resource_url, 'gzip, deflate')
+        self.assert200(r.status_code)
+        self.assertEqual(r.headers['Content-Encoding'], 'gzip')
+        self.assertTrue('Accept-Encoding' in r.headers['Vary'])
+        body = r.get_data()
+        self.assertEqual(int(r.headers['Content-Length']), len(body))
+        self.assertEqual(zlib.decompress(body, 16 + zlib.MAX_WBITS), plain)
+
+    def test_deflate(self):
+        plain = self.test_client.get(self.known_resource_url).get_data()
+        r = self.get_encoded(self.known_resource_url, 'gzip;q=0.5, deflate')
+        self.assertEqual(r.headers['Content-Encoding'], 'deflate')
+        self.assertEqual(zlib.decompress(r.get_data()), plain)
+
+    def test_min_size(self):
+        self.app.config['DOMAIN'][self.known_resource][
+            'compression_min_size'] = 10 ** 6
+        r = self.get_encoded(self.known_resource_url)
+        self.assertTrue('Content-Encoding' not in r.headers)
+        self.assertTrue('Accept-Encoding' in r.headers['Vary'])
+
+        # home endpoint relies on the global setting.
+        r = self.get_encoded('/')
+        self.assertEqual(r.headers['Content-Encoding'], 'gzip')
+
+    def test_etag(self):
+        r = self.get_encoded(self.item_id_url)
+        self.assertEqual(r.headers['ETag'], '%s-gzip' % self.item_etag)
+
+        r = self.get_encoded(self.item_id_url,
+                             headers=[('If-None-Match', r.headers['ETag'])])
+        self.assertEqual(r.status_code, 304)
+
+        r = self.test_client.get(self.item_id_url,
+                                 headers=[('If-None-Match', self.item_etag)])
+        self.assertEqual(r.status_code, 304)
+
+    def test_streamed_response(self):
+        self.app.config['RESPONSE_STREAMING'] = True
+        headers = [('Accept', 'application/xml')]
+        plain = self.test_client.get(self.known_resource_url,
+                                     headers=headers).get_data()
+        r = self.get_encoded(self.known_resource_url, headers=headers)
+        self.assert200(r.status_code)
+        self.assertEqual(r.headers['Content-Encoding'], 'gzip')
+        self.assertTrue('Content-Length' not in r.headers)
+        self.assertEqual(zlib.decompress(r.get_data(), 16 + zlib.MAX_WBITS),
+                         plain)
+
+    def test_cache(self):
+        self.app.config['COMPRESSION_CACHE_SIZE'] = 10
+        first = self.get_encoded(self.known_resource_url).get_data()
+        second = self.get_encoded(self.known_resource_url).get_data()
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.app._compression_cache), 1)
+
+        self.get_encoded(self.known_resource_url, 'deflate')
+        self.assertEqual(len(self.app._compression_cache), 2)
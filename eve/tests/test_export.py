@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+
+from eve.tests.test_settings import *  # noqa
+
+EXPORT = True
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+
+from eve.tests.test_settings import *  # noqa
+
+NOTIFICATIONS = True
+NOTIFICATIONS_HEARTBEAT = 1
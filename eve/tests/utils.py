@@ -3,10 +3,13 @@
 import hashlib
 from bson.json_util import dumps
 from datetime import datetime, timedelta
+from unittest import TestCase
 from eve.tests import TestBase
+from eve.dates import format_date, parse_date, RFC1123_FORMAT, dates_tree, \
+    coerce_document, coerce_query
 from eve.utils import parse_request, str_to_date, config, weak_date, \
     date_to_str, querydef, document_etag, extract_key_values, \
-    debug_error_message
+    debug_error_message, strip_etag_encoding, LRUCache
 
 
 class TestUtils(TestBase):
@@ -188,3 +191,107 @@ class TestUtils(TestBase):
             self.app.config['DEBUG'] = True
             self.assertEqual(debug_error_message('An error message'),
                              'An error message')
+
+    def test_strip_etag_encoding(self):
+        self.assertEqual(strip_etag_encoding('abc-gzip'), 'abc')
+        self.assertEqual(strip_etag_encoding('abc-deflate'), 'abc')
+        self.assertEqual(strip_etag_encoding('abc'), 'abc')
+        self.assertEqual(strip_etag_encoding(None), None)
+
+    def test_lru_cache(self):
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        # 'b' is now the least recently used entry
+        cache.set('c', 3)
+        self.assertFalse('b' in cache)
+        self.assertEqual(cache.get('b', 'default'), 'default')
+        self.assertEqual(len(cache), 2)
+        cache.set('a', 4)
+        cache.set('d', 5)
+        self.assertFalse('c' in cache)
+        self.assertEqual(cache.get('a'), 4)
+        self.assertEqual(cache.get('d'), 5)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+        cache = LRUCache(0)
+        cache.set('a', 1)
+        self.assertFalse('a' in cache)
+
+
+class TestDates(TestCase):
+
+    def test_rfc1123_round_trip(self):
+        date = datetime(1900, 1, 1)
+        for i in range(2000):
+            date += timedelta(days=37, seconds=7919)
+            string = date.strftime(RFC1123_FORMAT)
+            self.assertEqual(format_date(date), string)
+            self.assertEqual(parse_date(string), date)
+
+    def test_format_date_microseconds(self):
+        date = datetime(2012, 11, 6, 10, 33, 31, 500)
+        self.assertEqual(format_date(date), 'Tue, 06 Nov 2012 10:33:31 GMT')
+
+    def test_parse_date_lenient_input(self):
+        # non canonical representations are handed over to strptime.
+        expected = datetime(2012, 11, 6, 10, 33, 31)
+        self.assertEqual(parse_date('Tue, 6 Nov 2012 10:33:31 GMT'), expected)
+        self.assertEqual(parse_date('tue, 06 nov 2012 10:33:31 GMT'), expected)
+
+    def test_parse_date_invalid(self):
+        for string in ('Tue, 31 Feb 2012 10:33:31 GMT',
+                       'Tue, 06 Nov 2012 10:33:31 UTC', 'not a date', ''):
+            self.assertRaises(ValueError, parse_date, string)
+
+    def test_custom_format(self):
+        fmt = '%Y-%m-%dT%H:%M:%S'
+        date = datetime(2012, 11, 6, 10, 33, 31)
+        self.assertEqual(format_date(date, fmt), '2012-11-06T10:33:31')
+        self.assertEqual(parse_date('2012-11-06T10:33:31', fmt), date)
+
+
+class TestDatesCoercion(TestCase):
+
+    def setUp(self):
+        self.tree = dates_tree(['born', 'location.since', 'rows.when',
+                                'history', 'pair.1'])
+        self.string = 'Tue, 06 Nov 2012 10:33:31 GMT'
+        self.date = datetime(2012, 11, 6, 10, 33, 31)
+
+    def convert(self, string):
+        return parse_date(string)
+
+    def test_coerce_document(self):
+        s, d = self.string, self.date
+        document = {'born': s, 'name': s, 'location': {'since': s, 'city': s},
+                    'rows': [{'when': s, 'what': s}, {'what': s}],
+                    'history': [s, s], 'pair': [s, s]}
+        coerce_document(document, self.tree, self.convert)
+        self.assertEqual(document, {
+            'born': d, 'name': s, 'location': {'since': d, 'city': s},
+            'rows': [{'when': d, 'what': s}, {'what': s}],
+            'history': [d, d], 'pair': [s, d]})
+
+    def test_coerce_document_invalid_date(self):
+        self.assertRaises(ValueError, coerce_document, {'born': 'not a date'},
+                          self.tree, self.convert)
+
+    def test_coerce_query(self):
+        s, d = self.string, self.date
+        spec = {'name': s,
+                'born': {'$gt': s, '$lt': 'not a date', '$in': [s, 'x']},
+                '$or': [{'location.since': s}, {'location': {'since': s}},
+                        {'rows.0.when': {'$not': {'$gt': s}}}],
+                'rows': {'$elemMatch': {'when': s, 'what': s}},
+                'history': {'$all': [s]}}
+        coerce_query(spec, self.tree, self.convert)
+        self.assertEqual(spec, {
+            'name': s,
+            'born': {'$gt': d, '$lt': 'not a date', '$in': [d, 'x']},
+            '$or': [{'location.since': d}, {'location': {'since': d}},
+                    {'rows.0.when': {'$not': {'$gt': d}}}],
+            'rows': {'$elemMatch': {'when': d, 'what': s}},
+            'history': {'$all': [d]}})
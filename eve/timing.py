@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+"""
+    eve.timing
+    ~~~~~~~~~~
+
+    Opt-in instrumentation of the request processing phases (rate limiting,
+    authentication, parsing, database access, etc.). Timings are collected in
+    a request-local timer and sent back to the client with the
+    `Server-Timing` response header.
+
+    :copyright: (c) 2013 by Nicola Iarocci.
+    :license: BSD, see LICENSE for more details.
+"""
+
+from functools import wraps
+from timeit import default_timer
+from flask import g, current_app as app
+
+
+class RequestTimer(object):
+    """ Accumulates the time spent by the current request in each processing
+    phase. A phase can be entered several times (think db calls) in which
+    case durations add up. Phases can also be nested: time spent in an inner
+    phase is not accounted to the outer one, so that the reported figures
+    never overlap.
+
+    .. versionadded:: 0.1.1
+    """
+    def __init__(self):
+        self.started = default_timer()
+        self.phases = []
+        self.durations = {}
+        self._stack = []
+
+    def enter(self, name):
+        now = default_timer()
+        if self._stack:
+            # pause the enclosing phase.
+            outer, since = self._stack[-1]
+            self._add(outer, now - since)
+        self._stack.append((name, now))
+
+    def exit(self):
+        now = default_timer()
+        name, since = self._stack.pop()
+        self._add(name, now - since)
+        if self._stack:
+            # resume the enclosing phase.
+            self._stack[-1] = (self._stack[-1][0], now)
+
+    def header(self):
+        """ Returns the `Server-Timing` header value, durations being
+        expressed in milliseconds.
+        """
+        metrics = ['%s;dur=%.3f' % (name, self.durations[name] * 1000)
+                   for name in self.phases]
+        metrics.append('total;dur=%.3f' %
+                       ((default_timer() - self.started) * 1000))
+        return ', '.join(metrics)
+
+    def _add(self, name, duration):
+        if name not in self.durations:
+            self.phases.append(name)
+            self.durations[name] = 0.0
+        self.durations[name] += duration
+
+
+class _Phase(object):
+    """ Context manager recording a phase on a :class:`RequestTimer`. """
+    __slots__ = ('timer', 'name')
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.timer.enter(self.name)
+
+    def __exit__(self, *exc_info):
+        self.timer.exit()
+        return False
+
+
+class _NoPhase(object):
+    """ Do-nothing context manager, used when timing is disabled. """
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_no_phase = _NoPhase()
+
+
+def phase(name):
+    """ Returns a context manager which accounts the enclosed code to the
+    `name` phase of the current request. When `SERVER_TIMING` is disabled, or
+    we are outside of a request context, a shared no-op context manager is
+    returned instead.
+
+    :param name: the phase name, as it will appear in the header.
+
+    .. versionadded:: 0.1.1
+    """
+    try:
+        timer = g._request_timer
+    except (AttributeError, RuntimeError):
+        return _no_phase
+    return _Phase(timer, name) if timer else _no_phase
+
+
+def timed(name):
+    """ Decorator version of :func:`phase`.
+
+    :param name: the phase name, as it will appear in the header.
+
+    .. versionadded:: 0.1.1
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            with phase(name):
+                return f(*args, **kwargs)
+        return decorated
+    return decorator
+
+
+def start_request_timer():
+    """ `before_request` handler. Sets up the request timer if the
+    `SERVER_TIMING` setting is enabled.
+
+    .. versionadded:: 0.1.1
+    """
+    g._request_timer = RequestTimer() if app.config['SERVER_TIMING'] \
+        else None
+
+
+def add_server_timing(response):
+    """ `after_request` handler. Adds the `Server-Timing` header to the
+    response, if a request timer has been set up.
+
+    :param response: the outgoing response.
+
+    .. versionadded:: 0.1.1
+    """
+    timer = getattr(g, '_request_timer', None)
+    if timer:
+        response.headers.add('Server-Timing', timer.header())
+    return response
@@ -12,11 +12,16 @@
 
 import eve
 import hashlib
-from flask import request
+import re
+import threading
+import simplejson as json
+from flask import request, abort
 from flask import current_app as app
-from datetime import datetime, timedelta
+from datetime import timedelta
 from bson.json_util import dumps
 import werkzeug.exceptions
+from eve.timing import timed
+from eve.dates import format_date, parse_date
 
 
 class Config(object):
@@ -39,10 +44,98 @@ class Config(object):
 # importing eve.utils.
 config = Config()
 
+# content codings supported by response compression, in order of preference.
+CONTENT_CODINGS = ('gzip', 'deflate')
+
+# 'wait' preference of the Prefer header (RFC 7240), as in
+# 'Prefer: return=minimal, wait=10'.
+_WAIT_PREFERENCE = re.compile(r'(?:^|,)\s*wait\s*=\s*"?(\d+)"?\s*(?:[,;]|$)',
+                              re.IGNORECASE)
+
+
+class LRUCache(object):
+    """ A thread-safe, size-bounded mapping which discards the least recently
+    used entries first. Both lookups and insertions are O(1).
+
+    :param capacity: the maximum number of entries kept by the cache.
+
+    .. versionadded:: 0.1.1
+    """
+    # indexes of the link fields.
+    PREV, NEXT, KEY, VALUE = 0, 1, 2, 3
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self.clear()
+
+    def get(self, key, default=None):
+        """ Returns the value cached for `key`, or `default`. A successful
+        lookup marks the entry as the most recently used one.
+        """
+        with self._lock:
+            link = self._map.get(key)
+            if link is None:
+                return default
+            self._unlink(link)
+            self._append(link)
+            return link[self.VALUE]
+
+    def set(self, key, value):
+        """ Caches `value` under `key`, discarding the least recently used
+        entry if the cache is full.
+        """
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            link = self._map.get(key)
+            if link is not None:
+                self._unlink(link)
+                link[self.VALUE] = value
+            else:
+                if len(self._map) >= self.capacity:
+                    oldest = self._root[self.NEXT]
+                    self._unlink(oldest)
+                    del self._map[oldest[self.KEY]]
+                link = [None, None, key, value]
+                self._map[key] = link
+            self._append(link)
+
+    def clear(self):
+        """ Removes all entries from the cache. """
+        self._map = {}
+        # sentinel of the circular, doubly linked list keeping entries sorted
+        # from the least to the most recently used.
+        self._root = []
+        self._root[:] = [self._root, self._root, None, None]
+
+    def __contains__(self, key):
+        return key in self._map
+
+    def __len__(self):
+        return len(self._map)
+
+    def _unlink(self, link):
+        prev, next_ = link[self.PREV], link[self.NEXT]
+        prev[self.NEXT] = next_
+        next_[self.PREV] = prev
+
+    def _append(self, link):
+        last = self._root[self.PREV]
+        link[self.PREV] = last
+        link[self.NEXT] = self._root
+        last[self.NEXT] = self._root[self.PREV] = link
+
 
 class ParsedRequest(object):
     """ This class, by means of its attributes, describes a client request.
 
+    .. versionchanged:: 0.1.1
+       'ids' keyword.
+       'sparse' keyword.
+       'since' keyword.
+       'wait' keyword.
+
     .. versonchanged:: 0.1.0
        'embedded' keyword.
 
@@ -77,13 +170,40 @@ class ParsedRequest(object):
     # `embedded` value of the query string (?embedded). Defaults to None.
     embedded = None
 
+    # list of ids from the query string (?ids=a,b,c), only parsed by
+    # collection GET requests (see :func:`eve.methods.get.get`). Defaults to
+    # None.
+    ids = None
 
+    # True if the client asked for a sparse response (?sparse=1). Defaults to
+    # False.
+    sparse = False
+
+    # sync token from the query string (?since). An empty string asks for the
+    # whole resource. Defaults to None (not a sync request).
+    since = None
+
+    # seconds the client is willing to wait for the resource to change, from
+    # the `Prefer` request header ('Prefer: wait=10'), up to
+    # `LONG_POLLING_MAX_WAIT`. Defaults to None.
+    wait = None
+
+
+@timed('parse')
 def parse_request(resource):
     """ Parses a client request, returning instance of :class:`ParsedRequest`
     containing relevant request data.
 
     :param resource: the resource currently being accessed by the client.
 
+    .. versionchanged:: 0.1.1
+       Accounted to the 'parse' phase when 'SERVER_TIMING' is enabled.
+       ETags of compressed representations are accepted with conditional
+       requests.
+       Support for sparse responses ('?sparse=1').
+       Support for sync requests ('?since=<token>').
+       Support for long polling ('Prefer: wait=10').
+
     .. versionchagend:: 0.1.0
        Support for embedded documents.
 
@@ -106,6 +226,10 @@ def parse_request(resource):
         r.sort = args.get('sort')
     if config.DOMAIN[resource]['embedding']:
         r.embedded = args.get('embedded')
+    if config.DOMAIN[resource]['sparse']:
+        r.sparse = args.get('sparse') in ('1', 'true')
+    if config.DOMAIN[resource]['sync']:
+        r.since = args.get('since')
 
     max_results_default = config.PAGINATION_DEFAULT if \
         config.DOMAIN[resource]['pagination'] else 0
@@ -134,12 +258,30 @@ def parse_request(resource):
         # TODO if_none_match and if_match should probably be validated as
         # valid etags, returning 400 on fail. Not sure however since
         # we're just going to use these for string-type comparision
-        r.if_none_match = headers.get('If-None-Match')
-        r.if_match = headers.get('If-Match')
+        r.if_none_match = strip_etag_encoding(headers.get('If-None-Match'))
+        r.if_match = strip_etag_encoding(headers.get('If-Match'))
+        if config.DOMAIN[resource]['long_polling']:
+            r.wait = preferred_wait(headers.get('Prefer'))
 
     return r
 
 
+def preferred_wait(prefer):
+    """ Returns the number of seconds the client is willing to wait, as
+    expressed by the `wait` preference of a `Prefer` header (RFC 7240), capped
+    at `LONG_POLLING_MAX_WAIT`. Returns None when there's no valid `wait`
+    preference.
+
+    :param prefer: the `Prefer` header value.
+
+    .. versionadded:: 0.1.1
+    """
+    match = _WAIT_PREFERENCE.search(prefer or '')
+    if match is None:
+        return None
+    return min(int(match.group(1)), config.LONG_POLLING_MAX_WAIT) or None
+
+
 def weak_date(date):
     """ Returns a RFC-1123 string corresponding to a datetime value plus
     a 1 second timedelta. This is needed because when saved, documents
@@ -155,16 +297,22 @@ def str_to_date(string):
     """ Converts a RFC-1123 string to the corresponding datetime value.
 
     :param string: the RFC-1123 string to convert to datetime value.
+
+    .. versionchanged:: 0.1.1
+       Fast parsing of the default format (see :mod:`eve.dates`).
     """
-    return datetime.strptime(string, config.DATE_FORMAT) if string else None
+    return parse_date(string, config.DATE_FORMAT) if string else None
 
 
 def date_to_str(date):
     """ Converts a datetime value to the corresponding RFC-1123 string.
 
     :param date: the datetime value to convert.
+
+    .. versionchanged:: 0.1.1
+       Fast formatting of the default format (see :mod:`eve.dates`).
     """
-    return datetime.strftime(date, config.DATE_FORMAT) if date else None
+    return format_date(date, config.DATE_FORMAT) if date else None
 
 
 def collection_link(resource):
@@ -287,6 +435,23 @@ def document_etag(value):
     return h.hexdigest()
 
 
+def strip_etag_encoding(etag):
+    """ Returns the ETag of the uncompressed representation, given the one of
+    a compressed representation (which is suffixed with the content coding,
+    as in '<etag>-gzip'). Other ETags are returned unaltered.
+
+    :param etag: the ETag, as sent back by the client.
+
+    .. versionadded:: 0.1.1
+    """
+    if etag:
+        for encoding in CONTENT_CODINGS:
+            suffix = '-' + encoding
+            if etag.endswith(suffix):
+                return etag[:-len(suffix)]
+    return etag
+
+
 def extract_key_values(key, d):
     """ Extracts all values that match a key, even in nested dicts.
 
@@ -330,6 +495,25 @@ def debug_error_message(msg):
     return None
 
 
+def client_projection(req):
+    """ Returns the projection requested by the client (`?projection=`) as
+    a dict, or None if the client did not provide any. Aborts with a 400 if
+    the projection can't be parsed.
+
+    :param req: an instance of :class:`ParsedRequest`.
+
+    .. versionadded:: 0.1.1
+    """
+    if req.projection:
+        try:
+            return json.loads(req.projection)
+        except ValueError:
+            abort(400, description=debug_error_message(
+                'Unable to parse `projection` clause'
+            ))
+    return None
+
+
 def validate_filters(where, resource):
     """ Report any filter which is not allowed by  `allowed_filters`
 
@@ -30,7 +30,7 @@ setup(
         'pymongo==2.6.2',
         'flask-pymongo==0.3.0',
     ],
-    tests_require=['redis'],
+    tests_require=['redis', 'msgpack>=1.0'],
     classifiers=[
         'Development Status :: 4 - Beta',
         'Environment :: Web Environment',